@@ -0,0 +1,65 @@
+"""
+Deterministic stand-in for a Whisper model, for benchmarks only.
+
+transcribe() does a fixed amount of numpy work per 30 s window (framing +
+FFT, roughly what the log-mel front end costs) and emits one segment per
+window whose text depends only on the window's samples, so results are
+repeatable and the decode/cache/DB paths around the model are what gets
+measured. Register it with `runwisper._models[FAKE_MODEL] = FakeWhisper()`.
+"""
+import wave
+
+import numpy as np
+
+from benchmarks.standin_db import WORDS
+
+FAKE_MODEL = "bench-fake"
+SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30
+FRAME = 400
+HOP = 160
+
+
+class FakeWhisper:
+    def transcribe(self, audio, **options):
+        audio = np.asarray(audio, dtype=np.float32)
+        window = WINDOW_SECONDS * SAMPLE_RATE
+        segments = []
+        for i, start in enumerate(range(0, len(audio), window)):
+            chunk = audio[start:start + window]
+            n_frames = max(0, (len(chunk) - FRAME) // HOP + 1)
+            if n_frames:
+                frames = np.lib.stride_tricks.sliding_window_view(chunk, FRAME)[::HOP][:n_frames]
+                spectrum = np.abs(np.fft.rfft(frames * np.hanning(FRAME), axis=1))
+                signature = int(np.log1p(spectrum.sum(axis=0)).sum() * 1000)
+            else:
+                signature = 0
+            text = " ".join(WORDS[(signature + k * 7) % len(WORDS)] for k in range(12))
+            segments.append({
+                "id": i,
+                "start": start / SAMPLE_RATE,
+                "end": (start + len(chunk)) / SAMPLE_RATE,
+                "text": " " + text,
+                "avg_logprob": -0.25,
+            })
+        return {"text": "".join(s["text"] for s in segments), "segments": segments, "language": "en"}
+
+
+def write_synthetic_wav(path, seconds, seed=0, speech_ratio=0.7):
+    """16 kHz mono WAV alternating tone bursts ("speech") and near-silence."""
+    rng = np.random.default_rng(seed)
+    samples = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    for second in range(int(seconds)):
+        block = slice(second * SAMPLE_RATE, (second + 1) * SAMPLE_RATE)
+        if rng.random() < speech_ratio:
+            freq = rng.uniform(120, 400)
+            samples[block] = 0.3 * np.sin(2 * np.pi * freq * t) + 0.02 * rng.standard_normal(SAMPLE_RATE)
+        else:
+            samples[block] = 0.001 * rng.standard_normal(SAMPLE_RATE)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((np.clip(samples, -1, 1) * 32767).astype(np.int16).tobytes())
+    return path
@@ -0,0 +1,291 @@
+"""
+Benchmarks for the API list endpoints and the transcription path.
+
+    python -m benchmarks.run --calls 50000 --requests 200
+    python -m benchmarks.run --only transcription --real-whisper
+    python -m benchmarks.run --compare benchmarks/results/<earlier>.json
+
+The app runs in-process behind TestClient against a SQLite stand-in for
+MySQL (benchmarks/standin_db.py) seeded with deterministic synthetic data;
+startup hooks are not run, so no MySQL, job workers or models are needed.
+Transcription uses a deterministic fake model unless --real-whisper is
+given (Whisper "tiny", needs openai-whisper). Audio is decoded with ffmpeg.
+
+Every scenario reports latency percentiles, throughput and the peak
+Python heap (tracemalloc) over a separate pass; results are written as
+JSON so two commits can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def measure(fn, requests, concurrency=1, warmup=3, memory_requests=3):
+    """
+    Calls fn(i) `requests` times (on `concurrency` threads) and returns latency
+    percentiles in ms, throughput and the tracemalloc peak of a separate
+    `memory_requests` pass, so tracing overhead does not skew the timings.
+    """
+    for i in range(warmup):
+        fn(i)
+
+    def timed(i):
+        started = time.perf_counter()
+        fn(i)
+        return time.perf_counter() - started
+
+    wall_started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed, range(requests)))
+    else:
+        latencies = [timed(i) for i in range(requests)]
+    wall = time.perf_counter() - wall_started
+
+    tracemalloc.start()
+    for i in range(memory_requests):
+        fn(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    ms = [l * 1000 for l in latencies]
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p90_ms": round(percentile(ms, 90), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "mean_ms": round(sum(ms) / len(ms), 3),
+        "max_ms": round(ms[-1], 3),
+        "throughput_rps": round(requests / wall, 2),
+        "peak_heap_bytes": peak,
+    }
+
+
+def prepare_environment(workdir):
+    # Settings are read at import time, so this must run before core.config is imported
+    os.environ.setdefault("SEARCH_INDEX_PATH", os.path.join(workdir, "search", "transcripts.db"))
+    os.environ.setdefault("TRANSCRIPTION_CACHE_DIR", os.path.join(workdir, "transcription_cache"))
+    os.environ.setdefault("TRANSCRIPTION_CACHE_ENABLED", "0")
+    os.environ.setdefault("AUDIO_PREPROCESS", "1")
+    # Chunk workers are separate processes that would load the real model
+    os.environ.setdefault("TRANSCRIBE_CHUNK_WORKERS", "1")
+
+
+def api_scenarios(args):
+    rng = random.Random(args.seed)
+    agent = lambda: rng.randint(1, args.agents)
+    call = lambda: rng.randint(1, args.calls)
+    cursor = lambda: rng.randint(0, max(0, args.calls - 100))
+    scenarios = {
+        "GET /calls": lambda: "/calls?limit=100",
+        "GET /calls (keyset page)": lambda: f"/calls?limit=100&cursor={cursor()}",
+        "GET /calls (fields=all)": lambda: f"/calls?limit=100&fields=all&cursor={cursor()}",
+        "GET /calls?agent_id": lambda: f"/calls?limit=100&agent_id={agent()}",
+        "GET /calls/{id}": lambda: f"/calls/{call()}",
+        "GET /calls/scores/all": lambda: "/calls/scores/all",
+        "GET /calls/scores/agent/{id}": lambda: f"/calls/scores/agent/{agent()}",
+        "GET /agents": lambda: "/agents",
+        "GET /calls/search": lambda: "/calls/search?q=" + rng.choice(["refund", "cancel account", '"billing issue"', "late OR delivery"]),
+    }
+    # Paths are drawn up front so every thread and run sees the same sequence
+    total = args.requests + 3 + args.memory_requests
+    return {name: [make() for _ in range(total)] for name, make in scenarios.items()}
+
+
+def bench_api(args, workdir):
+    import core.database
+    from benchmarks.standin_db import StandInPool, seed
+
+    pool = StandInPool(os.path.join(workdir, "bench.db"), size=max(10, args.concurrency))
+    core.database._pool = pool
+    started = time.perf_counter()
+    seed(pool, agents=args.agents, users=args.users, calls=args.calls, seed_value=args.seed)
+    seeded_in = time.perf_counter() - started
+
+    from fastapi.testclient import TestClient
+    import main
+
+    # Not used as a context manager: startup hooks (MySQL DDL, job workers) stay off
+    client = TestClient(main.app)
+    main.transcript_search.rebuild()
+
+    results = {"_setup": {"seed_seconds": round(seeded_in, 3), "calls": args.calls, "agents": args.agents}}
+    for name, paths in api_scenarios(args).items():
+        if args.filter and args.filter not in name:
+            continue
+        errors = []
+
+        def request(i, paths=paths, errors=errors):
+            response = client.get(paths[i % len(paths)])
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+        result = measure(request, args.requests, args.concurrency, memory_requests=args.memory_requests)
+        result["errors"] = len(errors)
+        results[name] = result
+        print(f"{name:<34} p50 {result['p50_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms  "
+              f"{result['throughput_rps']:>9.1f} req/s  errors {len(errors)}")
+    pool.close_all()
+    return results
+
+
+def bench_transcription(args, workdir):
+    import runwisper
+    from core.config import settings
+    from benchmarks.fake_whisper import FAKE_MODEL, FakeWhisper, write_synthetic_wav
+    from utils.audio_preprocess import preprocessed_paths
+
+    runwisper._models[FAKE_MODEL] = FakeWhisper()
+    audio_dir = os.path.join(workdir, "audio")
+    os.makedirs(audio_dir, exist_ok=True)
+    files = [
+        (seconds, write_synthetic_wav(os.path.join(audio_dir, f"synthetic_{seconds}s.wav"), seconds, seed=args.seed))
+        for seconds in args.audio_seconds
+    ]
+
+    def drop_preprocessed(path):
+        for side in preprocessed_paths(path):
+            if os.path.exists(side):
+                os.remove(side)
+
+    models = [FAKE_MODEL] + (["tiny"] if args.real_whisper else [])
+    results = {}
+    for model in models:
+        for seconds, path in files:
+            runs = args.transcriptions if model == FAKE_MODEL else 1
+
+            def cold(i, path=path, model=model):
+                drop_preprocessed(path)
+                runwisper.transcribe(path, model)
+
+            def warm(i, path=path, model=model):
+                runwisper.transcribe(path, model)
+
+            settings.TRANSCRIPTION_CACHE_ENABLED = False
+            scenarios = [("decode+vad+model", cold, 1), ("model (preprocessed)", warm, 1)]
+            for label, fn, warmup in scenarios:
+                result = measure(fn, runs, warmup=warmup, memory_requests=1)
+                result["audio_seconds_per_wall_second"] = round(seconds / (result["mean_ms"] / 1000), 2)
+                results[f"transcribe {model} {seconds}s {label}"] = result
+            settings.TRANSCRIPTION_CACHE_ENABLED = True
+            result = measure(warm, runs, warmup=1, memory_requests=1)
+            result["audio_seconds_per_wall_second"] = round(seconds / (result["mean_ms"] / 1000), 2)
+            results[f"transcribe {model} {seconds}s cache hit"] = result
+            settings.TRANSCRIPTION_CACHE_ENABLED = False
+    for name, result in results.items():
+        print(f"{name:<48} p50 {result['p50_ms']:>10.2f} ms  {result['audio_seconds_per_wall_second']:>9.1f} audio s/s")
+    return results
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", None
+
+
+def compare(current, baseline, max_regression=None):
+    """Prints p50/p95/throughput changes per scenario; returns the scenarios whose p95 regressed too far."""
+    regressions = []
+    for section in ("api", "transcription"):
+        old_section = baseline.get(section, {})
+        for name, new in current.get(section, {}).items():
+            old = old_section.get(name)
+            if name.startswith("_") or not old:
+                continue
+            deltas = []
+            for key in ("p50_ms", "p95_ms", "throughput_rps"):
+                if old.get(key):
+                    deltas.append(f"{key} {old[key]:.2f} -> {new[key]:.2f} ({(new[key] - old[key]) / old[key]:+.1%})")
+            print(f"{name:<48} " + "  ".join(deltas))
+            if max_regression is not None and old.get("p95_ms") and new["p95_ms"] > old["p95_ms"] * (1 + max_regression):
+                regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark API endpoints and transcription.")
+    parser.add_argument("--only", choices=("api", "transcription"), help="run one suite")
+    parser.add_argument("--filter", help="only API scenarios whose name contains this")
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per API scenario")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--memory-requests", type=int, default=3)
+    parser.add_argument("--audio-seconds", type=int, nargs="+", default=[30, 300])
+    parser.add_argument("--transcriptions", type=int, default=5, help="timed runs per audio file (fake model)")
+    parser.add_argument("--real-whisper", action="store_true", help="also run Whisper tiny once per file")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="result file (default benchmarks/results/<time>_<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to diff against")
+    parser.add_argument("--max-regression", type=float, help="with --compare, exit 1 if any p95 grew by more than this fraction")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="call-audit-bench-")
+    prepare_environment(workdir)
+    sys.path.insert(0, ROOT)
+
+    commit, dirty = git_revision()
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        }
+    }
+    if args.only in (None, "api"):
+        report["api"] = bench_api(args, workdir)
+    if args.only in (None, "transcription"):
+        report["transcription"] = bench_transcription(args, workdir)
+    # ru_maxrss is KiB on Linux
+    report["meta"]["peak_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.max_regression)
+        if regressions:
+            print(f"p95 regressions beyond {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+SQLite stand-in for the MySQL connection pool, for benchmarks only.
+
+It speaks the subset of the mysql.connector API the app uses (cursor(dictionary=...),
+execute/executemany with %s placeholders, fetchone/fetchall, lastrowid, rowcount,
+commit/rollback/close) and rewrites the few MySQL-only bits of SQL the benchmarked
+endpoints send. Install it with `core.database._pool = StandInPool(path)` before
+the first request.
+"""
+import queue
+import random
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from core import call_text
+
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(sep=" "))
+
+REWRITES = [
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\bNOW\(\)", re.IGNORECASE), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\s+FOR UPDATE\b", re.IGNORECASE), ""),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS User (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT, email TEXT, password TEXT
+);
+CREATE TABLE IF NOT EXISTS Agent (
+    agent_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    agent_name TEXT, email TEXT, agent_code TEXT
+);
+CREATE TABLE IF NOT EXISTS Calls (
+    call_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    agent_id INTEGER, user_id INTEGER, caller_number TEXT, call_date TEXT, duration REAL,
+    audio_file TEXT, audio_sha256 TEXT, upload_date TEXT,
+    greeting_score REAL, compliance_status TEXT, knowledge_score REAL, empathy_score REAL,
+    script_adherence_score REAL, overall_score REAL
+);
+CREATE TABLE IF NOT EXISTS Call_Text (
+    call_id INTEGER PRIMARY KEY, transcription_text BLOB, ai_summary BLOB, remarks TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_calls_agent ON Calls (agent_id, call_id);
+CREATE INDEX IF NOT EXISTS idx_calls_user ON Calls (user_id, call_id);
+CREATE TABLE IF NOT EXISTS Knowledge_Graph (
+    knowledge_graph_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER, upload_time TEXT DEFAULT CURRENT_TIMESTAMP, json_data TEXT, json_compressed BLOB
+);
+"""
+
+WORDS = (
+    "hello thank you for calling how can i help refund order account cancel billing "
+    "payment card delivery late package address update plan upgrade discount offer "
+    "policy warranty return replace technician appointment schedule confirm email "
+    "number verify security password reset issue resolved anything else great day"
+).split()
+
+
+def translate(sql: str) -> str:
+    for pattern, replacement in REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+class StandInCursor:
+    def __init__(self, conn, dictionary=False):
+        self._cur = conn.cursor()
+        self.dictionary = dictionary
+
+    def execute(self, sql, params=()):
+        self._cur.execute(translate(sql), tuple(params or ()))
+
+    def executemany(self, sql, rows):
+        self._cur.executemany(translate(sql), [tuple(r) for r in rows])
+
+    def _row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        return {d[0]: v for d, v in zip(self._cur.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cur.fetchone())
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cur.fetchall()]
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def close(self):
+        self._cur.close()
+
+
+class StandInConnection:
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def cursor(self, dictionary=False, **_):
+        return StandInCursor(self._conn, dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._pool.release(self._conn)
+
+
+class StandInPool:
+    """Fixed set of SQLite connections handed out like core.database.ConnectionPool."""
+
+    def __init__(self, path, size=10):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.commit()
+        self._idle.put(conn)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode = WAL")
+        with self._lock:
+            self._created += 1
+        return conn
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect() if self._created < self.size else self._idle.get()
+        return StandInConnection(self, conn)
+
+    def release(self, conn):
+        conn.rollback()
+        self._idle.put(conn)
+
+    def stats(self):
+        return {"size": self.size, "open": self._created, "idle": self._idle.qsize()}
+
+    def close_all(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+def synthetic_transcript(rng, words=120):
+    return ". ".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))).capitalize()
+        for _ in range(max(1, words // 10))
+    ) + "."
+
+
+def seed(pool, agents=50, users=5, calls=10000, scored_fraction=0.6, transcribed_fraction=0.8,
+         seed_value=1234, batch_size=5000):
+    """Fills the stand-in with deterministic synthetic users, agents and calls."""
+    rng = random.Random(seed_value)
+    conn = pool.acquire()
+    cur = conn.cursor()
+    try:
+        cur.executemany(
+            "INSERT INTO User (username, email, password) VALUES (%s, %s, %s)",
+            [(f"user{i}", f"user{i}@example.com", "x") for i in range(1, users + 1)]
+        )
+        cur.executemany(
+            "INSERT INTO Agent (agent_name, email, agent_code) VALUES (%s, %s, %s)",
+            [(f"Agent {i}", f"agent{i}@example.com", f"A{i:04d}") for i in range(1, agents + 1)]
+        )
+        start = datetime(2025, 1, 1)
+        rows = []
+        for i in range(calls):
+            scored = rng.random() < scored_fraction
+            transcribed = rng.random() < transcribed_fraction
+            scores = [round(rng.uniform(1, 5), 2) for _ in range(5)] if scored else [None] * 5
+            rows.append((
+                rng.randint(1, agents), rng.randint(1, users), f"+1555{rng.randint(0, 9999999):07d}",
+                start + timedelta(minutes=7 * i), round(rng.uniform(30, 900), 1), f"calls/bench_{i}.wav",
+                scores[0], ("compliant" if rng.random() < 0.8 else "non-compliant") if scored else None,
+                scores[1], scores[2], scores[3], scores[4],
+                synthetic_transcript(rng) if transcribed else None,
+                synthetic_transcript(rng, 30) if transcribed else None,
+                "Handled well" if scored else None,
+            ))
+            if len(rows) >= batch_size:
+                _insert_calls(cur, rows)
+                rows = []
+        if rows:
+            _insert_calls(cur, rows)
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _insert_calls(cur, rows):
+    cur.execute("SELECT COALESCE(MAX(call_id), 0) FROM Calls")
+    first_id = cur.fetchone()[0] + 1
+    cur.executemany("""
+        INSERT INTO Calls (
+            agent_id, user_id, caller_number, call_date, duration, audio_file, upload_date,
+            greeting_score, compliance_status, knowledge_score, empathy_score,
+            script_adherence_score, overall_score
+        ) VALUES (%s, %s, %s, %s, %s, %s, NOW(), %s, %s, %s, %s, %s, %s)
+    """, [row[:-3] for row in rows])
+    cur.executemany(
+        "INSERT INTO Call_Text (call_id, transcription_text, ai_summary, remarks) VALUES (%s, %s, %s, %s)",
+        [(first_id + i, call_text.compress(row[-3]), call_text.compress(row[-2]), row[-1])
+         for i, row in enumerate(rows) if any(row[-3:])]
+    )
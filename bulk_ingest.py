@@ -0,0 +1,65 @@
+"""
+Bulk-loads a directory of call recordings into Calls.
+
+    python bulk_ingest.py calls/ --user-id 1 --sidecar calls/metadata.csv --transcribe
+
+Agent, date and caller metadata come from the file names (dialer exports
+and files saved by /calls/upload-audio) and an optional sidecar CSV with a
+`filename` column. Files already in Calls (same sha256) are skipped, so an
+interrupted run can be restarted with the same arguments.
+"""
+import argparse
+import json
+
+from core.config import settings
+from core.database import get_connection
+from core.ingest import BulkIngest, LINK_MODES, load_sidecar
+from core.jobs import TranscriptionJobQueue
+from core.migrations import migrate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest a directory of call recordings into Calls.")
+    parser.add_argument("directory", help="directory to walk for audio files")
+    parser.add_argument("--sidecar", help="CSV with filename,agent_id,user_id,caller_number,call_date,duration")
+    parser.add_argument("--agent-id", type=int, help="agent for files whose name/sidecar does not say")
+    parser.add_argument("--user-id", type=int, help="user (tenant) for files whose name/sidecar does not say")
+    parser.add_argument("--mode", choices=LINK_MODES, default="copy", help="how files are placed in UPLOAD_DIR")
+    parser.add_argument("--upload-dir", default=settings.UPLOAD_DIR)
+    parser.add_argument("--batch-size", type=int, default=500, help="rows per INSERT transaction")
+    parser.add_argument("--workers", type=int, default=8, help="threads hashing and probing files")
+    parser.add_argument("--transcribe", action="store_true", help="queue a transcription batch for every inserted batch")
+    parser.add_argument("--model", help="Whisper model for --transcribe (default WHISPER_MODEL)")
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+
+    queue = None
+    if args.transcribe:
+        # Jobs are picked up by the API's transcription workers
+        queue = TranscriptionJobQueue(connect=get_connection)
+
+    ingest = BulkIngest(
+        connect=get_connection,
+        upload_dir=args.upload_dir,
+        mode=args.mode,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        default_agent_id=args.agent_id,
+        default_user_id=args.user_id,
+        sidecar=load_sidecar(args.sidecar) if args.sidecar else None,
+        queue=queue,
+        model_name=args.model,
+    )
+    stats = ingest.run(args.directory)
+    stats.pop("batches")
+    stats["files_per_second"] = round(stats["files"] / stats["seconds"], 2) if stats["seconds"] else None
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
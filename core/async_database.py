@@ -0,0 +1,200 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from starlette.concurrency import run_in_threadpool
+
+from core.config import settings
+from core.metrics import DB_QUERY_SECONDS, DB_POOL_WAIT_SECONDS, statement_type
+
+
+class _ThreadedCursor:
+    """Awaitable facade over a pooled mysql.connector cursor; every call runs in the threadpool."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def execute(self, sql, params=None):
+        return await run_in_threadpool(self._cursor.execute, sql, params)
+
+    async def executemany(self, sql, seq_params):
+        return await run_in_threadpool(self._cursor.executemany, sql, seq_params)
+
+    async def fetchone(self):
+        return await run_in_threadpool(self._cursor.fetchone)
+
+    async def fetchall(self):
+        return await run_in_threadpool(self._cursor.fetchall)
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+
+class _TimedCursor:
+    """Records aiomysql statement times in the same histogram as the sync pool."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def execute(self, sql, params=None):
+        started = time.perf_counter()
+        try:
+            return await self._cursor.execute(sql, params)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, operation=statement_type(sql))
+
+    async def executemany(self, sql, seq_params):
+        started = time.perf_counter()
+        try:
+            return await self._cursor.executemany(sql, seq_params)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, operation=statement_type(sql))
+
+    async def fetchone(self):
+        return await self._cursor.fetchone()
+
+    async def fetchall(self):
+        return await self._cursor.fetchall()
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+
+class AsyncDatabase:
+    """
+    Database access for async routes, so a slow query never blocks the event loop.
+
+    Uses aiomysql with its own pool (ASYNC_DB_POOL_SIZE connections, separate
+    from the sync pool the threadpool routes use). When aiomysql is not
+    installed it falls back to the sync pool with every cursor call pushed
+    to the threadpool, which is slower but still never blocks the loop.
+    """
+
+    def __init__(self, size=None, timeout=None):
+        self.size = size or settings.ASYNC_DB_POOL_SIZE
+        self.timeout = timeout or settings.DB_POOL_TIMEOUT
+        self._pool = None
+        self._driver = None
+
+    async def start(self):
+        if self._driver:
+            return
+        try:
+            import aiomysql
+        except ImportError:
+            print("aiomysql is not installed; async routes use the sync pool via the threadpool")
+            self._driver = "threadpool"
+            return
+        self._pool = await aiomysql.create_pool(
+            host=settings.DB_HOST,
+            port=settings.DB_PORT,
+            user=settings.DB_USER,
+            password=settings.DB_PASSWORD,
+            db=settings.DB_NAME,
+            minsize=1,
+            maxsize=self.size,
+            autocommit=False,
+            pool_recycle=3600,
+        )
+        self._driver = "aiomysql"
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+        self._driver = None
+
+    @asynccontextmanager
+    async def transaction(self, dictionary=False):
+        """
+        Yields a cursor whose execute/executemany/fetchone/fetchall are
+        awaitable. Commits when the block exits normally, rolls back otherwise.
+        """
+        if not self._driver:
+            await self.start()
+        if self._driver == "threadpool":
+            async with self._threaded(dictionary) as cursor:
+                yield cursor
+            return
+
+        import aiomysql
+        started = time.perf_counter()
+        try:
+            conn = await asyncio.wait_for(self._pool.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"No async database connection available after {self.timeout}s")
+        DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+        try:
+            cursor = await conn.cursor(aiomysql.DictCursor if dictionary else aiomysql.Cursor)
+            try:
+                yield _TimedCursor(cursor)
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+            finally:
+                await cursor.close()
+        finally:
+            self._pool.release(conn)
+
+    @asynccontextmanager
+    async def _threaded(self, dictionary):
+        from core.database import get_connection
+        conn = await run_in_threadpool(get_connection)
+        cursor = conn.cursor(dictionary=dictionary)
+        try:
+            yield _ThreadedCursor(cursor)
+            await run_in_threadpool(conn.commit)
+        except BaseException:
+            await run_in_threadpool(conn.rollback)
+            raise
+        finally:
+            cursor.close()
+            await run_in_threadpool(conn.close)
+
+    async def execute(self, sql, params=None):
+        """Runs one write statement in its own transaction. Returns (lastrowid, rowcount)."""
+        async with self.transaction() as cursor:
+            await cursor.execute(sql, params)
+            return cursor.lastrowid, cursor.rowcount
+
+    async def fetchone(self, sql, params=None, dictionary=True):
+        async with self.transaction(dictionary) as cursor:
+            await cursor.execute(sql, params)
+            return await cursor.fetchone()
+
+    async def fetchall(self, sql, params=None, dictionary=True):
+        async with self.transaction(dictionary) as cursor:
+            await cursor.execute(sql, params)
+            return await cursor.fetchall()
+
+    def stats(self):
+        if self._driver != "aiomysql":
+            return {"driver": self._driver}
+        return {
+            "driver": self._driver,
+            "size": self._pool.size,
+            "free": self._pool.freesize,
+            "max": self._pool.maxsize,
+        }
+
+
+_db = None
+
+
+def get_async_db():
+    global _db
+    if _db is None:
+        _db = AsyncDatabase()
+    return _db
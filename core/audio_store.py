@@ -0,0 +1,379 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+
+from starlette.concurrency import run_in_threadpool
+
+from core.config import settings
+from utils.audio_processor import stream_to_file
+from utils.transcription_cache import hash_audio_file
+
+# Cold-storage codecs: file extension and ffmpeg output options. Whisper
+# resamples to 16 kHz mono anyway, so nothing it uses is lost.
+COLD_CODECS = {
+    "opus": ("opus", ["-c:a", "libopus", "-b:a", "24k", "-ac", "1", "-ar", "16000", "-application", "voip"]),
+    "flac": ("flac", ["-c:a", "flac", "-ac", "1", "-ar", "16000"]),
+}
+
+# Bumps the object's reference count, creating the row for a new object. The
+# row lock it takes is what serializes placing and removing the file.
+UPSERT_OBJECT = """
+    INSERT INTO Audio_Objects (sha256, path, size_bytes, ref_count)
+    VALUES (%s, %s, %s, 1)
+    ON DUPLICATE KEY UPDATE ref_count = ref_count + 1
+"""
+SELECT_OBJECT_PATH = "SELECT path FROM Audio_Objects WHERE sha256 = %s"
+
+# Objects still in their original encoding, oldest first; params (older_than_days, limit)
+COLD_CANDIDATES = """
+    SELECT sha256, path, size_bytes FROM Audio_Objects
+    WHERE codec IS NULL AND ref_count > 0 AND created_at < NOW() - INTERVAL %s DAY
+    ORDER BY created_at LIMIT %s
+"""
+
+
+def ensure_schema(conn):
+    """Creates Audio_Objects: one row per stored recording with the number of calls that use it."""
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS Audio_Objects (
+                sha256 CHAR(64) NOT NULL PRIMARY KEY,
+                path VARCHAR(1024) NOT NULL,
+                size_bytes BIGINT NOT NULL,
+                codec VARCHAR(16) NULL,
+                ref_count INT NOT NULL DEFAULT 0,
+                created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                transcoded_at DATETIME NULL,
+                INDEX idx_audio_objects_cold (codec, created_at)
+            )
+        """)
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def _sidecars(path):
+    # Decoded PCM and VAD metadata written next to the audio by utils.audio_preprocess
+    return [f"{path}.pcm.f32", f"{path}.vad.json"]
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class AudioStore:
+    """
+    Content-addressed recordings under UPLOAD_DIR/objects.
+
+    A recording is stored once at objects/<aa>/<bb>/<sha256><ext>, however
+    many calls reference it; Audio_Objects counts the references and the
+    file goes away with the last one. Sharding on the leading hash bytes
+    keeps every directory small, and since names derive from content two
+    uploads can never overwrite each other.
+    """
+
+    def __init__(self, root=None, shard_depth=None):
+        self.root = root or settings.UPLOAD_DIR
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.staging_dir = os.path.join(self.root, ".staging")
+        self.shard_depth = shard_depth if shard_depth is not None else settings.AUDIO_STORE_SHARD_DEPTH
+
+    def object_path(self, sha256, ext=""):
+        shards = [sha256[2 * i:2 * i + 2] for i in range(self.shard_depth)]
+        return os.path.join(self.objects_dir, *shards, sha256 + ext.lower())
+
+    def is_stored(self, path):
+        return os.path.abspath(path).startswith(os.path.abspath(self.objects_dir) + os.sep)
+
+    # ----- writing -----
+    def stage_upload(self, source, filename):
+        """
+        Streams a file-like object into the staging area, hashing on the way.
+        Blocking. Returns (staged_path, sha256, size); hand the staged path
+        to place() once the object row is locked.
+        """
+        os.makedirs(self.staging_dir, exist_ok=True)
+        ext = os.path.splitext(filename or "")[1]
+        staged = os.path.join(self.staging_dir, uuid.uuid4().hex + ext.lower())
+        source.seek(0)
+        sha256, size = stream_to_file(source, staged)
+        return staged, sha256, size
+
+    def place(self, staged, path):
+        """
+        Moves a staged file to `path`, or drops it when the object is already
+        stored (a duplicate upload). Call while holding the Audio_Objects row
+        lock. Returns True when the file was placed, False for a duplicate.
+        """
+        if os.path.exists(path):
+            _remove_quietly(staged)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(staged, path)
+        return True
+
+    async def claim(self, cur, staged, sha256, size):
+        """
+        Async-route counterpart of UPSERT_OBJECT + place(): takes a reference
+        on the object inside the caller's transaction (an AsyncDatabase
+        cursor). Returns (stored path for Calls.audio_file, placed); when
+        `placed` is true and the transaction does not commit, hand the path
+        to drop_unreferenced().
+        """
+        await cur.execute(UPSERT_OBJECT, (sha256, self.object_path(sha256, os.path.splitext(staged)[1]), size))
+        await cur.execute(SELECT_OBJECT_PATH, (sha256,))
+        (path,) = await cur.fetchone()
+        # Placed while the object row is locked, so a delete of its last call cannot race it
+        placed = await run_in_threadpool(self.place, staged, path)
+        return path, placed
+
+    async def drop_unreferenced(self, transaction, sha256, path):
+        """
+        Removes a file placed by claim() whose transaction rolled back, unless
+        another upload has referenced the object since. The FOR UPDATE lookup
+        locks the key (a gap lock when the row is missing), so a concurrent
+        upload of the same recording waits instead of losing its file.
+        """
+        async with transaction() as cur:
+            await cur.execute("SELECT ref_count FROM Audio_Objects WHERE sha256 = %s FOR UPDATE", (sha256,))
+            if await cur.fetchone() is None:
+                await run_in_threadpool(_remove_quietly, path)
+
+    def put_file(self, source, sha256, mode="copy", path=None, size=None):
+        """
+        Stores an existing file (bulk ingest and legacy migration) by copy,
+        hardlink, symlink or move, at `path` (default: its object path).
+        Copies go through a temp file that is renamed into place only once its
+        sha256 matches, so a crash never leaves a truncated object behind. An
+        existing object whose size differs from `size` is treated as damaged
+        and replaced.
+        """
+        path = path or self.object_path(sha256, os.path.splitext(source)[1])
+        if os.path.exists(path):
+            if size is None or os.path.getsize(path) == size:
+                return path
+            _remove_quietly(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if mode == "hardlink":
+            os.link(source, path)
+        elif mode == "symlink":
+            os.symlink(os.path.abspath(source), path)
+        elif mode == "move":
+            os.replace(source, path)
+        else:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+            os.close(fd)
+            try:
+                shutil.copyfile(source, tmp_path)
+                if hash_audio_file(tmp_path) != sha256:
+                    raise OSError(f"copy of {source} does not match sha256 {sha256}")
+                os.replace(tmp_path, path)
+            except BaseException:
+                _remove_quietly(tmp_path)
+                raise
+        return path
+
+    def discard_staged(self, staged):
+        _remove_quietly(staged)
+
+    # ----- releasing -----
+    def release(self, cur, sha256, audio_file=None):
+        """
+        Drops one reference inside the caller's transaction (cur is a tuple
+        cursor; the Calls row must already be deleted). When it was the last
+        one the object row is deleted and the file renamed to a tombstone,
+        still under the row lock. Returns the tombstones: purge() them after
+        commit, restore() them on rollback.
+
+        Calls from before the store have no sha256; their file is removed once
+        no other call points at it.
+        """
+        if not sha256:
+            if not audio_file or not os.path.exists(audio_file):
+                return []
+            cur.execute("SELECT COUNT(*) FROM Calls WHERE audio_file = %s", (audio_file,))
+            if cur.fetchone()[0]:
+                return []
+            return self._tombstone([audio_file])
+
+        cur.execute("SELECT path, ref_count FROM Audio_Objects WHERE sha256 = %s FOR UPDATE", (sha256,))
+        row = cur.fetchone()
+        if not row:
+            return []
+        path, ref_count = row
+        if ref_count > 1:
+            cur.execute("UPDATE Audio_Objects SET ref_count = ref_count - 1 WHERE sha256 = %s", (sha256,))
+            return []
+        cur.execute("DELETE FROM Audio_Objects WHERE sha256 = %s", (sha256,))
+        return self._tombstone([path])
+
+    def _tombstone(self, paths):
+        moved = []
+        for path in paths:
+            for original in [path] + _sidecars(path):
+                if os.path.exists(original):
+                    tombstone = f"{original}.deleted-{uuid.uuid4().hex[:8]}"
+                    os.replace(original, tombstone)
+                    moved.append((original, tombstone))
+        return moved
+
+    def purge(self, tombstones):
+        for _, tombstone in tombstones:
+            _remove_quietly(tombstone)
+
+    def restore(self, tombstones):
+        for original, tombstone in tombstones:
+            if os.path.exists(tombstone):
+                os.replace(tombstone, original)
+
+    # ----- maintenance -----
+    def transcode_cold(self, connect, older_than_days=None, codec=None, limit=500, log=print):
+        """
+        Re-encodes objects older than `older_than_days` that are still in
+        their upload format to the compact cold codec, then points
+        Audio_Objects and every referencing Calls row at the new file.
+        Objects whose row changed while ffmpeg ran are left alone.
+        Returns {"transcoded", "bytes_before", "bytes_after", "failed"}.
+        """
+        older_than_days = settings.AUDIO_STORE_COLD_AFTER_DAYS if older_than_days is None else older_than_days
+        codec = codec or settings.AUDIO_STORE_COLD_CODEC
+        if codec not in COLD_CODECS:
+            raise ValueError(f"Unknown codec {codec!r}; use {', '.join(COLD_CODECS)}")
+        ext, options = COLD_CODECS[codec]
+        stats = {"transcoded": 0, "bytes_before": 0, "bytes_after": 0, "failed": 0}
+
+        conn = connect()
+        cur = conn.cursor()
+        try:
+            cur.execute(COLD_CANDIDATES, (older_than_days, limit))
+            candidates = cur.fetchall()
+            conn.commit()
+
+            for sha256, path, size in candidates:
+                target = self.object_path(sha256, "." + ext)
+                if os.path.abspath(target) == os.path.abspath(path):
+                    # Uploaded in the cold container already; re-encode beside it so the
+                    # original stays in place until the new row is committed
+                    target = self.object_path(sha256, f".cold.{ext}")
+                if not os.path.exists(path):
+                    continue
+                tmp_path = f"{target}.{uuid.uuid4().hex[:8]}.part"
+                try:
+                    subprocess.run(
+                        ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", path, *options, "-f", ext, tmp_path],
+                        check=True, capture_output=True,
+                    )
+                except (OSError, subprocess.CalledProcessError) as e:
+                    _remove_quietly(tmp_path)
+                    stats["failed"] += 1
+                    log(f"transcode failed for {path}: {e}")
+                    continue
+
+                new_size = os.path.getsize(tmp_path)
+                cur.execute("SELECT path, ref_count FROM Audio_Objects WHERE sha256 = %s FOR UPDATE", (sha256,))
+                row = cur.fetchone()
+                if not row or row[0] != path or not row[1]:
+                    conn.rollback()
+                    _remove_quietly(tmp_path)
+                    continue
+                os.replace(tmp_path, target)
+                try:
+                    cur.execute("""
+                        UPDATE Audio_Objects
+                        SET path = %s, size_bytes = %s, codec = %s, transcoded_at = NOW()
+                        WHERE sha256 = %s
+                    """, (target, new_size, codec, sha256))
+                    cur.execute("UPDATE Calls SET audio_file = %s WHERE audio_sha256 = %s", (target, sha256))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    _remove_quietly(target)
+                    raise
+                for old in [path] + _sidecars(path):
+                    _remove_quietly(old)
+                stats["transcoded"] += 1
+                stats["bytes_before"] += size
+                stats["bytes_after"] += new_size
+        finally:
+            cur.close()
+            conn.close()
+        return stats
+
+    def adopt_legacy(self, connect, batch_size=200, log=print):
+        """
+        Moves recordings saved before the store (flat files in UPLOAD_DIR)
+        into it and repoints their Calls rows. Files shared by several rows
+        and identical recordings under different names collapse into one
+        object. Safe to re-run; rows whose file is missing are reported and skipped.
+        Returns {"adopted", "deduplicated", "missing", "failed"}.
+        """
+        stats = {"adopted": 0, "deduplicated": 0, "missing": 0, "failed": 0}
+        prefix = os.path.abspath(self.objects_dir) + os.sep
+        last_id = 0
+        conn = connect()
+        cur = conn.cursor()
+        try:
+            while True:
+                cur.execute("""
+                    SELECT call_id, audio_file FROM Calls
+                    WHERE call_id > %s AND audio_file IS NOT NULL AND audio_file NOT LIKE %s
+                    ORDER BY call_id LIMIT %s
+                """, (last_id, prefix + "%", batch_size))
+                rows = cur.fetchall()
+                conn.commit()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                for call_id, audio_file in rows:
+                    if not os.path.exists(audio_file):
+                        stats["missing"] += 1
+                        log(f"call {call_id}: audio file {audio_file} is missing")
+                        continue
+                    sha256 = hash_audio_file(audio_file)
+                    size = os.path.getsize(audio_file)
+                    cur.execute(UPSERT_OBJECT, (sha256, self.object_path(sha256, os.path.splitext(audio_file)[1]), size))
+                    cur.execute(SELECT_OBJECT_PATH, (sha256,))
+                    path = cur.fetchone()[0]
+                    cur.execute(
+                        "UPDATE Calls SET audio_file = %s, audio_sha256 = %s WHERE call_id = %s",
+                        (path, sha256, call_id)
+                    )
+                    existed = os.path.exists(path)
+                    try:
+                        # Under the object row lock, and committed only once the object is complete
+                        self.put_file(audio_file, sha256, "copy", path=path, size=size)
+                    except OSError as e:
+                        conn.rollback()
+                        stats["failed"] += 1
+                        log(f"call {call_id}: could not store {audio_file}: {e}")
+                        continue
+                    if existed:
+                        stats["deduplicated"] += 1
+                    conn.commit()
+                    # Other rows may still point at the flat file; the last one to move removes it
+                    cur.execute("SELECT COUNT(*) FROM Calls WHERE audio_file = %s", (audio_file,))
+                    if not cur.fetchone()[0]:
+                        for old in [audio_file] + _sidecars(audio_file):
+                            _remove_quietly(old)
+                    conn.commit()
+                    stats["adopted"] += 1
+        finally:
+            cur.close()
+            conn.close()
+        return stats
+
+
+_store = None
+
+
+def get_audio_store():
+    global _store
+    if _store is None:
+        _store = AudioStore()
+    return _store
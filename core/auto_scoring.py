@@ -0,0 +1,256 @@
+import math
+from collections import Counter, OrderedDict
+
+import numpy as np
+import scipy.sparse as sp
+
+from core import call_text, knowledge_store
+from core.config import settings
+from utils.text_processing import terms, split_sentences, flatten_knowledge
+
+GREETING_SENTENCES = 3
+
+PROPOSALS_DDL = """
+CREATE TABLE IF NOT EXISTS Call_Score_Proposals (
+    call_id INT NOT NULL PRIMARY KEY,
+    greeting_score DOUBLE NULL,
+    knowledge_score DOUBLE NULL,
+    script_adherence_score DOUBLE NULL,
+    knowledge_coverage DOUBLE NULL,
+    knowledge_items INT NOT NULL DEFAULT 0,
+    scored_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+)
+"""
+
+
+def ensure_schema(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute(PROPOSALS_DDL)
+        conn.commit()
+    finally:
+        cur.close()
+
+
+class KnowledgeModel:
+    """
+    TF-IDF model of one user's knowledge graph entries.
+
+    Every string leaf in the graph is a knowledge item; leaves under a key
+    containing "script" are also script lines and leaves under "greeting"
+    are expected greetings. The vocabulary is the graph's own terms, so
+    sentence vectors stay narrow; terms outside it still count towards each
+    sentence's norm so cosine similarities are not inflated. Term matrices
+    are sparse CSR: a multi-MB graph has hundreds of thousands of unigrams
+    and bigrams, but each row uses a handful of them.
+    """
+
+    def __init__(self, documents):
+        self.items = []
+        self.script = []
+        self.greetings = []
+        for document in documents:
+            for path, text in flatten_knowledge(document):
+                keys = " ".join(path).lower()
+                index = len(self.items)
+                self.items.append(text)
+                if "script" in keys:
+                    self.script.append(index)
+                if "greeting" in keys:
+                    self.greetings.append(index)
+
+        item_terms = [Counter(terms(text)) for text in self.items]
+        df = Counter()
+        for counts in item_terms:
+            df.update(counts.keys())
+        n = len(self.items)
+        self.vocab = {term: i for i, term in enumerate(df)}
+        self.idf = np.array([math.log((1 + n) / (1 + df[t])) + 1 for t in self.vocab], dtype=np.float32)
+        self.unknown_idf = math.log(1 + n) + 1
+        # vocab x items, so sentence rows multiply straight into sentence x item similarities
+        self.matrix_t = self._vectorize(item_terms).T.tocsc()
+
+    def _vectorize(self, term_counts):
+        indptr = [0]
+        indices = []
+        data = []
+        vocab, idf, unknown_idf = self.vocab, self.idf, self.unknown_idf
+        for counts in term_counts:
+            total = 0.0
+            start = len(data)
+            for term, tf in counts.items():
+                j = vocab.get(term)
+                if j is None:
+                    total += (tf * unknown_idf) ** 2
+                else:
+                    weight = float(tf * idf[j])
+                    indices.append(j)
+                    data.append(weight)
+                    total += weight * weight
+            norm = math.sqrt(total) or 1.0
+            for k in range(start, len(data)):
+                data[k] /= norm
+            indptr.append(len(data))
+        return sp.csr_matrix(
+            (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(term_counts), len(self.vocab))
+        )
+
+    def vectorize(self, sentences):
+        return self._vectorize([Counter(terms(s)) for s in sentences])
+
+
+def score_transcripts(model: KnowledgeModel, transcripts, threshold=None):
+    """
+    Scores many transcripts against one knowledge model. Sentence-by-item
+    similarities are computed in windows of sentence rows sized so that no
+    more than AUTO_SCORE_MAX_SIM_CELLS are dense at once, and folded into
+    each call's best match per item. Returns one dict per transcript.
+    """
+    threshold = settings.AUTO_SCORE_MATCH_THRESHOLD if threshold is None else threshold
+    sentence_lists = [split_sentences(t) for t in transcripts]
+    counts = np.array([len(s) for s in sentence_lists])
+    results = [
+        {"greeting_score": None, "knowledge_score": None, "script_adherence_score": None,
+         "knowledge_coverage": None, "knowledge_items": len(model.items)}
+        for _ in transcripts
+    ]
+    if not model.items or counts.sum() == 0:
+        return results
+
+    sentences = model.vectorize([s for sentence_list in sentence_lists for s in sentence_list])
+    has_text = np.flatnonzero(counts)
+    offsets = np.concatenate(([0], np.cumsum(counts)))[:-1][has_text]
+    call_of_row = np.repeat(np.arange(len(has_text)), counts[has_text])
+
+    # Best match of every knowledge item within each call; a window may cut a
+    # call in two, so each window's maxima are folded into `best`
+    n_items = len(model.items)
+    best = np.zeros((len(has_text), n_items), dtype=np.float32)
+    window = max(1, settings.AUTO_SCORE_MAX_SIM_CELLS // n_items)
+    for start in range(0, sentences.shape[0], window):
+        sims = (sentences[start:start + window] @ model.matrix_t).toarray()
+        calls = call_of_row[start:start + window]
+        firsts = np.flatnonzero(np.r_[True, calls[1:] != calls[:-1]])
+        rows = calls[firsts]
+        best[rows] = np.maximum(best[rows], np.maximum.reduceat(sims, firsts, axis=0))
+
+    coverage = (best >= threshold).mean(axis=1)
+    knowledge = np.minimum(5.0 * coverage / settings.AUTO_SCORE_FULL_COVERAGE, 5.0)
+    script = best[:, model.script].mean(axis=1) * 5.0 if model.script else None
+    greeting = None
+    if model.greetings:
+        first = [np.arange(o, o + min(c, GREETING_SENTENCES)) for o, c in zip(offsets, counts[has_text])]
+        opening = (sentences[np.concatenate(first)] @ model.matrix_t[:, model.greetings]).toarray()
+        lengths = np.minimum(counts[has_text], GREETING_SENTENCES)
+        starts = np.concatenate(([0], np.cumsum(lengths)))[:-1]
+        greeting = np.maximum.reduceat(opening.max(axis=1), starts) * 5.0
+
+    for k, i in enumerate(has_text):
+        results[i].update({
+            "knowledge_coverage": round(float(coverage[k]), 4),
+            "knowledge_score": round(float(knowledge[k]), 2),
+            "script_adherence_score": round(float(min(script[k], 5.0)), 2) if script is not None else None,
+            "greeting_score": round(float(min(greeting[k], 5.0)), 2) if greeting is not None else None,
+        })
+    return results
+
+
+def _load_models(cur, user_ids, models):
+    """
+    Makes sure `models` (an OrderedDict, least recently used first) holds a
+    model for every user in `user_ids`, evicting other users' models beyond
+    AUTO_SCORE_MAX_MODELS.
+    """
+    for user_id in user_ids:
+        if user_id in models:
+            models.move_to_end(user_id)
+    missing = [u for u in user_ids if u not in models]
+    excess = len(models) + len(missing) - settings.AUTO_SCORE_MAX_MODELS
+    for user_id in [u for u in models if u not in user_ids][:max(0, excess)]:
+        del models[user_id]
+    if not missing:
+        return
+    documents = {u: [] for u in missing}
+    cur.execute(
+        f"SELECT user_id, json_data, json_compressed FROM Knowledge_Graph WHERE user_id IN ({', '.join(['%s'] * len(missing))})",
+        tuple(missing)
+    )
+    for user_id, json_data, json_compressed in cur.fetchall():
+        documents[user_id].append(knowledge_store.decode(json_compressed, json_data))
+    for user_id, docs in documents.items():
+        models[user_id] = KnowledgeModel(docs)
+
+
+def auto_score_calls(conn, call_ids=None, agent_id=None, date_from=None, date_to=None,
+                     only_unscored=False, batch_size=None):
+    """
+    Proposes greeting/knowledge/script scores for every transcribed call that
+    matches the filters, batch by batch, against the knowledge graph of the
+    call's user. Proposals are upserted into Call_Score_Proposals with one
+    executemany per batch. Returns the number of calls scored.
+    """
+    batch_size = batch_size or settings.AUTO_SCORE_BATCH_CALLS
+    clauses = ["transcription_text IS NOT NULL"]
+    params = []
+    if call_ids:
+        clauses.append(f"call_id IN ({', '.join(['%s'] * len(call_ids))})")
+        params.extend(call_ids)
+    if agent_id is not None:
+        clauses.append("agent_id = %s")
+        params.append(agent_id)
+    if date_from is not None:
+        clauses.append("call_date >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        clauses.append("call_date < %s")
+        params.append(date_to)
+    if only_unscored:
+        clauses.append("call_id NOT IN (SELECT call_id FROM Call_Score_Proposals)")
+
+    models = OrderedDict()
+    scored = 0
+    last_id = 0
+    cur = conn.cursor()
+    try:
+        while True:
+            cur.execute(
+                f"SELECT call_id, user_id, transcription_text FROM {call_text.CALLS_WITH_TEXT} "
+                f"WHERE {' AND '.join(clauses)} AND call_id > %s ORDER BY call_id LIMIT %s",
+                tuple(params + [last_id, batch_size])
+            )
+            rows = cur.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            by_user = {}
+            for call_id, user_id, text in rows:
+                by_user.setdefault(user_id, []).append((call_id, call_text.decompress(text)))
+            _load_models(cur, list(by_user), models)
+
+            proposals = []
+            for user_id, calls in by_user.items():
+                results = score_transcripts(models[user_id], [text for _, text in calls])
+                for (call_id, _), r in zip(calls, results):
+                    proposals.append((
+                        call_id, r["greeting_score"], r["knowledge_score"], r["script_adherence_score"],
+                        r["knowledge_coverage"], r["knowledge_items"]
+                    ))
+            cur.executemany("""
+                INSERT INTO Call_Score_Proposals
+                    (call_id, greeting_score, knowledge_score, script_adherence_score,
+                     knowledge_coverage, knowledge_items)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    greeting_score = VALUES(greeting_score),
+                    knowledge_score = VALUES(knowledge_score),
+                    script_adherence_score = VALUES(script_adherence_score),
+                    knowledge_coverage = VALUES(knowledge_coverage),
+                    knowledge_items = VALUES(knowledge_items)
+            """, proposals)
+            conn.commit()
+            scored += len(proposals)
+    finally:
+        cur.close()
+    return scored
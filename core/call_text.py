@@ -0,0 +1,166 @@
+import zlib
+
+# The large per-call text lives in Call_Text (one row per call) rather than in
+# Calls, so scans over the hot columns -- lists, scores, rollups -- never pull
+# transcripts through the buffer pool. Transcript and summary are stored
+# zlib-compressed; remarks are short and stay plain so score queries can read
+# them directly.
+TEXT_COLUMNS = ("transcription_text", "ai_summary", "remarks")
+COMPRESSED_COLUMNS = ("transcription_text", "ai_summary")
+COMPRESSION_LEVEL = 6
+
+# FROM clause for queries that need text next to Calls columns; USING keeps
+# unqualified call_id unambiguous
+CALLS_WITH_TEXT = "Calls LEFT JOIN Call_Text USING (call_id)"
+
+
+def compress(text):
+    if text is None:
+        return None
+    if isinstance(text, str):
+        text = text.encode("utf-8")
+    return zlib.compress(bytes(text), COMPRESSION_LEVEL)
+
+
+def decompress(value):
+    if value is None or isinstance(value, str):
+        return value
+    return zlib.decompress(value).decode("utf-8")
+
+
+def encode(column, text):
+    return compress(text) if column in COMPRESSED_COLUMNS else text
+
+
+def decode(column, value):
+    if column in COMPRESSED_COLUMNS:
+        return decompress(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8")
+    return value
+
+
+def decode_row(row: dict) -> dict:
+    for column in TEXT_COLUMNS:
+        if column in row:
+            row[column] = decode(column, row[column])
+    return row
+
+
+def split_columns(columns):
+    """Splits a projected Calls column list into (Calls columns, Call_Text columns)."""
+    return [c for c in columns if c not in TEXT_COLUMNS], [c for c in columns if c in TEXT_COLUMNS]
+
+
+def save(cur, column, items):
+    """
+    Upserts one text column for many calls in a single statement. `items` is
+    a list of (call_id, text) pairs; the call's other text columns are kept.
+    """
+    if column not in TEXT_COLUMNS:
+        raise ValueError(f"Unknown text column {column!r}")
+    if not items:
+        return
+    params = []
+    for call_id, text in items:
+        params.extend([call_id, encode(column, text)])
+    cur.execute(
+        f"INSERT INTO Call_Text (call_id, {column}) VALUES {', '.join(['(%s, %s)'] * len(items))} "
+        f"ON DUPLICATE KEY UPDATE {column} = VALUES({column})",
+        tuple(params)
+    )
+
+
+def load_query(call_ids, columns=TEXT_COLUMNS):
+    return (
+        f"SELECT call_id, {', '.join(columns)} FROM Call_Text "
+        f"WHERE call_id IN ({', '.join(['%s'] * len(call_ids))})",
+        tuple(call_ids)
+    )
+
+
+def load(cur, call_ids, columns=TEXT_COLUMNS):
+    """{call_id: {column: text}} for the calls that have a Call_Text row."""
+    if not call_ids or not columns:
+        return {}
+    cur.execute(*load_query(call_ids, columns))
+    texts = {}
+    for row in cur.fetchall():
+        values = [row[c] for c in ("call_id",) + tuple(columns)] if isinstance(row, dict) else row
+        texts[values[0]] = {c: decode(c, v) for c, v in zip(columns, values[1:])}
+    return texts
+
+
+def attach(cur, rows, columns):
+    """Fills the requested text columns into dictionary Calls rows with one extra query."""
+    _, text_columns = split_columns(columns)
+    if not rows or not text_columns:
+        return rows
+    texts = load(cur, [row["call_id"] for row in rows], text_columns)
+    for row in rows:
+        found = texts.get(row["call_id"], {})
+        for column in text_columns:
+            row[column] = found.get(column)
+    return rows
+
+
+def delete(cur, call_id):
+    cur.execute("DELETE FROM Call_Text WHERE call_id = %s", (call_id,))
+
+
+def ensure_schema(conn, batch_size=2000, log=print):
+    """
+    Creates Call_Text and, for databases that still keep the text in Calls,
+    copies it over in call_id batches and drops the old columns. The copy
+    never overwrites text already written to Call_Text, so an interrupted
+    migration can simply run again.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS Call_Text (
+                call_id INT NOT NULL PRIMARY KEY,
+                transcription_text LONGBLOB NULL,
+                ai_summary MEDIUMBLOB NULL,
+                remarks TEXT NULL
+            ) ROW_FORMAT=DYNAMIC
+        """)
+        cur.execute(f"""
+            SELECT COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Calls'
+            AND COLUMN_NAME IN ({', '.join(['%s'] * len(TEXT_COLUMNS))})
+        """, TEXT_COLUMNS)
+        found = {row[0].decode() if isinstance(row[0], (bytes, bytearray)) else row[0] for row in cur.fetchall()}
+        legacy = [c for c in TEXT_COLUMNS if c in found]
+        conn.commit()
+        if not legacy:
+            return
+
+        copied = 0
+        last_id = 0
+        any_text = " OR ".join(f"{c} IS NOT NULL" for c in legacy)
+        keep_existing = ", ".join(f"{c} = COALESCE({c}, VALUES({c}))" for c in legacy)
+        while True:
+            cur.execute(
+                f"SELECT call_id, {', '.join(legacy)} FROM Calls "
+                f"WHERE call_id > %s AND ({any_text}) ORDER BY call_id LIMIT %s",
+                (last_id, batch_size)
+            )
+            rows = cur.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            cur.executemany(
+                f"INSERT INTO Call_Text (call_id, {', '.join(legacy)}) "
+                f"VALUES ({', '.join(['%s'] * (len(legacy) + 1))}) "
+                f"ON DUPLICATE KEY UPDATE {keep_existing}",
+                [(row[0], *(encode(c, v) for c, v in zip(legacy, row[1:]))) for row in rows]
+            )
+            conn.commit()
+            copied += len(rows)
+            log(f"Call_Text migration: copied text for {copied} calls")
+        cur.execute("ALTER TABLE Calls " + ", ".join(f"DROP COLUMN {c}" for c in legacy))
+        conn.commit()
+        log(f"Call_Text migration: moved {', '.join(legacy)} out of Calls ({copied} calls)")
+    finally:
+        cur.close()
@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 from pydantic import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,9 +8,103 @@ class Settings(BaseSettings):
     APP_VERSION: str = "1.0.0"
     DB_HOST: str = os.getenv("DB_HOST", "localhost")
     DB_USER: str = os.getenv("DB_USER", "root")
+    # Only ever supplied through the environment
     DB_PASSWORD: str = os.getenv("DB_PASSWORD", "")
     DB_NAME: str = os.getenv("DB_NAME", "call_audit_db")
     DB_PORT: int = int(os.getenv("DB_PORT", 3306))
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 5.0))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+    # Separate aiomysql pool for async routes
+    ASYNC_DB_POOL_SIZE: int = int(os.getenv("ASYNC_DB_POOL_SIZE", 10))
+    # Threads available to sync (def) routes and run_in_threadpool
+    THREADPOOL_WORKERS: int = int(os.getenv("THREADPOOL_WORKERS", 40))
     UPLOAD_DIR: str = os.path.join(os.getcwd(), "calls")
+    MAX_UPLOAD_BYTES: int = int(os.getenv("MAX_UPLOAD_BYTES", 500 * 1024 * 1024))
 
-settings = Settings()
\ No newline at end of file
+    # Whisper models
+    WHISPER_MODEL: str = os.getenv("WHISPER_MODEL", "base")
+    WHISPER_ALLOWED_MODELS: str = os.getenv("WHISPER_ALLOWED_MODELS", "tiny,base,small,medium")
+    WHISPER_DEVICE: Optional[str] = os.getenv("WHISPER_DEVICE")
+    WHISPER_BATCH_WINDOWS: int = int(os.getenv("WHISPER_BATCH_WINDOWS", 8))
+    WHISPER_PRELOAD: bool = os.getenv("WHISPER_PRELOAD", "1") == "1"
+
+    # Audio preprocessing (decode once + silence trimming)
+    AUDIO_PREPROCESS: bool = os.getenv("AUDIO_PREPROCESS", "1") == "1"
+    VAD_FRAME_MS: int = int(os.getenv("VAD_FRAME_MS", 30))
+    VAD_THRESHOLD_DB: float = float(os.getenv("VAD_THRESHOLD_DB", 12.0))
+    VAD_MIN_SILENCE_MS: int = int(os.getenv("VAD_MIN_SILENCE_MS", 1000))
+    VAD_PAD_MS: int = int(os.getenv("VAD_PAD_MS", 200))
+
+    # Transcription cache
+    TRANSCRIPTION_CACHE_ENABLED: bool = os.getenv("TRANSCRIPTION_CACHE_ENABLED", "1") == "1"
+    TRANSCRIPTION_CACHE_DIR: str = os.getenv("TRANSCRIPTION_CACHE_DIR", os.path.join(os.getcwd(), ".transcription_cache"))
+    TRANSCRIPTION_CACHE_MAX_BYTES: int = int(os.getenv("TRANSCRIPTION_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+    # Transcription job queue
+    TRANSCRIBE_WORKERS: int = int(os.getenv("TRANSCRIBE_WORKERS", 2))
+    TRANSCRIBE_MAX_ATTEMPTS: int = int(os.getenv("TRANSCRIBE_MAX_ATTEMPTS", 3))
+    TRANSCRIBE_RETRY_BACKOFF: int = int(os.getenv("TRANSCRIBE_RETRY_BACKOFF", 30))
+    TRANSCRIBE_BATCH_SIZE: int = int(os.getenv("TRANSCRIBE_BATCH_SIZE", 16))
+    TRANSCRIBE_POLL_INTERVAL: float = float(os.getenv("TRANSCRIBE_POLL_INTERVAL", 1.0))
+    # Seconds a claimed job stays owned without a renewal before peers requeue it
+    TRANSCRIBE_LEASE_SECONDS: int = int(os.getenv("TRANSCRIBE_LEASE_SECONDS", 120))
+
+    # Long recordings are split at pauses and their chunks run on the transcription
+    # job pool, so Whisper processes per API process stay at TRANSCRIBE_WORKERS.
+    # TRANSCRIBE_CHUNK_WORKERS only sizes the pool used for streaming outside the API.
+    TRANSCRIBE_LONG_AUDIO_SECONDS: float = float(os.getenv("TRANSCRIBE_LONG_AUDIO_SECONDS", 600))
+    TRANSCRIBE_CHUNK_SECONDS: float = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", 120))
+    TRANSCRIBE_CHUNK_OVERLAP_SECONDS: float = float(os.getenv("TRANSCRIBE_CHUNK_OVERLAP_SECONDS", 2))
+    TRANSCRIBE_CHUNK_WORKERS: int = int(os.getenv("TRANSCRIBE_CHUNK_WORKERS", 4))
+    TRANSCRIBE_STREAM_CHUNK_SECONDS: float = float(os.getenv("TRANSCRIBE_STREAM_CHUNK_SECONDS", 30))
+    TRANSCRIBE_STREAM_SESSION_TTL: float = float(os.getenv("TRANSCRIBE_STREAM_SESSION_TTL", 300))
+
+    # Automatic scoring against the knowledge graph
+    AUTO_SCORE_MATCH_THRESHOLD: float = float(os.getenv("AUTO_SCORE_MATCH_THRESHOLD", 0.3))
+    AUTO_SCORE_FULL_COVERAGE: float = float(os.getenv("AUTO_SCORE_FULL_COVERAGE", 0.5))
+    AUTO_SCORE_BATCH_CALLS: int = int(os.getenv("AUTO_SCORE_BATCH_CALLS", 200))
+    # Dense sentence x item similarities held at once (float32, 4 bytes each)
+    AUTO_SCORE_MAX_SIM_CELLS: int = int(os.getenv("AUTO_SCORE_MAX_SIM_CELLS", 8_000_000))
+    # Knowledge models kept across batches of one run, least recently used evicted first
+    AUTO_SCORE_MAX_MODELS: int = int(os.getenv("AUTO_SCORE_MAX_MODELS", 16))
+
+    # Seconds before the in-memory knowledge graph index reloads from MySQL
+    KNOWLEDGE_INDEX_TTL: float = float(os.getenv("KNOWLEDGE_INDEX_TTL", 300))
+
+    # Full-text transcript search (embedded SQLite FTS5 index)
+    SEARCH_INDEX_PATH: str = os.getenv("SEARCH_INDEX_PATH", os.path.join(os.getcwd(), ".search_index", "transcripts.db"))
+    SEARCH_MAX_LIMIT: int = int(os.getenv("SEARCH_MAX_LIMIT", 200))
+
+    # Prometheus /metrics endpoint and request/DB/transcription instrumentation
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "1") == "1"
+
+    # Streaming exports: rows per fetchmany() and rows per Parquet row group
+    EXPORT_FETCH_SIZE: int = int(os.getenv("EXPORT_FETCH_SIZE", 2000))
+    EXPORT_PARQUET_ROW_GROUP: int = int(os.getenv("EXPORT_PARQUET_ROW_GROUP", 50000))
+
+    # Conditional GET / response cache for list endpoints, invalidated by the shared
+    # Table_Versions counters. The TTL bounds staleness from writes that skip the bump
+    # (a failed bump, manual SQL). Bodies above MAX_ENTRY_BYTES are served but not kept.
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+    RESPONSE_CACHE_TTL: float = float(os.getenv("RESPONSE_CACHE_TTL", 30))
+    # How stale this process's copy of Table_Versions may get; bounds how long a
+    # write from another worker or a CLI can go unseen
+    RESPONSE_CACHE_VERSIONS_REFRESH_MS: int = int(os.getenv("RESPONSE_CACHE_VERSIONS_REFRESH_MS", 500))
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 512))
+    RESPONSE_CACHE_MAX_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", 4 * 1024 * 1024))
+
+    # Content-addressed audio store under UPLOAD_DIR/objects, and its cold-storage transcode
+    AUDIO_STORE_SHARD_DEPTH: int = int(os.getenv("AUDIO_STORE_SHARD_DEPTH", 2))
+    AUDIO_STORE_COLD_CODEC: str = os.getenv("AUDIO_STORE_COLD_CODEC", "opus")
+    AUDIO_STORE_COLD_AFTER_DAYS: int = int(os.getenv("AUDIO_STORE_COLD_AFTER_DAYS", 30))
+
+    # Background extractive summaries of transcripts into Call_Text.ai_summary
+    SUMMARY_ENABLED: bool = os.getenv("SUMMARY_ENABLED", "1") == "1"
+    SUMMARY_WORKERS: int = int(os.getenv("SUMMARY_WORKERS", 1))
+    SUMMARY_BATCH_SIZE: int = int(os.getenv("SUMMARY_BATCH_SIZE", 200))
+    SUMMARY_SENTENCES: int = int(os.getenv("SUMMARY_SENTENCES", 3))
+    SUMMARY_POLL_INTERVAL: float = float(os.getenv("SUMMARY_POLL_INTERVAL", 30))
+
+settings = Settings()
@@ -1,21 +1,251 @@
+import collections
+import threading
+import time
+
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from fastapi import HTTPException
 from core.config import settings
+from core.metrics import DB_QUERY_SECONDS, DB_POOL_WAIT_SECONDS, statement_type
 import os
 
+
+class PoolTimeout(PoolError):
+    pass
+
+
+class InstrumentedCursor:
+    """Cursor proxy that records every statement's duration in db_query_duration_seconds."""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._raw.execute(operation, params, *args, **kwargs)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, operation=statement_type(operation))
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._raw.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, operation=statement_type(operation))
+
+
+class PooledConnection:
+    """
+    Thin proxy around a MySQL connection; close() hands it back to the pool
+    instead of tearing down the socket.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._raw.cursor(*args, **kwargs))
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Bounded pool of mysql.connector connections.
+
+    acquire() reuses an idle connection (pinging it first when pre_ping is on),
+    opens a new one while fewer than `size` exist, and otherwise waits up to
+    `timeout` seconds for one to be released before raising PoolTimeout.
+    """
+
+    def __init__(self, size, timeout, pre_ping=True, **connect_args):
+        self.size = size
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self.connect_args = connect_args
+        self._idle = collections.deque()
+        self._cond = threading.Condition()
+        self._open = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._created = 0
+        self._discarded = 0
+        self._timeouts = 0
+
+    def _connect(self):
+        conn = mysql.connector.connect(**self.connect_args)
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    raw = None
+                    break
+                remaining = deadline - time.monotonic()
+                self._waiting += 1
+                try:
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        if not self._idle and self._open >= self.size:
+                            self._timeouts += 1
+                            raise PoolTimeout(f"No database connection available after {timeout}s")
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+        DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+        try:
+            if raw is None:
+                raw = self._connect()
+            elif self.pre_ping and not self._healthy(raw):
+                self._close_quietly(raw)
+                with self._cond:
+                    self._discarded += 1
+                raw = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        healthy = True
+        try:
+            if raw.in_transaction:
+                raw.rollback()
+        except Error:
+            healthy = False
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append(raw)
+            else:
+                self._open -= 1
+                self._discarded += 1
+            self._cond.notify()
+        if not healthy:
+            self._close_quietly(raw)
+
+    def _healthy(self, raw):
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Error:
+            pass
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "created": self._created,
+                "discarded": self._discarded,
+                "timeouts": self._timeouts,
+            }
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), collections.deque()
+            self._open -= len(idle)
+        for raw in idle:
+            self._close_quietly(raw)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    size=settings.DB_POOL_SIZE,
+                    timeout=settings.DB_POOL_TIMEOUT,
+                    pre_ping=settings.DB_POOL_PRE_PING,
+                    host=settings.DB_HOST,
+                    user=settings.DB_USER,
+                    password=settings.DB_PASSWORD,
+                    database=settings.DB_NAME,
+                    port=settings.DB_PORT
+                )
+    return _pool
+
+
+def get_connection():
+    """Borrows a connection from the shared pool; call close() to return it."""
+    return get_pool().acquire()
+
+
+def connect_unpooled():
+    """
+    A dedicated connection outside the pool, for long streaming reads that
+    would otherwise hold a pool slot for minutes. close() really disconnects.
+    """
+    return mysql.connector.connect(
+        host=settings.DB_HOST,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        database=settings.DB_NAME,
+        port=settings.DB_PORT
+    )
+
+
 def get_db():
     try:
-        conn = mysql.connector.connect(
-            host=settings.DB_HOST,
-            user=settings.DB_USER,
-            password=settings.DB_PASSWORD,
-            database=settings.DB_NAME,
-            port=settings.DB_PORT
-        )
-        return conn
+        conn = get_connection()
     except Error as e:
         print(f"Database connection error: {e}")
-        raise
+        # Pool saturation and outages are retryable, not server errors
+        raise HTTPException(status_code=503, detail="Database unavailable, retry shortly",
+                            headers={"Retry-After": "1" if isinstance(e, PoolTimeout) else "5"})
+    try:
+        yield conn
+    finally:
+        conn.close()
 
 def init_db():
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
\ No newline at end of file
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
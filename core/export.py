@@ -0,0 +1,215 @@
+import csv
+import io
+import json
+
+from core import call_text
+from core.config import settings
+
+try:
+    import orjson
+except ImportError:  # plain json is used instead
+    orjson = None
+
+# Column types of the exportable Calls columns; drives value conversion and the Parquet schema
+COLUMN_TYPES = {
+    "call_id": "int", "agent_id": "int", "user_id": "int", "caller_number": "str",
+    "call_date": "datetime", "duration": "float", "audio_file": "str", "upload_date": "datetime",
+    "greeting_score": "float", "compliance_status": "str", "knowledge_score": "float",
+    "empathy_score": "float", "script_adherence_score": "float", "overall_score": "float",
+    "transcription_text": "str", "ai_summary": "str", "remarks": "str",
+}
+
+SCORE_COLUMNS = [
+    "call_id", "agent_id", "greeting_score", "compliance_status", "knowledge_score",
+    "empathy_score", "script_adherence_score", "overall_score", "remarks",
+]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ExportUnavailable(Exception):
+    pass
+
+
+def _to_float(value):
+    return float(value) if value is not None else None
+
+
+def _to_int(value):
+    return int(value) if value is not None else None
+
+
+def _to_iso(value):
+    return value.isoformat() if value is not None and hasattr(value, "isoformat") else value
+
+
+def _converters(columns, for_parquet=False):
+    converters = []
+    for column in columns:
+        kind = COLUMN_TYPES.get(column, "str")
+        if column in call_text.COMPRESSED_COLUMNS:
+            converters.append(call_text.decompress)
+        elif kind == "float":
+            converters.append(_to_float)
+        elif kind == "int":
+            converters.append(_to_int)
+        elif kind == "datetime" and not for_parquet:
+            converters.append(_to_iso)
+        else:
+            converters.append(None)
+    return converters
+
+
+def fetch_batches(conn, sql, params=(), fetch_size=None):
+    """
+    Runs `sql` on an unbuffered cursor and returns a generator of row-tuple
+    lists read as the server sends them, so memory stays at one batch however
+    large the result. The query runs before this returns, so SQL errors
+    surface before any bytes are streamed. The connection is closed when the
+    generator finishes or is abandoned; it should be a dedicated one, since
+    an unbuffered result that is not read to the end leaves it unusable.
+    """
+    fetch_size = fetch_size or settings.EXPORT_FETCH_SIZE
+    cur = conn.cursor(buffered=False)
+    try:
+        cur.execute(sql, tuple(params))
+    except BaseException:
+        cur.close()
+        conn.close()
+        raise
+
+    def batches():
+        try:
+            while True:
+                rows = cur.fetchmany(fetch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
+
+    return batches()
+
+
+def ndjson_chunks(columns, batches):
+    converters = _converters(columns)
+    pairs = list(zip(columns, converters))
+    if orjson is not None:
+        dumps = orjson.dumps
+    else:
+        def dumps(obj, _encode=json.JSONEncoder(separators=(",", ":"), default=str).encode):
+            return _encode(obj).encode("utf-8")
+    for rows in batches:
+        lines = []
+        for row in rows:
+            lines.append(dumps({c: (f(v) if f and v is not None else v) for (c, f), v in zip(pairs, row)}))
+        lines.append(b"")
+        yield b"\n".join(lines)
+
+
+def csv_chunks(columns, batches):
+    converters = _converters(columns)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        for row in rows:
+            writer.writerow([f(v) if f and v is not None else v for f, v in zip(converters, row)])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ByteSink(io.RawIOBase):
+    """Write-only file object whose contents are handed out and discarded after every row group."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_schema(columns):
+    import pyarrow as pa
+    types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string(), "datetime": pa.timestamp("us")}
+    return pa.schema([(c, types[COLUMN_TYPES.get(c, "str")]) for c in columns])
+
+
+def parquet_chunks(columns, batches, row_group_size=None):
+    """
+    Writes batches as Parquet row groups of `row_group_size` rows and yields
+    the file bytes as each group is flushed; the footer goes out last.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    row_group_size = row_group_size or settings.EXPORT_PARQUET_ROW_GROUP
+    schema = parquet_schema(columns)
+    converters = _converters(columns, for_parquet=True)
+    sink = _ByteSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    pending = [[] for _ in columns]
+    pending_rows = 0
+
+    def flush():
+        arrays = [pa.array(values, type=field.type) for values, field in zip(pending, schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema), row_group_size=row_group_size)
+        for values in pending:
+            values.clear()
+
+    try:
+        for rows in batches:
+            for row in rows:
+                for values, f, v in zip(pending, converters, row):
+                    values.append(f(v) if f and v is not None else v)
+            pending_rows += len(rows)
+            if pending_rows >= row_group_size:
+                flush()
+                pending_rows = 0
+                yield sink.drain()
+        if pending_rows:
+            flush()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def check_format(fmt):
+    """Raises ValueError for unknown formats and ExportUnavailable when Parquet support is missing."""
+    if fmt not in MEDIA_TYPES:
+        raise ValueError(f"Unknown export format {fmt!r}; use {', '.join(MEDIA_TYPES)}")
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ExportUnavailable("Parquet export needs pyarrow installed")
+
+
+def export_chunks(fmt, columns, batches):
+    if fmt == "ndjson":
+        return ndjson_chunks(columns, batches)
+    if fmt == "csv":
+        return csv_chunks(columns, batches)
+    if fmt == "parquet":
+        return parquet_chunks(columns, batches)
+    raise ValueError(f"Unknown export format {fmt!r}")
@@ -0,0 +1,239 @@
+import csv
+import os
+import re
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from core.audio_store import AudioStore, UPSERT_OBJECT
+from core.config import settings
+from core.response_cache import bump_statement
+from utils.transcription_cache import hash_audio_file
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".ogg", ".flac", ".aac", ".wma", ".webm")
+LINK_MODES = ("copy", "hardlink", "symlink")
+
+# Dialer exports: <agent_id><YYYYmmddHHMMSS><INBOUND|OUTBOUND><rest>, e.g. 120250613094357OUTBOUNDSAMPLE_02.mp3
+DIALER_NAME_RE = re.compile(r"^(?P<agent_id>\d+?)(?P<timestamp>\d{14})(?P<direction>INBOUND|OUTBOUND)", re.IGNORECASE)
+# Files saved by /calls/upload-audio: call_<YYYYmmddHHMMSS>_<original name>
+UPLOAD_NAME_RE = re.compile(r"^call_(?P<timestamp>\d{14})_")
+
+INSERT_CALL = """
+    INSERT INTO Calls (
+        agent_id, user_id, caller_number, call_date,
+        duration, audio_file, audio_sha256, upload_date
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+"""
+
+
+def existing_query(hashes):
+    return (
+        f"SELECT audio_sha256 FROM Calls WHERE audio_sha256 IN ({', '.join(['%s'] * len(hashes))})",
+        tuple(hashes)
+    )
+
+
+def ensure_schema(conn):
+    """Adds Calls.audio_sha256 (indexed) so re-ingesting the same recording is detected."""
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Calls' AND COLUMN_NAME = 'audio_sha256'
+        """)
+        if not cur.fetchall():
+            cur.execute("ALTER TABLE Calls ADD COLUMN audio_sha256 CHAR(64) NULL, ADD INDEX idx_calls_audio_sha256 (audio_sha256)")
+            conn.commit()
+    finally:
+        cur.close()
+
+
+def parse_filename(name: str) -> dict:
+    """Whatever metadata the file name carries: call_date, and agent_id for dialer exports."""
+    meta = {}
+    match = DIALER_NAME_RE.match(name) or UPLOAD_NAME_RE.match(name)
+    if not match:
+        return meta
+    fields = match.groupdict()
+    try:
+        meta["call_date"] = datetime.strptime(fields["timestamp"], "%Y%m%d%H%M%S")
+    except ValueError:
+        return meta
+    if fields.get("agent_id"):
+        meta["agent_id"] = int(fields["agent_id"])
+    return meta
+
+
+def load_sidecar(path: str) -> dict:
+    """
+    Reads a CSV keyed by a `filename` column; any of agent_id, user_id,
+    caller_number, call_date and duration override what the file name says.
+    """
+    rows = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            name = (row.pop("filename", "") or "").strip()
+            if not name:
+                continue
+            meta = {k: v.strip() for k, v in row.items() if k and v and v.strip()}
+            for key in ("agent_id", "user_id"):
+                if key in meta:
+                    meta[key] = int(meta[key])
+            if "duration" in meta:
+                meta["duration"] = float(meta["duration"])
+            if "call_date" in meta:
+                meta["call_date"] = datetime.fromisoformat(meta["call_date"])
+            rows[name] = meta
+    return rows
+
+
+def probe_duration(path: str) -> float:
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+            capture_output=True, check=True, text=True
+        ).stdout
+        return round(float(out.strip()), 2)
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return 0.0
+
+
+def find_audio_files(source_dir: str):
+    found = []
+    for root, _, files in os.walk(source_dir):
+        for name in files:
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                found.append(os.path.join(root, name))
+    return sorted(found)
+
+
+class BulkIngest:
+    """
+    Ingests a directory of recordings into Calls in batches.
+
+    For every batch, hashing and ffprobe run on a thread pool, files whose
+    sha256 is already in Calls are skipped, the rest are put in the audio
+    store and inserted with one executemany in one transaction, together
+    with their Audio_Objects references.
+    Because skipping is by content hash, an interrupted run can simply be
+    started again.
+    """
+
+    def __init__(self, connect, upload_dir=None, mode="copy", batch_size=500, workers=8,
+                 default_agent_id=None, default_user_id=None, sidecar=None, queue=None, model_name=None,
+                 log=print):
+        if mode not in LINK_MODES:
+            raise ValueError(f"mode must be one of {', '.join(LINK_MODES)}")
+        self.connect = connect
+        self.upload_dir = upload_dir or settings.UPLOAD_DIR
+        self.store = AudioStore(self.upload_dir)
+        self.mode = mode
+        self.batch_size = batch_size
+        self.workers = workers
+        self.default_agent_id = default_agent_id
+        self.default_user_id = default_user_id
+        self.sidecar = sidecar or {}
+        self.queue = queue
+        self.model_name = model_name
+        self.log = log
+        self.stats = {"files": 0, "inserted": 0, "duplicates": 0, "missing_metadata": 0,
+                      "failed": 0, "bytes": 0, "queued": 0, "batches": []}
+
+    def _describe(self, path):
+        """(path, sha256, size, metadata) for one file; metadata is None when agent/user are unknown."""
+        name = os.path.basename(path)
+        meta = {"agent_id": self.default_agent_id, "user_id": self.default_user_id}
+        meta.update(parse_filename(name))
+        meta.update(self.sidecar.get(name, {}))
+        if meta.get("agent_id") is None or meta.get("user_id") is None:
+            return path, None, 0, None
+        size = os.path.getsize(path)
+        sha256 = hash_audio_file(path)
+        if "call_date" not in meta:
+            meta["call_date"] = datetime.fromtimestamp(os.path.getmtime(path))
+        if "duration" not in meta:
+            meta["duration"] = probe_duration(path)
+        return path, sha256, size, meta
+
+    def _existing(self, cur, hashes):
+        if not hashes:
+            return set()
+        cur.execute(*existing_query(hashes))
+        return {row[0] for row in cur.fetchall()}
+
+    def _ingest_batch(self, pool, paths):
+        described = []
+        for path, sha256, size, meta in pool.map(self._describe, paths):
+            if meta is None:
+                self.stats["missing_metadata"] += 1
+                self.log(f"skip {path}: no agent_id/user_id from file name, sidecar or defaults")
+            else:
+                described.append((path, sha256, size, meta))
+
+        conn = self.connect()
+        cur = conn.cursor()
+        try:
+            seen = self._existing(cur, list({d[1] for d in described}))
+            rows = []
+            objects = []
+            hashes = []
+            for path, sha256, size, meta in described:
+                if sha256 in seen:
+                    self.stats["duplicates"] += 1
+                    continue
+                seen.add(sha256)
+                try:
+                    dest = self.store.put_file(path, sha256, self.mode, size=size)
+                except OSError as e:
+                    self.stats["failed"] += 1
+                    self.log(f"skip {path}: {e}")
+                    continue
+                rows.append((meta["agent_id"], meta["user_id"], meta.get("caller_number", ""),
+                             meta["call_date"], meta["duration"], dest, sha256))
+                objects.append((sha256, dest, size))
+                hashes.append(sha256)
+                self.stats["bytes"] += size
+            if rows:
+                cur.executemany(UPSERT_OBJECT, objects)
+                cur.executemany(INSERT_CALL, rows)
+                cur.execute(*bump_statement(("Calls",)))
+                conn.commit()
+                self.stats["inserted"] += len(rows)
+                if self.queue is not None:
+                    cur.execute(
+                        f"SELECT call_id FROM Calls WHERE audio_sha256 IN ({', '.join(['%s'] * len(hashes))}) ORDER BY call_id",
+                        tuple(hashes)
+                    )
+                    call_ids = [row[0] for row in cur.fetchall()]
+                    self.queue.enqueue_batch(call_ids, model_name=self.model_name)
+                    self.stats["queued"] += len(call_ids)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    def run(self, source_dir):
+        os.makedirs(self.upload_dir, exist_ok=True)
+        paths = find_audio_files(source_dir)
+        total = len(paths)
+        self.log(f"{total} audio files under {source_dir}")
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for i in range(0, total, self.batch_size):
+                batch = paths[i:i + self.batch_size]
+                batch_started = time.monotonic()
+                self._ingest_batch(pool, batch)
+                self.stats["files"] += len(batch)
+                elapsed = max(time.monotonic() - started, 1e-6)
+                self.stats["batches"].append(round(time.monotonic() - batch_started, 3))
+                self.log(
+                    f"[{self.stats['files']}/{total}] inserted {self.stats['inserted']}, "
+                    f"duplicates {self.stats['duplicates']}, "
+                    f"{self.stats['files'] / elapsed:.1f} files/s, "
+                    f"{self.stats['bytes'] / elapsed / 1e6:.1f} MB/s"
+                )
+        self.stats["seconds"] = round(time.monotonic() - started, 3)
+        return self.stats
@@ -0,0 +1,572 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+
+from core import call_text
+from core.config import settings
+from core.metrics import TRANSCRIPTION_STAGE_SECONDS, TRANSCRIPTIONS, record_transcription
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+Job = namedtuple("Job", "job_id call_id audio_path audio_sha256 model_name batch_id")
+
+# Due queued jobs in queue order; params (status, limit)
+CLAIM_CANDIDATES = """
+    SELECT j.job_id, j.call_id, c.audio_file, c.audio_sha256, j.model_name, j.batch_id
+    FROM Transcription_Jobs j
+    JOIN Calls c ON c.call_id = j.call_id
+    WHERE j.status = %s AND j.next_attempt_at <= NOW()
+    ORDER BY j.job_id
+    LIMIT %s
+"""
+
+JOBS_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS Transcription_Jobs (
+    job_id INT AUTO_INCREMENT PRIMARY KEY,
+    call_id INT NOT NULL,
+    model_name VARCHAR(32) NULL,
+    batch_id CHAR(32) NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'queued',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 3,
+    last_error TEXT NULL,
+    queued_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    next_attempt_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME NULL,
+    finished_at DATETIME NULL,
+    INDEX idx_jobs_status_next (status, next_attempt_at),
+    INDEX idx_jobs_call (call_id),
+    INDEX idx_jobs_batch (batch_id)
+)
+"""
+
+# Running jobs belong to the process that claimed them until their lease runs
+# out; the owner keeps renewing it, so only jobs of a dead process expire.
+LEASE_COLUMNS = {
+    "worker_id": "ADD COLUMN worker_id VARCHAR(96) NULL",
+    "lease_expires_at": "ADD COLUMN lease_expires_at DATETIME NULL",
+}
+
+
+def ensure_lease_columns(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Transcription_Jobs'
+        """)
+        found = {row[0].decode() if isinstance(row[0], (bytes, bytearray)) else row[0] for row in cur.fetchall()}
+        missing = [ddl for column, ddl in LEASE_COLUMNS.items() if column not in found]
+        if missing:
+            cur.execute("ALTER TABLE Transcription_Jobs " + ", ".join(missing))
+        conn.commit()
+    finally:
+        cur.close()
+
+
+# Seconds a pool process waits at the start-up barrier for its siblings
+WARMUP_TIMEOUT = 600
+
+
+def _init_worker(preload, barrier):
+    if preload:
+        from runwisper import warm_up
+        warm_up()
+    # No process takes a task until every process has loaded its model, so the
+    # first finished task proves the whole pool is warm.
+    try:
+        barrier.wait(WARMUP_TIMEOUT)
+    except threading.BrokenBarrierError:
+        print(f"Transcription worker {os.getpid()} started before all its siblings were ready")
+
+
+def _worker_ready():
+    return os.getpid()
+
+
+def _transcribe_in_worker(audio_path, model_name=None, audio_hash=None):
+    # Runs inside a pool process; raises so the parent can record the failure.
+    # Stage timings travel back with the result since metrics live in the parent.
+    # Long audio comes back as a chunk plan for the dispatcher to fan out.
+    from runwisper import transcribe_or_plan
+    timings = {}
+    started = time.time()
+    result, plan = transcribe_or_plan(audio_path, model_name, timings=timings, audio_hash=audio_hash)
+    timings["total"] = time.time() - started
+    return ([result["text"]] if result is not None else None), timings, plan
+
+
+def _transcribe_chunk_in_worker(pcm_path, start, end, model_name, options):
+    from utils.chunked_transcription import transcribe_chunk
+    return transcribe_chunk(pcm_path, start, end, model_name, options)
+
+
+def _transcribe_batch_in_worker(audio_paths, model_name=None, audio_hashes=None):
+    from runwisper import transcribe_batch
+    timings = {}
+    started = time.time()
+    texts = transcribe_batch(audio_paths, model_name, timings=timings, audio_hashes=audio_hashes)
+    timings["total"] = time.time() - started
+    return texts, timings, None
+
+
+class _ChunkedUnit:
+    """A long recording whose chunks are spread over the job pool."""
+
+    def __init__(self, unit, plan, timings):
+        self.unit = unit
+        self.plan = plan
+        self.timings = timings
+        self.results = [None] * len(plan["chunks"])
+        self.pending = len(plan["chunks"])
+        self.error = None
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+
+class TranscriptionJobQueue:
+    """
+    Durable transcription queue backed by the Transcription_Jobs table.
+
+    The API process only inserts rows; a dispatcher thread claims queued jobs
+    and hands them to a pool of worker processes running Whisper. Failed jobs
+    are re-queued with exponential backoff until max_attempts is reached.
+    """
+
+    def __init__(self, connect, workers=None, max_attempts=None,
+                 backoff=None, poll_interval=None, batch_size=None, on_saved=None):
+        self.connect = connect
+        # Called with the call ids whose transcripts were just committed
+        self.on_saved = on_saved
+        self.workers = workers or settings.TRANSCRIBE_WORKERS
+        self.max_attempts = max_attempts or settings.TRANSCRIBE_MAX_ATTEMPTS
+        self.backoff = backoff or settings.TRANSCRIBE_RETRY_BACKOFF
+        self.poll_interval = poll_interval or settings.TRANSCRIBE_POLL_INTERVAL
+        self.batch_size = batch_size or settings.TRANSCRIBE_BATCH_SIZE
+        self.lease_seconds = settings.TRANSCRIBE_LEASE_SECONDS
+        # Unique per process and per start, so a restarted process never renews a dead one's leases
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._leases_checked = 0.0
+        self._executor = None
+        self._pool_broken = False
+        self._thread = None
+        self._stop = threading.Event()
+        self._inflight = 0
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    # ----- schema / lifecycle -----
+    def maintain_leases(self):
+        """
+        Renews the leases of this process's running jobs, then requeues running
+        jobs whose lease has expired (their process died). A job whose attempt
+        budget is spent fails instead of going round again.
+        """
+        conn = self.connect()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                UPDATE Transcription_Jobs SET lease_expires_at = NOW() + INTERVAL %s SECOND
+                WHERE status = %s AND worker_id = %s
+            """, (self.lease_seconds, RUNNING, self.worker_id))
+            cur.execute("""
+                UPDATE Transcription_Jobs
+                SET status = IF(attempts >= max_attempts, %s, %s),
+                    last_error = 'lease expired: worker stopped responding',
+                    finished_at = IF(attempts >= max_attempts, NOW(), NULL),
+                    started_at = NULL, worker_id = NULL, lease_expires_at = NULL
+                WHERE status = %s AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+            """, (FAILED, QUEUED, RUNNING))
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+        self._leases_checked = time.monotonic()
+
+    def start(self):
+        if self._thread:
+            return
+        try:
+            self.maintain_leases()
+        except Exception as e:
+            # The dispatcher retries on its first pass (_leases_checked is still 0)
+            print(f"Transcription lease check failed at startup: {e}")
+        self._start_pool()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._dispatch_loop, name="transcription-dispatcher", daemon=True)
+        self._thread.start()
+
+    def _start_pool(self):
+        context = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(settings.WHISPER_PRELOAD, context.Barrier(self.workers))
+        )
+        self._pool_broken = False
+        # The pool spawns processes on demand: one no-op task per worker makes it
+        # start all of them, and the barrier in _init_worker holds every task
+        # until each process has loaded its model.
+        self._ready.clear()
+        warmups = [self._executor.submit(_worker_ready) for _ in range(self.workers)]
+        threading.Thread(target=self._await_warmup, args=(warmups,), daemon=True).start()
+
+    def _restart_pool(self):
+        # A worker died (OOM kill, segfault): every task on the old pool has
+        # already failed with BrokenProcessPool and been settled by its callback
+        print("Transcription worker pool is broken; starting a new one")
+        broken = self._executor
+        self._start_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _note_error(self, error):
+        if isinstance(error, BrokenProcessPool):
+            self._pool_broken = True
+
+    def _await_warmup(self, futures):
+        try:
+            for future in futures:
+                future.result()
+            self._ready.set()
+        except Exception as e:
+            print(f"Transcription worker warm-up failed: {e}")
+
+    def pool(self):
+        """The running worker pool (None before start()); SSE streaming runs its chunks here too."""
+        return self._executor
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def inflight(self):
+        """Units handed to the worker pool and not yet completed."""
+        with self._lock:
+            return self._inflight
+
+    def pending_counts(self):
+        """Queued and running job counts, read through the (status, next_attempt_at) index."""
+        conn = self.connect()
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "SELECT status, COUNT(*) FROM Transcription_Jobs WHERE status IN (%s, %s) GROUP BY status",
+                (QUEUED, RUNNING)
+            )
+            counts = {QUEUED: 0, RUNNING: 0}
+            counts.update(dict(cur.fetchall()))
+            return counts
+        finally:
+            cur.close()
+            conn.close()
+
+    def stop(self):
+        self._ready.clear()
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    # ----- API -----
+    def enqueue(self, call_id, model_name=None):
+        conn = self.connect()
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "INSERT INTO Transcription_Jobs (call_id, model_name, status, max_attempts) VALUES (%s, %s, %s, %s)",
+                (call_id, model_name, QUEUED, self.max_attempts)
+            )
+            conn.commit()
+            return cur.lastrowid
+        finally:
+            cur.close()
+            conn.close()
+
+    def enqueue_batch(self, call_ids, model_name=None):
+        """
+        Queues one job per call under a shared batch id. The dispatcher hands
+        jobs of the same batch to a worker together so their audio windows
+        are decoded in batches.
+        """
+        batch_id = uuid.uuid4().hex
+        conn = self.connect()
+        cur = conn.cursor()
+        try:
+            cur.executemany(
+                "INSERT INTO Transcription_Jobs (call_id, model_name, batch_id, status, max_attempts) VALUES (%s, %s, %s, %s, %s)",
+                [(call_id, model_name, batch_id, QUEUED, self.max_attempts) for call_id in call_ids]
+            )
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+        return batch_id
+
+    def batch_status(self, batch_id):
+        conn = self.connect()
+        cur = conn.cursor(dictionary=True)
+        try:
+            cur.execute(
+                "SELECT status, COUNT(*) AS jobs FROM Transcription_Jobs WHERE batch_id = %s GROUP BY status",
+                (batch_id,)
+            )
+            return {row["status"]: row["jobs"] for row in cur.fetchall()}
+        finally:
+            cur.close()
+            conn.close()
+
+    def get(self, job_id):
+        conn = self.connect()
+        cur = conn.cursor(dictionary=True)
+        try:
+            cur.execute("SELECT * FROM Transcription_Jobs WHERE job_id = %s", (job_id,))
+            return cur.fetchone()
+        finally:
+            cur.close()
+            conn.close()
+
+    def retry(self, job_id):
+        """Put a failed job back on the queue with a fresh attempt budget."""
+        conn = self.connect()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                UPDATE Transcription_Jobs
+                SET status = %s, attempts = 0, last_error = NULL,
+                    next_attempt_at = NOW(), started_at = NULL, finished_at = NULL
+                WHERE job_id = %s AND status = %s
+            """, (QUEUED, job_id, FAILED))
+            conn.commit()
+            return cur.rowcount == 1
+        finally:
+            cur.close()
+            conn.close()
+
+    # ----- dispatcher -----
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            try:
+                if self._pool_broken:
+                    self._restart_pool()
+                with self._lock:
+                    free = self.workers - self._inflight
+                # Renew well before expiry so a slow poll never lets a live job lapse
+                if time.monotonic() - self._leases_checked >= self.lease_seconds / 3:
+                    self.maintain_leases()
+                if free > 0:
+                    for unit in self._claim(free):
+                        self._submit(unit)
+            except Exception as e:
+                print(f"Transcription dispatcher error: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def _group(self, candidates, free):
+        # Single jobs take a worker each; jobs from the same batch (and model)
+        # share a worker in groups of up to batch_size.
+        units = []
+        open_batches = {}
+        for job in candidates:
+            if job.batch_id:
+                key = (job.batch_id, job.model_name)
+                unit = open_batches.get(key)
+                if unit is not None and len(unit) < self.batch_size:
+                    unit.append(job)
+                    continue
+                if len(units) < free:
+                    unit = [job]
+                    open_batches[key] = unit
+                    units.append(unit)
+            elif len(units) < free:
+                units.append([job])
+        return units
+
+    def _claim(self, free):
+        conn = self.connect()
+        cur = conn.cursor()
+        claimed = []
+        try:
+            cur.execute(CLAIM_CANDIDATES, (QUEUED, free * self.batch_size))
+            candidates = [Job(*row) for row in cur.fetchall()]
+            for unit in self._group(candidates, free):
+                won = []
+                for job in unit:
+                    # Conditional update so concurrent API processes never double-claim
+                    cur.execute("""
+                        UPDATE Transcription_Jobs
+                        SET status = %s, attempts = attempts + 1, started_at = NOW(),
+                            worker_id = %s, lease_expires_at = NOW() + INTERVAL %s SECOND
+                        WHERE job_id = %s AND status = %s
+                    """, (RUNNING, self.worker_id, self.lease_seconds, job.job_id, QUEUED))
+                    if cur.rowcount == 1:
+                        won.append(job)
+                if won:
+                    claimed.append(won)
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+        return claimed
+
+    def _submit(self, unit):
+        with self._lock:
+            self._inflight += 1
+        try:
+            if len(unit) == 1 and not unit[0].batch_id:
+                future = self._executor.submit(
+                    _transcribe_in_worker, unit[0].audio_path, unit[0].model_name, unit[0].audio_sha256
+                )
+            else:
+                future = self._executor.submit(
+                    _transcribe_batch_in_worker, [job.audio_path for job in unit], unit[0].model_name,
+                    [job.audio_sha256 for job in unit]
+                )
+        except Exception as e:
+            # Claimed but never started: hand the jobs back instead of leaving them running
+            with self._lock:
+                self._inflight -= 1
+            self._note_error(e)
+            self._fail(unit, f"could not start transcription: {e}")
+            return
+        future.add_done_callback(lambda f: self._complete(unit, f))
+
+    def _complete(self, unit, future):
+        try:
+            try:
+                texts, timings, plan = future.result()
+            except Exception as e:
+                self._note_error(e)
+                self._fail(unit, str(e))
+                return
+            if plan is not None:
+                self._submit_chunks(unit, plan, timings)
+            else:
+                self._save(unit, texts, timings)
+        finally:
+            with self._lock:
+                self._inflight -= 1
+
+    def _submit_chunks(self, unit, plan, timings):
+        # Chunks are ordinary tasks on the job pool and count as in flight,
+        # so the dispatcher claims nothing new while they occupy the workers
+        chunked = _ChunkedUnit(unit, plan, timings)
+        with self._lock:
+            self._inflight += len(plan["chunks"])
+        for index, (start, end, _) in enumerate(plan["chunks"]):
+            try:
+                future = self._executor.submit(
+                    _transcribe_chunk_in_worker, plan["pcm_path"], start, end, plan["model_name"], plan["options"]
+                )
+            except Exception as e:
+                # Pool shut down or broken: settle this chunk and every one not submitted
+                self._note_error(e)
+                for missing in range(index, len(plan["chunks"])):
+                    self._chunk_done(chunked, missing, None, e)
+                return
+            future.add_done_callback(lambda f, i=index: self._chunk_done(chunked, i, f))
+
+    def _chunk_done(self, chunked, index, future, error=None):
+        try:
+            with chunked.lock:
+                try:
+                    if error is not None:
+                        raise error
+                    chunked.results[index] = future.result()
+                except Exception as e:
+                    self._note_error(e)
+                    chunked.error = chunked.error or e
+                chunked.pending -= 1
+                last = chunked.pending == 0
+            if last:
+                self._finish_chunks(chunked)
+        finally:
+            with self._lock:
+                self._inflight -= 1
+
+    def _finish_chunks(self, chunked):
+        from runwisper import finish_plan, discard_plan
+        try:
+            if chunked.error is not None:
+                self._fail(chunked.unit, str(chunked.error))
+                return
+            result = finish_plan(chunked.plan, chunked.results)
+            chunked.timings["inference"] = time.time() - chunked.started
+            chunked.timings["total"] = chunked.timings.get("total", 0) + chunked.timings["inference"]
+            self._save(chunked.unit, [result["text"]], chunked.timings)
+        except Exception as e:
+            self._fail(chunked.unit, f"stitching chunks failed: {e}")
+        finally:
+            discard_plan(chunked.plan)
+
+    def _save(self, unit, texts, timings):
+        job_ids = [job.job_id for job in unit]
+        try:
+            record_transcription(timings)
+            write_started = time.perf_counter()
+            conn = self.connect()
+            cur = conn.cursor()
+            try:
+                # One statement for the whole unit
+                placeholders = ", ".join(["%s"] * len(unit))
+                call_text.save(cur, "transcription_text", [(job.call_id, text) for job, text in zip(unit, texts)])
+                cur.execute(
+                    f"UPDATE Transcription_Jobs SET status = %s, last_error = NULL, finished_at = NOW(), "
+                    f"lease_expires_at = NULL WHERE job_id IN ({placeholders}) AND worker_id = %s",
+                    tuple([DONE] + job_ids + [self.worker_id])
+                )
+                conn.commit()
+            finally:
+                cur.close()
+                conn.close()
+        except Exception as e:
+            print(f"Transcription jobs {job_ids} could not be saved: {e}")
+            # Back on the queue (or failed once out of attempts) instead of staying running
+            self._fail(unit, f"saving the transcript failed: {e}")
+            return
+        TRANSCRIPTION_STAGE_SECONDS.observe(time.perf_counter() - write_started, stage="db_write")
+        TRANSCRIPTIONS.inc(len(unit), status="done")
+        if self.on_saved:
+            try:
+                self.on_saved([job.call_id for job in unit])
+            except Exception as e:
+                print(f"Transcription jobs {job_ids} saved, but the on_saved hook failed: {e}")
+
+    def _fail(self, unit, error):
+        job_ids = [job.job_id for job in unit]
+        TRANSCRIPTIONS.inc(len(unit), status="error")
+        try:
+            self._record_failure(job_ids, error)
+        except Exception as e:
+            print(f"Transcription jobs {job_ids} could not be marked failed: {e}")
+
+    def _record_failure(self, job_ids, error):
+        placeholders = ", ".join(["%s"] * len(job_ids))
+        conn = self.connect()
+        cur = conn.cursor()
+        try:
+            # Retry with exponential backoff; give up once the attempt budget is spent
+            cur.execute(f"""
+                UPDATE Transcription_Jobs
+                SET status = IF(attempts >= max_attempts, %s, %s),
+                    last_error = %s,
+                    finished_at = IF(attempts >= max_attempts, NOW(), NULL),
+                    next_attempt_at = NOW() + INTERVAL (%s * POW(2, attempts - 1)) SECOND,
+                    worker_id = NULL, lease_expires_at = NULL
+                WHERE job_id IN ({placeholders}) AND status = %s AND worker_id = %s
+            """, tuple([FAILED, QUEUED, error, self.backoff] + job_ids + [RUNNING, self.worker_id]))
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
@@ -0,0 +1,264 @@
+import json
+import threading
+import time
+
+from core.config import settings
+from core.knowledge_store import decode
+from utils.text_processing import tokenize
+
+EDGE_KEYS = ("edges", "links", "relationships")
+
+
+class ParsedGraph:
+    """
+    One Knowledge_Graph entry parsed into nodes and edges, with lookup tables
+    by node id, lowercased label and keyword.
+
+    Documents with a "nodes" list (and "edges"/"links"/"relationships") are
+    read as an explicit graph; anything else is read as a tree where every
+    key and string value becomes a node linked to its parent.
+    """
+
+    def __init__(self, data):
+        self.nodes = {}
+        self.adjacency = {}
+        self.by_label = {}
+        self.by_keyword = {}
+        if isinstance(data, dict) and isinstance(data.get("nodes"), list):
+            self._load_explicit(data)
+        else:
+            self._load_tree(data, None, "")
+        for node in self.nodes.values():
+            self._index(node)
+
+    def _add_node(self, node_id, label, attributes=None):
+        self.nodes[node_id] = {"id": node_id, "label": label, "attributes": attributes or {}}
+        self.adjacency.setdefault(node_id, [])
+
+    def _add_edge(self, source, target, relation):
+        if source in self.nodes and target in self.nodes:
+            self.adjacency[source].append({"node": target, "relation": relation, "direction": "out"})
+            self.adjacency[target].append({"node": source, "relation": relation, "direction": "in"})
+
+    def _load_explicit(self, data):
+        for i, node in enumerate(data["nodes"]):
+            if not isinstance(node, dict):
+                self._add_node(str(i), str(node))
+                continue
+            node_id = str(node.get("id", i))
+            label = str(node.get("label") or node.get("name") or node_id)
+            attributes = {k: v for k, v in node.items() if k not in ("id", "label", "name")}
+            self._add_node(node_id, label, attributes)
+        for key in EDGE_KEYS:
+            for edge in data.get(key) or []:
+                if isinstance(edge, dict):
+                    source = edge.get("source", edge.get("from"))
+                    target = edge.get("target", edge.get("to"))
+                    relation = edge.get("label") or edge.get("relation") or edge.get("type")
+                    self._add_edge(str(source), str(target), relation)
+
+    def _load_tree(self, value, parent, path):
+        if isinstance(value, dict):
+            for key, child in value.items():
+                node_id = f"{path}/{key}" if path else str(key)
+                self._add_node(node_id, str(key))
+                if parent is not None:
+                    self._add_edge(parent, node_id, "has")
+                self._load_tree(child, node_id, node_id)
+        elif isinstance(value, list):
+            for i, child in enumerate(value):
+                self._load_tree(child, parent, f"{path}/{i}" if path else str(i))
+        elif value is not None and parent is not None:
+            node_id = path if path not in self.nodes else f"{path}/value"
+            self._add_node(node_id, str(value))
+            self._add_edge(parent, node_id, "has")
+
+    def _index(self, node):
+        self.by_label.setdefault(node["label"].lower(), []).append(node["id"])
+        text = " ".join([node["label"]] + [v for v in node["attributes"].values() if isinstance(v, str)])
+        for token in set(tokenize(text)):
+            self.by_keyword.setdefault(token, set()).add(node["id"])
+
+    def neighbors(self, node_id):
+        return [dict(link, label=self.nodes[link["node"]]["label"]) for link in self.adjacency.get(node_id, [])]
+
+    def match(self, keyword):
+        """Node ids whose label/attributes contain every token of `keyword`."""
+        tokens = tokenize(keyword) or tokenize(keyword, drop_stopwords=False)
+        if not tokens:
+            return set()
+        sets = [self.by_keyword.get(t, set()) for t in tokens]
+        return set.intersection(*sets)
+
+
+class KnowledgeIndex:
+    """
+    Process-wide index of every parsed Knowledge_Graph entry.
+
+    Loaded from MySQL on first use, then patched by the write endpoints via
+    upsert()/remove(). Every KNOWLEDGE_INDEX_TTL seconds (0 disables it) a
+    refresh compares each row's updated_at with the one it was parsed from
+    and fetches and parses only the rows that changed. That I/O runs outside
+    the lock, one refresh at a time, while readers keep using the current
+    index; the result is swapped in at the end. An entry written locally
+    while a refresh ran keeps its local version.
+    """
+
+    def __init__(self, connect, ttl=None):
+        self.connect = connect
+        self.ttl = settings.KNOWLEDGE_INDEX_TTL if ttl is None else ttl
+        self._entries = {}
+        self._by_user = {}
+        # knowledge_graph_id -> updated_at the entry was parsed from (None: written locally)
+        self._versions = {}
+        self._touched = set()
+        self._loaded_at = None
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        stale = self._loaded_at is None or (self.ttl and time.monotonic() - self._loaded_at > self.ttl)
+        if not stale:
+            return
+        # Only the first load makes readers wait; later refreshes run in one thread
+        if self._reload_lock.acquire(blocking=self._loaded_at is None):
+            try:
+                if self._loaded_at is None or (self.ttl and time.monotonic() - self._loaded_at > self.ttl):
+                    self.reload()
+            finally:
+                self._reload_lock.release()
+
+    def reload(self):
+        with self._lock:
+            known = dict(self._versions) if self._loaded_at is not None else {}
+            self._touched = set()
+        started = time.monotonic()
+        conn = self.connect()
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT knowledge_graph_id, updated_at FROM Knowledge_Graph")
+            current = dict(cur.fetchall())
+            changed = [entry_id for entry_id, updated_at in current.items()
+                       if entry_id not in known or known[entry_id] != updated_at]
+            rows = []
+            for i in range(0, len(changed), 500):
+                batch = changed[i:i + 500]
+                cur.execute(
+                    "SELECT knowledge_graph_id, user_id, updated_at, json_data, json_compressed "
+                    f"FROM Knowledge_Graph WHERE knowledge_graph_id IN ({', '.join(['%s'] * len(batch))})",
+                    tuple(batch)
+                )
+                rows.extend(cur.fetchall())
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+        parsed = {
+            entry_id: (user_id, updated_at, _parse(decode(json_compressed, json_data)))
+            for entry_id, user_id, updated_at, json_data, json_compressed in rows
+        }
+
+        with self._lock:
+            entries = {}
+            versions = {}
+            for entry_id in current:
+                if entry_id in self._touched:
+                    continue
+                if entry_id in parsed:
+                    user_id, updated_at, graph = parsed[entry_id]
+                    entries[entry_id] = (user_id, graph)
+                    versions[entry_id] = updated_at
+                elif entry_id in self._entries:
+                    entries[entry_id] = self._entries[entry_id]
+                    versions[entry_id] = self._versions.get(entry_id)
+            # Local writes made during the refresh are newer than what it read
+            for entry_id in self._touched:
+                if entry_id in self._entries:
+                    entries[entry_id] = self._entries[entry_id]
+                    versions[entry_id] = self._versions.get(entry_id)
+            by_user = {}
+            for entry_id, (user_id, _) in entries.items():
+                by_user.setdefault(user_id, set()).add(entry_id)
+            self._entries, self._by_user, self._versions = entries, by_user, versions
+            self._touched = set()
+            self._loaded_at = started
+        return len(parsed)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _drop(self, entry_id):
+        previous = self._entries.pop(entry_id, None)
+        self._versions.pop(entry_id, None)
+        if previous:
+            self._by_user.get(previous[0], set()).discard(entry_id)
+
+    def upsert(self, entry_id, user_id, data):
+        graph = _parse(data)
+        with self._lock:
+            if self._loaded_at is not None:
+                self._drop(entry_id)
+                self._entries[entry_id] = (user_id, graph)
+                self._by_user.setdefault(user_id, set()).add(entry_id)
+                # Its updated_at is unknown here; the next refresh re-reads this one row
+                self._versions[entry_id] = None
+                self._touched.add(entry_id)
+
+    def remove(self, entry_id):
+        with self._lock:
+            if self._loaded_at is not None:
+                self._drop(entry_id)
+                self._touched.add(entry_id)
+
+    def graph(self, entry_id):
+        self._ensure_loaded()
+        entry = self._entries.get(entry_id)
+        return entry[1] if entry else None
+
+    def search(self, keyword=None, label=None, user_id=None, limit=100):
+        """Nodes matching every token of `keyword`, or exactly `label` (case-insensitive)."""
+        self._ensure_loaded()
+        with self._lock:
+            entry_ids = self._by_user.get(user_id, set()) if user_id is not None else self._entries.keys()
+            results = []
+            for entry_id in sorted(entry_ids):
+                owner, graph = self._entries[entry_id]
+                if label is not None:
+                    node_ids = graph.by_label.get(label.lower(), [])
+                else:
+                    node_ids = sorted(graph.match(keyword))
+                for node_id in node_ids:
+                    results.append({"entry_id": entry_id, "user_id": owner, "node_id": node_id,
+                                    "label": graph.nodes[node_id]["label"]})
+                    if len(results) >= limit:
+                        return results
+            return results
+
+    def user_keywords(self, user_id):
+        """Every keyword in the user's graphs with how many nodes mention it."""
+        self._ensure_loaded()
+        with self._lock:
+            counts = {}
+            for entry_id in self._by_user.get(user_id, set()):
+                for token, node_ids in self._entries[entry_id][1].by_keyword.items():
+                    counts[token] = counts.get(token, 0) + len(node_ids)
+            return dict(sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])))
+
+
+def _parse(data):
+    if isinstance(data, (str, bytes)):
+        data = json.loads(data)
+    return ParsedGraph(data)
+
+
+_index = None
+
+
+def get_knowledge_index():
+    """The index shared by main.py and the domains routers in this process."""
+    global _index
+    if _index is None:
+        from core.database import get_connection
+        _index = KnowledgeIndex(connect=get_connection)
+    return _index
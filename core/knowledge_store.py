@@ -0,0 +1,78 @@
+import json
+import zlib
+
+# Knowledge graph documents are stored zlib-compressed in json_compressed.
+# Rows written before compression was introduced still carry plain text in
+# json_data; readers go through decode() and accept either.
+COMPRESSION_LEVEL = 6
+
+
+def encode(data) -> bytes:
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def decode(json_compressed=None, json_data=None):
+    if json_compressed:
+        return json.loads(zlib.decompress(json_compressed))
+    if isinstance(json_data, (str, bytes, bytearray)):
+        return json.loads(json_data)
+    return json_data
+
+
+def decode_row(row: dict) -> dict:
+    """Replaces json_data/json_compressed in a dictionary row with the parsed document."""
+    if "json_data" in row or "json_compressed" in row:
+        row["json_data"] = decode(row.pop("json_compressed", None), row.get("json_data"))
+    return row
+
+
+def storage_columns(columns):
+    """Expands a projected column list so json_data is read from either storage column."""
+    expanded = list(columns)
+    if "json_data" in expanded:
+        expanded.append("json_compressed")
+    return expanded
+
+
+def ensure_schema(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Knowledge_Graph'
+        """)
+        columns = {}
+        for name, column_type, nullable in cur.fetchall():
+            if isinstance(column_type, (bytes, bytearray)):
+                column_type = column_type.decode()
+            columns[name] = (column_type, nullable)
+        if not columns:
+            return
+        if "json_compressed" not in columns:
+            cur.execute("ALTER TABLE Knowledge_Graph ADD COLUMN json_compressed LONGBLOB NULL")
+        column_type, nullable = columns.get("json_data", (None, "YES"))
+        if nullable == "NO":
+            # New rows leave json_data empty and keep only the compressed copy
+            cur.execute(f"ALTER TABLE Knowledge_Graph MODIFY json_data {column_type} NULL")
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def ensure_updated_at(conn):
+    """Adds Knowledge_Graph.updated_at, which MySQL bumps on every write to the row."""
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Knowledge_Graph' AND COLUMN_NAME = 'updated_at'
+        """)
+        if cur.fetchone()[0] == 0:
+            # Microseconds, so two writes within one second still compare different
+            cur.execute(
+                "ALTER TABLE Knowledge_Graph ADD COLUMN updated_at DATETIME(6) NOT NULL "
+                "DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)"
+            )
+        conn.commit()
+    finally:
+        cur.close()
@@ -0,0 +1,244 @@
+import bisect
+import collections
+import threading
+import time
+
+# Prometheus text exposition format 0.0.4
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(n, "") for n in self.labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_label_text(self.labels, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # per-bucket (non-cumulative) counts, sum, count
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def render(self):
+        with self._lock:
+            items = [(k, (list(s[0]), s[1], s[2])) for k, s in self._values.items()]
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _number(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """
+    Gauge (or counter) whose samples are read at scrape time from `fn`, which
+    returns a number or a {label values tuple: number} dict. Used for state
+    owned elsewhere (pool stats, queue depth) so nothing is updated on the hot path.
+    """
+
+    def __init__(self, name, help, fn, labels=(), kind="gauge"):
+        super().__init__(name, help, labels)
+        self.fn = fn
+        self.kind = kind
+
+    def render(self):
+        try:
+            samples = self.fn()
+        except Exception:
+            return []
+        if not isinstance(samples, dict):
+            samples = {(): samples}
+        return self.header() + [
+            f"{self.name}{_label_text(self.labels, k if isinstance(k, tuple) else (k,))} {_number(v)}"
+            for k, v in samples.items()
+        ]
+
+
+class _Timer:
+    __slots__ = ("metric", "labels", "started")
+
+    def __init__(self, metric, labels):
+        self.metric = metric
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metric.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class RateWindow:
+    """Sum of recorded amounts over the last `seconds`, for per-second rate gauges."""
+
+    def __init__(self, seconds=60):
+        self.seconds = seconds
+        self._events = collections.deque()
+        self._lock = threading.Lock()
+
+    def add(self, amount):
+        with self._lock:
+            self._events.append((time.monotonic(), amount))
+
+    def rate(self):
+        cutoff = time.monotonic() - self.seconds
+        with self._lock:
+            while self._events and self._events[0][0] < cutoff:
+                self._events.popleft()
+            return sum(amount for _, amount in self._events) / self.seconds
+
+
+REGISTRY = []
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ----- metrics shared across modules -----
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.",
+    ("method", "route", "status"))
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "MySQL statement execution time by statement type.",
+    ("operation",), QUERY_BUCKETS)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_acquire_seconds", "Time spent waiting for a pooled MySQL connection.",
+    (), QUERY_BUCKETS)
+DB_CONNECTION_ERRORS = Counter(
+    "db_connection_errors_total", "Failures to obtain a MySQL connection.", ("reason",))
+TRANSCRIPTION_STAGE_SECONDS = Histogram(
+    "transcription_stage_seconds", "Transcription time per stage (decode, inference, db_write).",
+    ("stage",), STAGE_BUCKETS)
+TRANSCRIPTIONS = Counter(
+    "transcriptions_total", "Transcription jobs finished, by outcome.", ("status",))
+TRANSCRIBED_AUDIO_SECONDS = Counter(
+    "transcription_audio_seconds_total", "Seconds of audio run through the model.")
+TRANSCRIPTION_AUDIO_RATE = RateWindow(60)
+CallbackMetric(
+    "transcription_audio_seconds_per_second",
+    "Audio seconds transcribed per wall-clock second over the last minute.",
+    TRANSCRIPTION_AUDIO_RATE.rate)
+
+
+def statement_type(sql):
+    """select/insert/update/delete label for a SQL statement; anything else is "other"."""
+    word = sql.lstrip().split(None, 1)[0].lower() if sql and sql.strip() else ""
+    return word if word in ("select", "insert", "update", "delete") else "other"
+
+
+def record_transcription(timings):
+    """Folds the stage timings a transcription worker returned into the metrics."""
+    for stage in ("decode", "inference"):
+        if timings.get(stage):
+            TRANSCRIPTION_STAGE_SECONDS.observe(timings[stage], stage=stage)
+    audio_seconds = timings.get("audio_seconds") or 0
+    if audio_seconds:
+        TRANSCRIBED_AUDIO_SECONDS.inc(audio_seconds)
+        TRANSCRIPTION_AUDIO_RATE.add(audio_seconds)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request. Requests are labelled with the
+    matched route template (/calls/{call_id}), never the raw path, so label
+    cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status[0],
+            )
@@ -0,0 +1,301 @@
+"""
+Versioned schema for the call audit database.
+
+Every table the app uses is created or changed by exactly one entry in
+MIGRATIONS, applied in version order and recorded in Schema_Migrations.
+migrate() runs at API startup and from the CLIs (`python migrate.py`);
+a MySQL named lock keeps concurrent starters from racing. Never edit an
+applied migration -- append a new one.
+
+check() EXPLAINs CHECKED_QUERIES, built from the same query constants and
+builders the endpoints call, and flags every table read with a full scan
+or a filesort.
+"""
+from collections import namedtuple
+
+from core import audio_store, auto_scoring, call_text, ingest, knowledge_store, summarizer
+from core.jobs import CLAIM_CANDIDATES, JOBS_TABLE_DDL, QUEUED, ensure_lease_columns
+from core.pagination import DEFAULT_LIMIT, call_filters, keyset_query, select_columns
+from core.response_cache import CACHED_TABLES, TABLE_VERSIONS_DDL, bump_statement
+from domains import agent_performance
+
+LOCK_NAME = "call_audit_schema_migrations"
+LOCK_TIMEOUT = 120
+
+Migration = namedtuple("Migration", "version name apply")
+
+MIGRATIONS_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS Schema_Migrations (
+    version INT NOT NULL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Canonical table names: User, Agent, Calls, Knowledge_Graph (MySQL table
+# names are case-sensitive on Linux, so code must use exactly these).
+BASE_TABLES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS User (
+        user_id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(100) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        password VARCHAR(255) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Agent (
+        agent_id INT AUTO_INCREMENT PRIMARY KEY,
+        agent_name VARCHAR(100) NOT NULL,
+        email VARCHAR(255) NULL,
+        agent_code VARCHAR(50) NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Calls (
+        call_id INT AUTO_INCREMENT PRIMARY KEY,
+        agent_id INT NOT NULL,
+        user_id INT NOT NULL,
+        caller_number VARCHAR(32) NULL,
+        call_date DATETIME NULL,
+        duration DOUBLE NULL,
+        audio_file VARCHAR(1024) NULL,
+        upload_date DATETIME NULL,
+        greeting_score DECIMAL(4,2) NULL,
+        compliance_status VARCHAR(50) NULL,
+        knowledge_score DECIMAL(4,2) NULL,
+        empathy_score DECIMAL(4,2) NULL,
+        script_adherence_score DECIMAL(4,2) NULL,
+        overall_score DECIMAL(4,2) NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Knowledge_Graph (
+        knowledge_graph_id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT NOT NULL,
+        upload_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        json_data LONGTEXT NULL,
+        json_compressed LONGBLOB NULL
+    )
+    """,
+]
+
+# (table, index name, columns), each matched to a query shape in CHECKED_QUERIES.
+# InnoDB appends the primary key to every secondary index, so (agent_id) would
+# already be ordered by call_id; it is spelled out to document the keyset scan.
+HOT_QUERY_INDEXES = [
+    # /calls and /calls/by-user keyset pages, exports and batch transcription filters
+    ("Calls", "idx_calls_agent_page", ("agent_id", "call_id")),
+    ("Calls", "idx_calls_user_page", ("user_id", "call_id")),
+    ("Calls", "idx_calls_call_date", ("call_date",)),
+    # /calls/scores/agent/{id} and the rollup rebuild read only this index
+    ("Calls", "idx_calls_agent_scores", (
+        "agent_id", "overall_score", "greeting_score", "knowledge_score", "empathy_score",
+        "script_adherence_score", "compliance_status", "call_date",
+    )),
+    # scored_only exports (/calls/scores/all pages idx_calls_scored_page, migration 13)
+    ("Calls", "idx_calls_scored", ("overall_score",)),
+    # /knowledge?user_id= keyset pages and per-user model loads
+    ("Knowledge_Graph", "idx_knowledge_user_page", ("user_id", "knowledge_graph_id")),
+    # login / registration lookups
+    ("User", "idx_user_email", ("email",)),
+]
+
+
+def _text(value):
+    # information_schema columns come back as bytes from some server versions
+    return value.decode() if isinstance(value, (bytes, bytearray)) else value
+
+
+def index_columns(cur, table):
+    """{index name: (column, ...)} for an existing table."""
+    cur.execute("""
+        SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (table,))
+    indexes = {}
+    for name, column in cur.fetchall():
+        indexes.setdefault(_text(name), []).append(_text(column))
+    return {name: tuple(columns) for name, columns in indexes.items()}
+
+
+def add_index(cur, table, name, columns):
+    """Creates the index unless one with this name or these exact columns already exists."""
+    existing = index_columns(cur, table)
+    if name in existing or tuple(columns) in existing.values():
+        return False
+    cur.execute(f"ALTER TABLE {table} ADD INDEX {name} ({', '.join(columns)})")
+    return True
+
+
+def _execute_all(statements):
+    def apply(conn):
+        cur = conn.cursor()
+        try:
+            for statement in statements:
+                cur.execute(statement)
+            conn.commit()
+        finally:
+            cur.close()
+    return apply
+
+
+def _scored_calls_page(conn):
+    flag = agent_performance.SCORED_FLAG_COLUMN
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Calls' AND COLUMN_NAME = %s
+        """, (flag,))
+        if cur.fetchone()[0] == 0:
+            # VIRTUAL: only the index stores it, so adding it does not rebuild Calls
+            cur.execute(f"ALTER TABLE Calls ADD COLUMN {flag} TINYINT AS (overall_score IS NOT NULL) VIRTUAL")
+        # (is_scored = 1, call_id DESC) is index order, and the score columns make it covering
+        add_index(cur, "Calls", "idx_calls_scored_page", agent_performance.SCORED_PAGE_COLUMNS)
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def _hot_query_indexes(conn):
+    cur = conn.cursor()
+    try:
+        for table, name, columns in HOT_QUERY_INDEXES:
+            add_index(cur, table, name, columns)
+        conn.commit()
+    finally:
+        cur.close()
+
+
+MIGRATIONS = [
+    Migration(1, "base tables", _execute_all(BASE_TABLES_DDL)),
+    Migration(2, "knowledge graph compressed storage", knowledge_store.ensure_schema),
+    Migration(3, "calls audio sha256", ingest.ensure_schema),
+    Migration(4, "agent performance rollups", agent_performance.ensure_schema),
+    Migration(5, "call score proposals", auto_scoring.ensure_schema),
+    Migration(6, "transcription jobs", _execute_all([JOBS_TABLE_DDL])),
+    Migration(7, "audio objects", audio_store.ensure_schema),
+    Migration(8, "call text side table", call_text.ensure_schema),
+    Migration(9, "hot query indexes", _hot_query_indexes),
+    Migration(10, "call summary source hash", summarizer.ensure_schema),
+    Migration(11, "transcription job leases", ensure_lease_columns),
+    Migration(12, "shared table versions", _execute_all([TABLE_VERSIONS_DDL])),
+    Migration(13, "scored calls page index", _scored_calls_page),
+    Migration(14, "knowledge graph updated_at", knowledge_store.ensure_updated_at),
+]
+
+TABLE_VERSIONS_MIGRATION = 12
+
+
+def _applied(cur):
+    cur.execute(MIGRATIONS_TABLE_DDL)
+    cur.execute("SELECT version FROM Schema_Migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def migrate(conn, target=None, log=print):
+    """Applies every pending migration up to `target` (default: all). Returns the versions applied."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+        if cur.fetchone()[0] != 1:
+            raise RuntimeError(f"Could not take the schema migration lock within {LOCK_TIMEOUT}s")
+        try:
+            applied = _applied(cur)
+            conn.commit()
+            done = []
+            for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+                if migration.version in applied or (target is not None and migration.version > target):
+                    continue
+                log(f"Applying migration {migration.version}: {migration.name}")
+                migration.apply(conn)
+                cur.execute(
+                    "INSERT INTO Schema_Migrations (version, name) VALUES (%s, %s)",
+                    (migration.version, migration.name)
+                )
+                conn.commit()
+                done.append(migration.version)
+            if done and TABLE_VERSIONS_MIGRATION in applied.union(done):
+                # Responses cached by running API workers may predate the new schema
+                cur.execute(*bump_statement(CACHED_TABLES))
+                conn.commit()
+            return done
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cur.fetchall()
+    finally:
+        cur.close()
+
+
+def status(conn):
+    """[(version, name, applied)] for every known migration."""
+    cur = conn.cursor()
+    try:
+        applied = _applied(cur)
+        conn.commit()
+    finally:
+        cur.close()
+    return [(m.version, m.name, m.version in applied) for m in sorted(MIGRATIONS, key=lambda m: m.version)]
+
+
+# Projections the list endpoints use when ?fields= is not given
+_CALL_PAGE_COLUMNS = call_text.split_columns(select_columns("Calls"))[0]
+_KNOWLEDGE_PAGE_COLUMNS = knowledge_store.storage_columns(select_columns("Knowledge_Graph"))
+
+# (name, SQL, sample params) for the statements behind the hot endpoints, built
+# from the same constants and builders the endpoints run
+CHECKED_QUERIES = [
+    ("GET /calls", *keyset_query("Calls", _CALL_PAGE_COLUMNS)),
+    ("GET /calls?cursor", *keyset_query("Calls", _CALL_PAGE_COLUMNS, cursor=1000)),
+    ("GET /calls?agent_id", *keyset_query("Calls", _CALL_PAGE_COLUMNS, call_filters(agent_id=1), 0)),
+    ("GET /calls/by-user/{id}", *keyset_query("Calls", _CALL_PAGE_COLUMNS, call_filters(user_id=1), 0)),
+    ("GET /calls?date_from&date_to", *keyset_query(
+        "Calls", _CALL_PAGE_COLUMNS, call_filters(date_from="2025-01-01", date_to="2025-01-02"), 0)),
+    ("GET /calls page text", *call_text.load_query(list(range(1, DEFAULT_LIMIT + 1)))),
+    ("GET /calls/scores/agent/{id}", agent_performance.AGENT_SCORES_QUERY, (1,)),
+    ("GET /calls/scores/all", agent_performance.ALL_SCORES_QUERY, ()),
+    ("agent rollup rebuild", agent_performance.rollup_select(), agent_performance.PASSING_COMPLIANCE),
+    ("agent daily rollup rebuild", agent_performance.rollup_select(daily=True),
+     agent_performance.PASSING_COMPLIANCE),
+    ("GET /agents/{id}/performance/daily", *agent_performance.daily_query(1, "2025-01-01", "2025-01-31")),
+    ("ingest duplicate check", *ingest.existing_query(["0" * 64])),
+    ("GET /knowledge?user_id", *keyset_query(
+        "Knowledge_Graph", _KNOWLEDGE_PAGE_COLUMNS, [("user_id = %s", 1)], 0)),
+    ("transcription job claim", CLAIM_CANDIDATES, (QUEUED, 16)),
+    ("summary backlog sweep", summarizer.SWEEP_QUERY, (0, 200)),
+    ("cold audio candidates", audio_store.COLD_CANDIDATES, (30, 500)),
+]
+
+
+def check(conn, queries=None):
+    """
+    EXPLAINs each registered query. Returns one dict per table access with
+    the chosen access type and key; `full_scan` is set for type ALL and
+    `filesort` when rows are sorted after reading instead of read in index
+    order. Plans depend on table statistics, so run it against a
+    realistically sized database.
+    """
+    results = []
+    cur = conn.cursor(dictionary=True)
+    try:
+        for name, sql, params in queries or CHECKED_QUERIES:
+            cur.execute("EXPLAIN " + sql, tuple(params))
+            for row in cur.fetchall():
+                if not row.get("table"):
+                    continue
+                results.append({
+                    "query": name,
+                    "table": row["table"],
+                    "type": row.get("type"),
+                    "key": row.get("key"),
+                    "rows": row.get("rows"),
+                    "extra": row.get("Extra"),
+                    "full_scan": row.get("type") == "ALL",
+                    "filesort": "filesort" in (row.get("Extra") or ""),
+                })
+        conn.commit()
+    finally:
+        cur.close()
+    return results
@@ -0,0 +1,121 @@
+from fastapi import HTTPException
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# Columns each list endpoint may return. The "default" set leaves out the large
+# text columns; ask for them explicitly with ?fields=.
+TABLE_COLUMNS = {
+    "Calls": {
+        "pk": "call_id",
+        "columns": [
+            "call_id", "agent_id", "user_id", "caller_number", "call_date", "duration",
+            "audio_file", "upload_date", "greeting_score", "compliance_status",
+            "knowledge_score", "empathy_score", "script_adherence_score", "overall_score",
+            "transcription_text", "ai_summary", "remarks",
+        ],
+        "heavy": ["transcription_text", "ai_summary", "remarks"],
+    },
+    "User": {
+        "pk": "user_id",
+        "columns": ["user_id", "username", "email"],
+        "heavy": [],
+    },
+    "Agent": {
+        "pk": "agent_id",
+        "columns": ["agent_id", "agent_name", "email", "agent_code"],
+        "heavy": [],
+    },
+    "Knowledge_Graph": {
+        "pk": "knowledge_graph_id",
+        "columns": ["knowledge_graph_id", "user_id", "upload_time", "json_data"],
+        "heavy": ["json_data"],
+    },
+}
+
+
+def select_columns(table, fields=None):
+    """
+    Resolves a comma-separated ?fields= value into a validated column list.
+    The primary key is always included so the next cursor can be computed.
+    """
+    spec = TABLE_COLUMNS[table]
+    if not fields:
+        columns = [c for c in spec["columns"] if c not in spec["heavy"]]
+    elif fields.strip() == "all":
+        columns = list(spec["columns"])
+    else:
+        columns = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [c for c in columns if c not in spec["columns"]]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(spec['columns'])}"
+            )
+    if spec["pk"] not in columns:
+        columns.insert(0, spec["pk"])
+    return columns
+
+
+def call_filters(agent_id=None, user_id=None, date_from=None, date_to=None):
+    """The (sql_fragment, value) filters shared by the call list and export endpoints."""
+    filters = []
+    if agent_id is not None:
+        filters.append(("agent_id = %s", agent_id))
+    if user_id is not None:
+        filters.append(("user_id = %s", user_id))
+    if date_from is not None:
+        filters.append(("call_date >= %s", date_from))
+    if date_to is not None:
+        filters.append(("call_date < %s", date_to))
+    return filters
+
+
+def keyset_query(table, columns, filters=None, cursor=None, limit=DEFAULT_LIMIT):
+    """The (query, params) keyset_page runs; also EXPLAINed by `migrate.py --check`."""
+    pk = TABLE_COLUMNS[table]["pk"]
+    clauses = []
+    params = []
+    for fragment, value in filters or []:
+        clauses.append(fragment)
+        params.append(value)
+    if cursor is not None:
+        clauses.append(f"{pk} > %s")
+        params.append(cursor)
+
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    # Fetch one extra row to know whether another page exists
+    query += f" ORDER BY {pk} LIMIT %s"
+    params.append(limit + 1)
+    return query, tuple(params)
+
+
+def keyset_page(cur, table, columns, filters=None, cursor=None, limit=DEFAULT_LIMIT):
+    """
+    Runs one keyset-paginated SELECT ordered by primary key.
+
+    `filters` is a list of (sql_fragment, value) pairs ANDed into the WHERE clause.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    if limit < 1 or limit > MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_LIMIT}")
+
+    cur.execute(*keyset_query(table, columns, filters, cursor, limit))
+    rows = cur.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1][TABLE_COLUMNS[table]["pk"]]
+    return rows, next_cursor
+
+
+def set_page_headers(response, next_cursor):
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+
+
+def page_headers(next_cursor):
+    """The same header as set_page_headers, as a dict for responses built outside the route."""
+    return {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else {}
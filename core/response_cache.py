@@ -0,0 +1,332 @@
+import collections
+import hashlib
+import json
+import threading
+import time
+from email.utils import formatdate
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+from core.config import settings
+from core.database import connect_unpooled, get_connection
+
+# Headers worth replaying from a cached response besides the body
+REPLAYED_HEADERS = ("X-Next-Cursor",)
+
+
+# Tables whose writes invalidate cached responses; bumped wholesale after a migration
+CACHED_TABLES = ("User", "Agent", "Calls", "Knowledge_Graph", "Agent_Performance", "Agent_Performance_Daily")
+
+TABLE_VERSIONS_DDL = """
+CREATE TABLE IF NOT EXISTS Table_Versions (
+    table_name VARCHAR(64) NOT NULL PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    modified_at DOUBLE NOT NULL
+)
+"""
+
+
+def bump_statement(tables):
+    """(sql, params) bumping `tables`, for callers that bump inside their own transaction."""
+    return (
+        "INSERT INTO Table_Versions (table_name, version, modified_at) "
+        f"VALUES {', '.join(['(%s, 1, UNIX_TIMESTAMP(NOW(6)))'] * len(tables))} "
+        "ON DUPLICATE KEY UPDATE version = version + 1, modified_at = VALUES(modified_at)",
+        tuple(tables)
+    )
+
+
+class TableVersions:
+    """
+    Per-table write counters in Table_Versions, shared by every API worker
+    process and by the CLIs. Every create/update/delete bumps the tables it
+    touched, and a cached read is only reused while the versions it was built
+    from are unchanged, so invalidation never has to know which responses
+    exist and a write in one process is seen by the next read in any other.
+
+    Bumps after a commit go through one dedicated connection per process, so
+    a handler still holding a pooled connection never waits on the pool for
+    a second one. Async routes run bump_statement() in their own transaction
+    and call mark_stale() after it commits.
+
+    Reads are served from an in-memory copy of the whole table, refreshed at
+    most every RESPONSE_CACHE_VERSIONS_REFRESH_MS and right after this
+    process bumps, so a 304 normally never touches MySQL. A write made by
+    another process is seen by this one within that interval.
+    """
+
+    def __init__(self, connect=None, connect_reads=None):
+        self.connect = connect or connect_unpooled
+        self.connect_reads = connect_reads or get_connection
+        self._lock = threading.Lock()
+        self._conn = None
+        self._started = time.time()
+        self.failed_bumps = 0
+        self.refresh_interval = settings.RESPONSE_CACHE_VERSIONS_REFRESH_MS / 1000
+        self._refresh_lock = threading.Lock()
+        self._versions = None
+        self._fetched_at = 0.0
+        self.refreshes = 0
+
+    def bump(self, *tables):
+        sql, params = bump_statement(tables)
+        with self._lock:
+            # One retry on a fresh connection covers a dedicated connection the server dropped
+            for attempt in (1, 2):
+                try:
+                    if self._conn is None:
+                        self._conn = self.connect()
+                    cur = self._conn.cursor()
+                    try:
+                        cur.execute(sql, params)
+                        self._conn.commit()
+                    finally:
+                        cur.close()
+                    self.mark_stale()
+                    return
+                except Exception as e:
+                    self._reset()
+                    if attempt == 2:
+                        # Entries built before this write now only expire with RESPONSE_CACHE_TTL
+                        self.failed_bumps += 1
+                        print(f"Table version bump for {', '.join(tables)} failed: {e}")
+
+    def mark_stale(self):
+        """Makes the next snapshot re-read Table_Versions (after a bump made outside bump())."""
+        self._fetched_at = 0.0
+
+    def _reset(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _read(self):
+        conn = self.connect_reads()
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT table_name, version, modified_at FROM Table_Versions")
+            rows = {name: (version, float(modified)) for name, version, modified in cur.fetchall()}
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+        return rows
+
+    def _current(self):
+        versions = self._versions
+        if versions is not None and time.monotonic() - self._fetched_at < self.refresh_interval:
+            return versions
+        # One thread re-reads; the others keep using the previous copy meanwhile
+        if not self._refresh_lock.acquire(blocking=versions is None):
+            return versions
+        try:
+            if self._versions is not None and time.monotonic() - self._fetched_at < self.refresh_interval:
+                return self._versions
+            fetched_at = time.monotonic()
+            self._versions = self._read()
+            self._fetched_at = fetched_at
+            self.refreshes += 1
+            return self._versions
+        finally:
+            self._refresh_lock.release()
+
+    def snapshot(self, tables):
+        """(versions of `tables`, time of the latest write to any of them; process start if none)."""
+        rows = self._current()
+        versions = tuple(rows[t][0] if t in rows else 0 for t in tables)
+        last_modified = max([rows[t][1] for t in tables if t in rows] or [self._started])
+        return versions, last_modified
+
+    def stats(self):
+        try:
+            versions = {name: version for name, (version, _) in self._current().items()}
+        except Exception as e:
+            versions = {"error": str(e)}
+        return {"versions": versions, "failed_bumps": self.failed_bumps, "refreshes": self.refreshes}
+
+
+class _Entry:
+    __slots__ = ("versions", "built", "last_modified", "etag", "body", "headers")
+
+    def __init__(self, versions, built, last_modified, etag, body, headers):
+        self.versions = versions
+        self.built = built
+        self.last_modified = last_modified
+        self.etag = etag
+        self.body = body
+        self.headers = headers
+
+
+def _encode(payload):
+    return json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode("utf-8")
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 13.1.2): W/ prefixes are ignored
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((c[2:] if c.startswith("W/") else c) == bare for c in candidates)
+
+
+class ResponseCache:
+    """
+    LRU of serialized JSON responses for list endpoints, keyed by path and
+    query string and validated against TableVersions. Capped by the total
+    size of the cached bodies; a body larger than max_entry_bytes is never
+    kept but is still served with an ETag, so 304s work for it too.
+
+    The ETag is a hash of the response body, so it is the same in every
+    process and survives a rebuild that produced identical data. While an
+    entry is fresh (table versions unchanged and younger than the TTL) a
+    matching If-None-Match is answered with 304 and a hit is served from
+    memory; neither runs the endpoint's query, only a primary-key read of
+    Table_Versions.
+    """
+
+    def __init__(self, versions, max_entries=None, ttl=None, max_bytes=None, max_entry_bytes=None):
+        self.versions = versions
+        self.max_entries = max_entries or settings.RESPONSE_CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or settings.RESPONSE_CACHE_MAX_BYTES
+        self.max_entry_bytes = max_entry_bytes or settings.RESPONSE_CACHE_MAX_ENTRY_BYTES
+        self.ttl = ttl if ttl is not None else settings.RESPONSE_CACHE_TTL
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.oversized = 0
+        self.not_modified = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(request):
+        query = "&".join(sorted(request.url.query.split("&"))) if request.url.query else ""
+        return f"{request.url.path}?{query}"
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _is_fresh(self, entry, versions):
+        return entry.versions == versions and time.monotonic() - entry.built <= self.ttl
+
+    def _store(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.body)
+            if len(entry.body) > self.max_entry_bytes:
+                self.oversized += 1
+                return
+            self._entries[key] = entry
+            self._bytes += len(entry.body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+
+    def serve(self, request, tables, produce):
+        """
+        Returns the response for a GET on `tables`. `produce()` is only called
+        on a miss and returns (payload, headers); headers listed in
+        REPLAYED_HEADERS are kept with the cached body.
+        """
+        if not settings.RESPONSE_CACHE_ENABLED:
+            payload, headers = produce()
+            return self._response(_encode(payload), headers)
+
+        key = self.key(request)
+        # Snapshot before producing: a write racing the query leaves the entry stale, never wrong
+        try:
+            versions, modified = self.versions.snapshot(tables)
+        except Exception as e:
+            # Without the shared versions no cached entry can be trusted
+            print(f"Table versions unavailable, serving uncached: {e}")
+            payload, headers = produce()
+            return self._response(_encode(payload), headers)
+        if_none_match = request.headers.get("if-none-match")
+        entry = self._lookup(key)
+        if entry is not None and self._is_fresh(entry, versions):
+            if _etag_matches(if_none_match, entry.etag):
+                self.not_modified += 1
+                return self._not_modified(entry)
+            self.hits += 1
+            return self._response(entry.body, entry.headers, entry)
+
+        self.misses += 1
+        previous = entry
+        payload, headers = produce()
+        body = _encode(payload)
+        etag = 'W/"' + hashlib.sha1(body).hexdigest() + '"'
+        kept = {h: v for h, v in (headers or {}).items() if h in REPLAYED_HEADERS}
+        if previous is not None and previous.etag == etag:
+            last_modified = previous.last_modified
+        else:
+            last_modified = modified
+            if previous is not None:
+                # Changed without a version bump (a failed bump, or a write from outside the app)
+                last_modified = max(last_modified, time.time())
+        entry = _Entry(versions, time.monotonic(), last_modified, etag, body, kept)
+        self._store(key, entry)
+        if _etag_matches(if_none_match, etag):
+            self.not_modified += 1
+            return self._not_modified(entry)
+        return self._response(body, kept, entry)
+
+    def _validators(self, entry):
+        return {
+            "ETag": entry.etag,
+            "Last-Modified": formatdate(entry.last_modified, usegmt=True),
+            # Clients may keep the body but must revalidate before reusing it
+            "Cache-Control": "no-cache",
+        }
+
+    def _not_modified(self, entry):
+        return Response(status_code=304, headers=self._validators(entry))
+
+    def _response(self, body, headers, entry=None):
+        headers = dict(headers or {})
+        if entry is not None:
+            headers.update(self._validators(entry))
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+            cached_bytes = self._bytes
+        return {
+            "entries": size,
+            "max_entries": self.max_entries,
+            "bytes": cached_bytes,
+            "max_bytes": self.max_bytes,
+            "oversized": self.oversized,
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+            "misses": self.misses,
+            "table_versions": self.versions.stats(),
+        }
+
+
+table_versions = TableVersions()
+_cache = None
+
+
+def get_response_cache():
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(table_versions)
+    return _cache
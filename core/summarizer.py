@@ -0,0 +1,250 @@
+import hashlib
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from core import call_text
+from core.config import settings
+from utils.text_processing import split_sentences, tokenize
+
+# Call_Text.summary_source_sha1 holds the sha1 of the transcript a summary was
+# built from; a call is only summarized again when its transcript changes.
+SOURCE_HASH_COLUMN = "summary_source_sha1"
+
+# Transcripts never summarized, by call_id; params (after call_id, limit)
+SWEEP_QUERY = f"""
+    SELECT call_id FROM Call_Text
+    WHERE call_id > %s AND transcription_text IS NOT NULL AND {SOURCE_HASH_COLUMN} IS NULL
+    ORDER BY call_id LIMIT %s
+"""
+
+_REDUNDANCY = 0.6
+# Conversational words not in the shared STOPWORDS that carry nothing for ranking
+_FILLER = frozenset("also get got know like really right said say us well yes".split())
+
+
+def transcript_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+def _content_words(sentence):
+    return [w for w in tokenize(sentence) if len(w) > 2 and w not in _FILLER]
+
+
+def summarize(text, max_sentences=3):
+    """
+    Extractive summary: sentences are ranked by how many of the transcript's
+    frequent content words they contain (normalized by sentence length),
+    near-duplicates of an already chosen sentence are skipped, and the picks
+    are returned in transcript order. Linear in the transcript length.
+    """
+    if not text or not text.strip():
+        return None
+    sentences = split_sentences(text)
+    if len(sentences) <= max_sentences:
+        return " ".join(sentences)
+
+    words = [set(_content_words(s)) for s in sentences]
+    frequency = {}
+    for sentence_words in words:
+        for w in sentence_words:
+            frequency[w] = frequency.get(w, 0) + 1
+    top = max(frequency.values(), default=1)
+
+    scores = []
+    for index, sentence_words in enumerate(words):
+        if not sentence_words:
+            continue
+        weight = sum(frequency[w] for w in sentence_words) / top
+        scores.append((weight / math.sqrt(len(sentence_words)), index))
+    scores.sort(key=lambda s: (-s[0], s[1]))
+
+    chosen = []
+    for _, index in scores:
+        candidate = words[index]
+        if any(len(candidate & words[i]) / len(candidate | words[i]) > _REDUNDANCY for i in chosen):
+            continue
+        chosen.append(index)
+        if len(chosen) == max_sentences:
+            break
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+def _summarize_many(texts, max_sentences):
+    # Runs in a worker process so ranking never holds the API process's GIL
+    return [summarize(text, max_sentences) for text in texts]
+
+
+def ensure_schema(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Call_Text' AND COLUMN_NAME = %s
+        """, (SOURCE_HASH_COLUMN,))
+        if cur.fetchone()[0] == 0:
+            # The index keeps the backlog sweep (hash IS NULL, by call_id) off a full scan
+            cur.execute(
+                f"ALTER TABLE Call_Text ADD COLUMN {SOURCE_HASH_COLUMN} BINARY(20) NULL, "
+                f"ADD INDEX idx_call_text_summary_source ({SOURCE_HASH_COLUMN})"
+            )
+        conn.commit()
+    finally:
+        cur.close()
+
+
+class SummaryPipeline:
+    """
+    Fills Call_Text.ai_summary in the background.
+
+    Calls are queued in memory as their transcripts are saved; a thread takes
+    them in batches, skips the ones whose transcript hash matches the stored
+    one, ranks the rest in a worker process and writes summaries and hashes
+    back with one multi-row upsert per batch. Every poll_interval it also
+    sweeps Call_Text for transcripts that were never summarized (backlog,
+    transcripts saved by another process), so the in-memory queue being lost
+    on restart costs nothing.
+    """
+
+    def __init__(self, connect, workers=None, batch_size=None, max_sentences=None,
+                 poll_interval=None, on_saved=None):
+        self.connect = connect
+        # Called with the call ids whose summaries were just committed
+        self.on_saved = on_saved
+        self.workers = workers or settings.SUMMARY_WORKERS
+        self.batch_size = batch_size or settings.SUMMARY_BATCH_SIZE
+        self.max_sentences = max_sentences or settings.SUMMARY_SENTENCES
+        self.poll_interval = poll_interval or settings.SUMMARY_POLL_INTERVAL
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+        self._sweep_from = 0
+        self.summarized = 0
+        self.unchanged = 0
+
+    def start(self):
+        if self._thread:
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="summary-pipeline", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def enqueue(self, call_ids):
+        with self._lock:
+            self._pending.update(call_ids)
+        self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {"pending": pending, "summarized": self.summarized, "unchanged": self.unchanged}
+
+    # ----- worker -----
+    def _take(self):
+        with self._lock:
+            batch = sorted(self._pending)[:self.batch_size]
+            self._pending.difference_update(batch)
+            if not self._pending:
+                self._wake.clear()
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                batch = self._take()
+                if batch:
+                    self.process(batch)
+                    continue
+                swept = self._sweep()
+                if swept:
+                    self.process(swept)
+                    continue
+            except Exception as e:
+                print(f"Summary pipeline error: {e}")
+            self._wake.wait(self.poll_interval)
+
+    def _sweep(self):
+        # Keyset walk over Call_Text's primary key; wraps around once it reaches the end
+        conn = self.connect()
+        cur = conn.cursor()
+        try:
+            cur.execute(SWEEP_QUERY, (self._sweep_from, self.batch_size))
+            call_ids = [row[0] for row in cur.fetchall()]
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+        self._sweep_from = call_ids[-1] if call_ids else 0
+        return call_ids
+
+    def process(self, call_ids):
+        """Summarizes the calls in `call_ids` whose transcript changed. Returns the ids written."""
+        conn = self.connect()
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                f"SELECT call_id, transcription_text, {SOURCE_HASH_COLUMN} FROM Call_Text "
+                f"WHERE call_id IN ({', '.join(['%s'] * len(call_ids))})",
+                tuple(call_ids)
+            )
+            changed = []
+            for call_id, stored_text, stored_hash in cur.fetchall():
+                # Empty transcripts get a hash and no summary so the sweep moves past them
+                text = call_text.decompress(stored_text) or ""
+                digest = transcript_hash(text)
+                if stored_hash is not None and bytes(stored_hash) == digest:
+                    self.unchanged += 1
+                    continue
+                changed.append((call_id, text, digest))
+            conn.commit()
+            if not changed:
+                return []
+
+            summaries = self._summarize([text for _, text, _ in changed])
+            params = []
+            for (call_id, _, digest), summary in zip(changed, summaries):
+                params.extend([call_id, call_text.compress(summary), digest])
+            # A transcript rewritten meanwhile keeps the old hash here and is redone when its save is queued
+            cur.execute(
+                f"INSERT INTO Call_Text (call_id, ai_summary, {SOURCE_HASH_COLUMN}) "
+                f"VALUES {', '.join(['(%s, %s, %s)'] * len(changed))} "
+                f"ON DUPLICATE KEY UPDATE ai_summary = VALUES(ai_summary), "
+                f"{SOURCE_HASH_COLUMN} = VALUES({SOURCE_HASH_COLUMN})",
+                tuple(params)
+            )
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+
+        written = [call_id for call_id, _, _ in changed]
+        self.summarized += len(written)
+        if self.on_saved:
+            self.on_saved(written)
+        return written
+
+    def _summarize(self, texts):
+        if self._executor is None:
+            return _summarize_many(texts, self.max_sentences)
+        # One chunk per worker so a batch spreads over all of them
+        size = math.ceil(len(texts) / self.workers)
+        chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+        futures = [self._executor.submit(_summarize_many, chunk, self.max_sentences) for chunk in chunks]
+        return [summary for future in futures for summary in future.result()]
@@ -0,0 +1,303 @@
+import os
+import re
+import sqlite3
+import threading
+
+from core import call_text
+from core.config import settings
+
+TEXT_COLUMNS = ("transcription_text", "ai_summary", "remarks")
+FIELD_ALIASES = {"transcript": "transcription_text", "summary": "ai_summary", "remarks": "remarks"}
+# bm25 column weights, in TEXT_COLUMNS order; a hit in the summary counts for more
+RANK_WEIGHTS = (1.0, 1.5, 1.0)
+OPERATORS = ("AND", "OR", "NOT", "(", ")")
+QUERY_TOKEN_RE = re.compile(r'"[^"]*"?|[()]|[^\s()"]+')
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+TABLES_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS {text} USING fts5(
+    transcription_text, ai_summary, remarks,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS {meta} (
+    call_id INTEGER PRIMARY KEY,
+    agent_id INTEGER,
+    user_id INTEGER,
+    call_date TEXT
+);
+"""
+INDEX_SCHEMA = """
+CREATE INDEX IF NOT EXISTS idx_call_meta_agent ON call_meta (agent_id, call_date);
+CREATE INDEX IF NOT EXISTS idx_call_meta_user ON call_meta (user_id, call_date);
+CREATE INDEX IF NOT EXISTS idx_call_meta_date ON call_meta (call_date);
+"""
+SCHEMA = TABLES_SCHEMA.format(text="call_text", meta="call_meta") + INDEX_SCHEMA
+# rebuild() fills these and swaps them in for call_text / call_meta
+SHADOW_TEXT = "call_text_rebuild"
+SHADOW_META = "call_meta_rebuild"
+
+
+def _decode_text(row):
+    # Transcript and summary come out of Call_Text compressed
+    return tuple(row[:4]) + tuple(call_text.decode(c, v) for c, v in zip(TEXT_COLUMNS, row[4:]))
+
+
+class InvalidSearchQuery(ValueError):
+    pass
+
+
+def build_match(query: str) -> str:
+    """
+    Turns a user query into an FTS5 MATCH expression. Bare words are ANDed,
+    "quoted text" is a phrase, AND/OR/NOT and parentheses pass through, and
+    a trailing * makes a word a prefix search. Everything else is quoted so
+    user input can never reach FTS5 syntax directly.
+    """
+    parts = []
+    for token in QUERY_TOKEN_RE.findall(query or ""):
+        if token in OPERATORS:
+            parts.append(token)
+            continue
+        words = WORD_RE.findall(token.lower())
+        if not words:
+            continue
+        phrase = '"' + " ".join(words) + '"'
+        if token.endswith("*") and not token.startswith('"'):
+            phrase += "*"
+        parts.append(phrase)
+    if not any(p not in OPERATORS for p in parts):
+        raise InvalidSearchQuery("Search query has no searchable words")
+    return " ".join(parts)
+
+
+def _date_text(value):
+    if value is None:
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat(sep=" ") if hasattr(value, "hour") else value.isoformat()
+    return str(value)
+
+
+class TranscriptSearchIndex:
+    """
+    Embedded SQLite FTS5 index over each call's transcription_text, ai_summary and
+    remarks, with agent/user/date kept alongside for filtering.
+
+    The index is derived data: write paths call refresh()/remove() with the
+    call ids they touched and rebuild() repopulates it from MySQL into
+    shadow tables that replace the live ones in one transaction, so searches
+    see the old index until the new one is complete. Each thread reads
+    through its own SQLite connection (WAL, so readers never wait on the
+    writer); writes are serialized by a lock.
+    """
+
+    def __init__(self, connect, path=None):
+        self.connect = connect
+        self.path = path or settings.SEARCH_INDEX_PATH
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # Calls written while a rebuild runs; re-read once its tables are swapped in
+        self._rebuilding = False
+        self._dirty = set()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._write_lock:
+            self._db().executescript(SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            self._local.db = db
+        return db
+
+    def _fetch_calls(self, cur, call_ids):
+        cur.execute(
+            f"SELECT call_id, agent_id, user_id, call_date, {', '.join(TEXT_COLUMNS)} "
+            f"FROM {call_text.CALLS_WITH_TEXT} WHERE call_id IN ({', '.join(['%s'] * len(call_ids))})",
+            tuple(call_ids)
+        )
+        return [_decode_text(row) for row in cur.fetchall()]
+
+    def refresh(self, call_ids):
+        """Re-reads the given calls from MySQL and re-indexes them."""
+        call_ids = list(dict.fromkeys(call_ids))
+        if not call_ids:
+            return 0
+        conn = self.connect()
+        cur = conn.cursor()
+        try:
+            rows = self._fetch_calls(cur, call_ids)
+        finally:
+            cur.close()
+            conn.close()
+        found = {row[0] for row in rows}
+        self.index_rows(rows, remove=[c for c in call_ids if c not in found])
+        return len(rows)
+
+    def index_rows(self, rows, remove=()):
+        """
+        Upserts (call_id, agent_id, user_id, call_date, transcription_text,
+        ai_summary, remarks) tuples in one transaction. Calls with no text
+        at all are dropped from the index.
+        """
+        db = self._db()
+        with self._write_lock, db:
+            if self._rebuilding:
+                self._dirty.update(remove)
+                self._dirty.update(row[0] for row in rows)
+            stale = [(call_id,) for call_id in remove]
+            stale += [(row[0],) for row in rows]
+            db.executemany("DELETE FROM call_text WHERE rowid = ?", stale)
+            db.executemany("DELETE FROM call_meta WHERE call_id = ?", stale)
+            self._insert(db, rows, "call_text", "call_meta")
+
+    @staticmethod
+    def _insert(db, rows, text_table, meta_table):
+        rows = [row for row in rows if any(row[4:])]
+        db.executemany(
+            f"INSERT INTO {text_table} (rowid, transcription_text, ai_summary, remarks) VALUES (?, ?, ?, ?)",
+            [(row[0], row[4], row[5], row[6]) for row in rows]
+        )
+        db.executemany(
+            f"INSERT INTO {meta_table} (call_id, agent_id, user_id, call_date) VALUES (?, ?, ?, ?)",
+            [(row[0], row[1], row[2], _date_text(row[3])) for row in rows]
+        )
+        return len(rows)
+
+    def remove(self, call_ids):
+        self.index_rows([], remove=call_ids)
+
+    def rebuild(self, batch_size=5000):
+        """
+        Replaces the whole index with what is in MySQL. Returns the number of
+        calls indexed. The live tables keep serving searches (and taking
+        refreshes) until the rebuilt ones replace them.
+        """
+        db = self._db()
+        with self._write_lock:
+            if self._rebuilding:
+                raise RuntimeError("A search index rebuild is already running")
+            self._rebuilding = True
+            self._dirty.clear()
+            # Leftovers of a rebuild interrupted by a crash
+            db.execute(f"DROP TABLE IF EXISTS {SHADOW_TEXT}")
+            db.execute(f"DROP TABLE IF EXISTS {SHADOW_META}")
+            db.executescript(TABLES_SCHEMA.format(text=SHADOW_TEXT, meta=SHADOW_META))
+        try:
+            indexed = self._fill_shadow(db, batch_size)
+            with self._write_lock:
+                # Merge the b-tree segments written batch by batch
+                db.execute(f"INSERT INTO {SHADOW_TEXT} ({SHADOW_TEXT}) VALUES ('optimize')")
+                db.commit()
+                db.execute("BEGIN IMMEDIATE")
+                try:
+                    db.execute("DROP TABLE call_text")
+                    db.execute("DROP TABLE call_meta")
+                    db.execute(f"ALTER TABLE {SHADOW_TEXT} RENAME TO call_text")
+                    db.execute(f"ALTER TABLE {SHADOW_META} RENAME TO call_meta")
+                    for statement in INDEX_SCHEMA.strip().split(";"):
+                        if statement.strip():
+                            db.execute(statement)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
+                dirty, self._dirty = self._dirty, set()
+                self._rebuilding = False
+        except Exception:
+            with self._write_lock:
+                self._rebuilding = False
+                self._dirty.clear()
+                db.execute(f"DROP TABLE IF EXISTS {SHADOW_TEXT}")
+                db.execute(f"DROP TABLE IF EXISTS {SHADOW_META}")
+                db.commit()
+            raise
+        # Writes that landed in the old tables while the shadow was filling
+        self.refresh(dirty)
+        return indexed
+
+    def _fill_shadow(self, db, batch_size):
+        indexed = 0
+        last_id = 0
+        conn = self.connect()
+        cur = conn.cursor()
+        try:
+            while True:
+                cur.execute(
+                    f"SELECT call_id, agent_id, user_id, call_date, {', '.join(TEXT_COLUMNS)} "
+                    f"FROM {call_text.CALLS_WITH_TEXT} WHERE call_id > %s ORDER BY call_id LIMIT %s",
+                    (last_id, batch_size)
+                )
+                rows = [_decode_text(row) for row in cur.fetchall()]
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                with self._write_lock, db:
+                    indexed += self._insert(db, rows, SHADOW_TEXT, SHADOW_META)
+        finally:
+            cur.close()
+            conn.close()
+        return indexed
+
+    def count(self):
+        return self._db().execute("SELECT COUNT(*) FROM call_meta").fetchone()[0]
+
+    def search(self, query, agent_id=None, user_id=None, date_from=None, date_to=None,
+               fields=None, limit=20, offset=0):
+        """
+        Best-ranked calls for `query` (see build_match), each with its bm25
+        score and a snippet of the best-matching column with hits wrapped
+        in <mark></mark>. `fields` restricts matching to some of transcript,
+        summary and remarks.
+        """
+        match = build_match(query)
+        if fields:
+            try:
+                columns = [FIELD_ALIASES[f.strip()] for f in fields.split(",") if f.strip()]
+            except KeyError as e:
+                raise InvalidSearchQuery(f"Unknown search field {e}; use {', '.join(FIELD_ALIASES)}")
+            match = "{" + " ".join(columns) + "} : (" + match + ")"
+
+        clauses = ["call_text MATCH ?"]
+        params = [match]
+        for clause, value in (("m.agent_id = ?", agent_id), ("m.user_id = ?", user_id),
+                              ("m.call_date >= ?", _date_text(date_from)),
+                              ("m.call_date < ?", _date_text(date_to))):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        weights = ", ".join(str(w) for w in RANK_WEIGHTS)
+        sql = f"""
+            SELECT m.call_id, m.agent_id, m.user_id, m.call_date,
+                   bm25(call_text, {weights}) AS score,
+                   snippet(call_text, -1, '<mark>', '</mark>', '…', 16) AS snippet
+            FROM call_text JOIN call_meta m ON m.call_id = call_text.rowid
+            WHERE {' AND '.join(clauses)}
+            ORDER BY score
+            LIMIT ? OFFSET ?
+        """
+        try:
+            rows = self._db().execute(sql, params + [limit, offset]).fetchall()
+        except sqlite3.OperationalError as e:
+            raise InvalidSearchQuery(f"Invalid search query: {e}")
+        return [
+            {"call_id": call_id, "agent_id": agent, "user_id": user, "call_date": call_date,
+             "score": round(-score, 6), "snippet": snippet}
+            for call_id, agent, user, call_date, score, snippet in rows
+        ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_transcript_search():
+    """The search index shared by main.py and the transcription workers in this process."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            from core.database import get_connection
+            _index = TranscriptSearchIndex(connect=get_connection)
+    return _index
@@ -0,0 +1,144 @@
+import json
+import math
+import threading
+import time
+
+from core.config import settings
+
+
+def segment_event(segment):
+    logprob = segment.get("avg_logprob")
+    return {
+        "index": segment["id"],
+        "text": segment["text"],
+        "start": round(segment["start"], 3),
+        "end": round(segment["end"], 3),
+        "confidence": round(math.exp(logprob), 4) if logprob is not None else None,
+    }
+
+
+def sse(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class StreamSession:
+    """
+    One transcription run for a call. A producer thread appends segments as
+    Whisper emits them; any number of readers follow along from whatever
+    segment index they last saw. Readers get their done event as soon as
+    the last segment is in; saving the transcript happens after that, and a
+    failed save is kept in save_error instead of being shown as a failed run.
+    """
+
+    def __init__(self, call_id, audio_path, model_name, executor=None, audio_hash=None):
+        self.call_id = call_id
+        self.audio_path = audio_path
+        self.audio_hash = audio_hash
+        self.model_name = model_name
+        self.executor = executor
+        self.segments = []
+        self.done = False
+        self.error = None
+        self.save_error = None
+        self.finished_at = None
+        self._cond = threading.Condition()
+
+    def run(self, on_complete):
+        from runwisper import stream_transcription
+        try:
+            for segment in stream_transcription(self.audio_path, self.model_name, executor=self.executor,
+                                                audio_hash=self.audio_hash):
+                with self._cond:
+                    self.segments.append(segment_event(segment))
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            with self._cond:
+                self.done = True
+                self.finished_at = time.monotonic()
+                self._cond.notify_all()
+        if self.error:
+            return
+        try:
+            on_complete(self.call_id, self.text())
+        except Exception as e:
+            self.save_error = str(e)
+            print(f"Saving streamed transcript for call {self.call_id} failed: {e}")
+
+    def text(self):
+        return "".join(s["text"] for s in self.segments).strip()
+
+    def follow(self, start_index=0, keepalive=15.0):
+        """
+        Yields SSE frames for every segment from start_index on, blocking
+        for new ones, then a final done (or error) event.
+        """
+        index = start_index
+        while True:
+            with self._cond:
+                while index >= len(self.segments) and not self.done:
+                    if not self._cond.wait(keepalive):
+                        break
+                pending = self.segments[index:]
+                finished = self.done and index + len(pending) >= len(self.segments)
+            if not pending and not finished:
+                # Comment frame keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            for segment in pending:
+                yield sse("segment", segment, event_id=segment["index"])
+            index += len(pending)
+            if finished:
+                if self.error:
+                    yield sse("error", {"call_id": self.call_id, "detail": self.error})
+                else:
+                    yield sse("done", {"call_id": self.call_id, "segments": index, "text": self.text()})
+                return
+
+
+class TranscriptStreamer:
+    """
+    Keeps one session per call and model so reconnecting clients resume the
+    run that is already in progress. Finished sessions are kept for
+    TRANSCRIBE_STREAM_SESSION_TTL seconds to serve late reconnects; a run
+    that failed, or whose transcript could not be saved, is started again.
+    """
+
+    def __init__(self, on_complete, executor=None):
+        self.on_complete = on_complete
+        # Returns the pool chunks run on (the transcription job pool in the API)
+        self.executor = executor
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def open(self, call_id, audio_path, model_name=None, audio_hash=None):
+        model_name = model_name or settings.WHISPER_MODEL
+        key = (call_id, model_name)
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(key)
+            if session is None or session.error or session.save_error:
+                session = StreamSession(call_id, audio_path, model_name,
+                                        executor=self.executor() if self.executor else None,
+                                        audio_hash=audio_hash)
+                self._sessions[key] = session
+                threading.Thread(
+                    target=session.run, args=(self.on_complete,),
+                    name=f"transcript-stream-{call_id}", daemon=True
+                ).start()
+            return session
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [
+            key for key, s in self._sessions.items()
+            if s.done and now - s.finished_at > settings.TRANSCRIBE_STREAM_SESSION_TTL
+        ]
+        for key in expired:
+            del self._sessions[key]
@@ -0,0 +1,260 @@
+# routers/agent_performance.py
+
+from fastapi import APIRouter, HTTPException, Depends
+from core.database import get_db
+from core.response_cache import table_versions
+from datetime import date
+from typing import Optional
+import mysql.connector
+
+router = APIRouter(prefix="/agents", tags=["agent-performance"])
+
+METRICS = ["greeting", "knowledge", "empathy", "script_adherence", "overall"]
+PASSING_COMPLIANCE = ("pass", "passed", "compliant", "yes", "1", "true")
+
+# Per metric we keep count, sum and sum of squares, so mean and variance can be
+# read in O(1) and a call's contribution can be subtracted again exactly.
+_ROLLUP_COLUMNS = ",\n    ".join(
+    f"{m}_count INT NOT NULL DEFAULT 0, {m}_sum DOUBLE NOT NULL DEFAULT 0, {m}_sumsq DOUBLE NOT NULL DEFAULT 0"
+    for m in METRICS
+)
+
+AGENT_PERFORMANCE_DDL = f"""
+CREATE TABLE IF NOT EXISTS Agent_Performance (
+    agent_id INT NOT NULL PRIMARY KEY,
+    calls_scored INT NOT NULL DEFAULT 0,
+    compliance_passed INT NOT NULL DEFAULT 0,
+    {_ROLLUP_COLUMNS},
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+)
+"""
+
+AGENT_PERFORMANCE_DAILY_DDL = f"""
+CREATE TABLE IF NOT EXISTS Agent_Performance_Daily (
+    agent_id INT NOT NULL,
+    call_day DATE NOT NULL,
+    calls_scored INT NOT NULL DEFAULT 0,
+    compliance_passed INT NOT NULL DEFAULT 0,
+    {_ROLLUP_COLUMNS},
+    PRIMARY KEY (agent_id, call_day)
+)
+"""
+
+SCORED_CALL_COLUMNS = (
+    "agent_id, DATE(call_date) AS call_day, compliance_status, greeting_score, knowledge_score, "
+    "empathy_score, script_adherence_score, overall_score"
+)
+
+# Calls.is_scored mirrors overall_score IS NOT NULL so idx_calls_scored_page can
+# return scored calls newest first straight from the index, without a filesort.
+SCORED_FLAG_COLUMN = "is_scored"
+SCORED_PAGE_COLUMNS = (
+    SCORED_FLAG_COLUMN, "call_id", "agent_id", "greeting_score", "compliance_status", "knowledge_score",
+    "empathy_score", "script_adherence_score", "overall_score",
+)
+
+# GET /calls/scores/all
+ALL_SCORES_QUERY = f"""
+    SELECT call_id, agent_id, greeting_score, compliance_status, knowledge_score,
+           empathy_score, script_adherence_score, overall_score, remarks
+    FROM Calls LEFT JOIN Call_Text USING (call_id)
+    WHERE {SCORED_FLAG_COLUMN} = 1
+    ORDER BY call_id DESC
+"""
+
+# GET /calls/scores/agent/{agent_id}
+AGENT_SCORES_QUERY = """
+    SELECT call_id, greeting_score, compliance_status, knowledge_score,
+           empathy_score, script_adherence_score, overall_score, remarks
+    FROM Calls LEFT JOIN Call_Text USING (call_id)
+    WHERE agent_id = %s AND overall_score IS NOT NULL
+"""
+
+
+def ensure_schema(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute(AGENT_PERFORMANCE_DDL)
+        cur.execute(AGENT_PERFORMANCE_DAILY_DDL)
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def _score_value(row, metric):
+    value = row.get(f"{metric}_score")
+    return float(value) if value is not None else None
+
+
+def _contribution(row, sign):
+    """Column deltas for adding (sign=1) or removing (sign=-1) one scored call."""
+    deltas = {
+        "calls_scored": sign,
+        "compliance_passed": sign if str(row.get("compliance_status") or "").strip().lower() in PASSING_COMPLIANCE else 0,
+    }
+    for m in METRICS:
+        value = _score_value(row, m)
+        if value is None:
+            deltas.update({f"{m}_count": 0, f"{m}_sum": 0.0, f"{m}_sumsq": 0.0})
+        else:
+            deltas.update({f"{m}_count": sign, f"{m}_sum": sign * value, f"{m}_sumsq": sign * value * value})
+    return deltas
+
+
+def _apply(cur, agent_id, call_day, deltas):
+    columns = list(deltas)
+    increments = ", ".join(f"{c} = {c} + VALUES({c})" for c in columns)
+    values = [deltas[c] for c in columns]
+    cur.execute(
+        f"INSERT INTO Agent_Performance (agent_id, {', '.join(columns)}) "
+        f"VALUES (%s, {', '.join(['%s'] * len(columns))}) ON DUPLICATE KEY UPDATE {increments}",
+        tuple([agent_id] + values)
+    )
+    if call_day is not None:
+        cur.execute(
+            f"INSERT INTO Agent_Performance_Daily (agent_id, call_day, {', '.join(columns)}) "
+            f"VALUES (%s, %s, {', '.join(['%s'] * len(columns))}) ON DUPLICATE KEY UPDATE {increments}",
+            tuple([agent_id, call_day] + values)
+        )
+
+
+def fetch_scored_call(cur, call_id):
+    """
+    Locks and returns the call's current scoring columns (dict), or None.
+    Call this before changing a call's scores inside the same transaction.
+    """
+    cur.execute(f"SELECT {SCORED_CALL_COLUMNS} FROM Calls WHERE call_id = %s FOR UPDATE", (call_id,))
+    row = cur.fetchone()
+    if row is not None and not isinstance(row, dict):
+        row = dict(zip([d[0] for d in cur.description], row))
+    return row
+
+
+def record_score_change(cur, before, after):
+    """
+    Moves a call's contribution from its old scores (`before`) to its new
+    ones (`after`). Either side may be None or unscored (overall_score NULL).
+    Runs on the caller's cursor so it commits with the score update.
+    """
+    for row, sign in ((before, -1), (after, 1)):
+        if row and row.get("overall_score") is not None and row.get("agent_id") is not None:
+            _apply(cur, row["agent_id"], row.get("call_day"), _contribution(row, sign))
+
+
+def rollup_select(daily=False):
+    """The aggregate SELECT rebuild_rollups inserts from; its params are PASSING_COMPLIANCE."""
+    sums = []
+    for m in METRICS:
+        col = f"{m}_score"
+        sums.append(f"COUNT({col}), COALESCE(SUM({col}), 0), COALESCE(SUM({col} * {col}), 0)")
+    aggregates = ", ".join(sums)
+    passed = "SUM(LOWER(TRIM(compliance_status)) IN (" + ", ".join(["%s"] * len(PASSING_COMPLIANCE)) + "))"
+    if daily:
+        return f"""
+            SELECT agent_id, DATE(call_date), COUNT(*), COALESCE({passed}, 0), {aggregates}
+            FROM Calls WHERE overall_score IS NOT NULL AND call_date IS NOT NULL
+            GROUP BY agent_id, DATE(call_date)
+        """
+    return f"""
+            SELECT agent_id, COUNT(*), COALESCE({passed}, 0), {aggregates}
+            FROM Calls WHERE overall_score IS NOT NULL GROUP BY agent_id
+        """
+
+
+def rebuild_rollups(conn):
+    """Recomputes every rollup from Calls in one pass (backfill / repair)."""
+    columns = ", ".join(f"{m}_count, {m}_sum, {m}_sumsq" for m in METRICS)
+
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM Agent_Performance")
+        cur.execute("DELETE FROM Agent_Performance_Daily")
+        cur.execute(
+            f"INSERT INTO Agent_Performance (agent_id, calls_scored, compliance_passed, {columns}) "
+            + rollup_select(),
+            PASSING_COMPLIANCE
+        )
+        cur.execute(
+            f"INSERT INTO Agent_Performance_Daily (agent_id, call_day, calls_scored, compliance_passed, {columns}) "
+            + rollup_select(daily=True),
+            PASSING_COMPLIANCE
+        )
+        conn.commit()
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def daily_query(agent_id, date_from=None, date_to=None):
+    query = "SELECT * FROM Agent_Performance_Daily WHERE agent_id = %s AND calls_scored > 0"
+    params = [agent_id]
+    if date_from:
+        query += " AND call_day >= %s"
+        params.append(date_from)
+    if date_to:
+        query += " AND call_day <= %s"
+        params.append(date_to)
+    return query + " ORDER BY call_day", tuple(params)
+
+
+def summarize(row):
+    """Turns a raw rollup row into count/mean/variance per metric."""
+    calls = row["calls_scored"]
+    summary = {
+        "agent_id": row["agent_id"],
+        "calls_scored": calls,
+        "compliance_pass_rate": row["compliance_passed"] / calls if calls else None,
+        "scores": {},
+    }
+    if "call_day" in row:
+        summary["call_day"] = row["call_day"]
+    for m in METRICS:
+        n = row[f"{m}_count"]
+        mean = row[f"{m}_sum"] / n if n else None
+        variance = max(row[f"{m}_sumsq"] / n - mean * mean, 0.0) if n else None
+        summary["scores"][m] = {"count": n, "sum": row[f"{m}_sum"], "mean": mean, "variance": variance}
+    return summary
+
+
+@router.get("/{agent_id}/performance")
+def get_agent_performance(agent_id: int, db=Depends(get_db)):
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT * FROM Agent_Performance WHERE agent_id = %s", (agent_id,))
+        result = cursor.fetchone()
+        if not result or not result["calls_scored"]:
+            raise HTTPException(status_code=404, detail="No scored calls for this agent")
+        return summarize(result)
+    except mysql.connector.Error as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cursor.close()
+
+
+@router.get("/{agent_id}/performance/daily")
+def get_agent_performance_daily(
+    agent_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db=Depends(get_db)
+):
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(*daily_query(agent_id, date_from, date_to))
+        return [summarize(row) for row in cursor.fetchall()]
+    except mysql.connector.Error as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cursor.close()
+
+
+@router.post("/performance/rebuild")
+def rebuild_agent_performance(db=Depends(get_db)):
+    try:
+        rebuild_rollups(db)
+        table_versions.bump("Agent_Performance", "Agent_Performance_Daily")
+        return {"message": "Agent performance rollups rebuilt"}
+    except mysql.connector.Error as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -2,25 +2,27 @@
 
 from fastapi import APIRouter, HTTPException, Depends
 from core.database import get_db
-from core.models import AgentCreate, AgentUpdate, AgentOut
-from typing import List
+from core.response_cache import table_versions
+from core.models import AgentCreate
 import mysql.connector
 
 router = APIRouter(prefix="/agents", tags=["agents"])
 
-@router.post("/", response_model=AgentOut)
+@router.post("/")
 def create_agent(agent: AgentCreate, db=Depends(get_db)):
     cursor = db.cursor(dictionary=True)
     try:
         cursor.execute(
-            "INSERT INTO Agent (name, department) VALUES (%s, %s)",
-            (agent.name, agent.department)
+            "INSERT INTO Agent (agent_name, email, agent_code) VALUES (%s, %s, %s)",
+            (agent.agent_name, agent.email, agent.agent_code)
         )
         db.commit()
+        table_versions.bump("Agent")
         return {
             "agent_id": cursor.lastrowid,
-            "name": agent.name,
-            "department": agent.department
+            "agent_name": agent.agent_name,
+            "email": agent.email,
+            "agent_code": agent.agent_code
         }
     except mysql.connector.Error as e:
         db.rollback()
@@ -28,7 +30,7 @@ def create_agent(agent: AgentCreate, db=Depends(get_db)):
     finally:
         cursor.close()
 
-@router.get("/", response_model=List[AgentOut])
+@router.get("/")
 def get_all_agents(db=Depends(get_db)):
     cursor = db.cursor(dictionary=True)
     try:
@@ -39,7 +41,7 @@ def get_all_agents(db=Depends(get_db)):
     finally:
         cursor.close()
 
-@router.get("/{agent_id}", response_model=AgentOut)
+@router.get("/{agent_id}")
 def get_agent_by_id(agent_id: int, db=Depends(get_db)):
     cursor = db.cursor(dictionary=True)
     try:
@@ -53,21 +55,23 @@ def get_agent_by_id(agent_id: int, db=Depends(get_db)):
     finally:
         cursor.close()
 
-@router.put("/{agent_id}", response_model=AgentOut)
-def update_agent(agent_id: int, agent: AgentUpdate, db=Depends(get_db)):
+@router.put("/{agent_id}")
+def update_agent(agent_id: int, agent: AgentCreate, db=Depends(get_db)):
     cursor = db.cursor(dictionary=True)
     try:
         cursor.execute(
-            "UPDATE Agent SET name = %s, department = %s WHERE agent_id = %s",
-            (agent.name, agent.department, agent_id)
+            "UPDATE Agent SET agent_name = %s, email = %s, agent_code = %s WHERE agent_id = %s",
+            (agent.agent_name, agent.email, agent.agent_code, agent_id)
         )
         db.commit()
+        table_versions.bump("Agent")
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Agent not found")
         return {
             "agent_id": agent_id,
-            "name": agent.name,
-            "department": agent.department
+            "agent_name": agent.agent_name,
+            "email": agent.email,
+            "agent_code": agent.agent_code
         }
     except mysql.connector.Error as e:
         db.rollback()
@@ -81,6 +85,7 @@ def delete_agent(agent_id: int, db=Depends(get_db)):
     try:
         cursor.execute("DELETE FROM Agent WHERE agent_id = %s", (agent_id,))
         db.commit()
+        table_versions.bump("Agent")
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Agent not found")
         return {"message": "Agent deleted successfully"}
@@ -1,7 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from core.database import get_db
+from core.async_database import get_async_db
+from core.response_cache import bump_statement, table_versions
+from core import call_text
 from core.models import CallCreate, CallResponse, CallScoreUpdate
-from utils.audio_processor import save_audio_file
+from core.audio_store import get_audio_store
+from utils.audio_processor import UploadTooLarge
+from starlette.concurrency import run_in_threadpool
+from domains import agent_performance
 from typing import List
 import os
 
@@ -13,20 +19,33 @@ async def upload_call(
     user_id: int = Form(...),
     caller_number: str = Form(...),
     duration: float = Form(...),
-    file: UploadFile = File(...),
-    db = Depends(get_db)
+    file: UploadFile = File(...)
 ):
-    cursor = db.cursor(dictionary=True)
     try:
-        filepath = save_audio_file(file)
-        cursor.execute(
-            """INSERT INTO Calls 
-            (agent_id, user_id, caller_number, duration, audio_file) 
-            VALUES (%s, %s, %s, %s, %s)""",
-            (agent_id, user_id, caller_number, duration, filepath)
-        )
-        db.commit()
-        call_id = cursor.lastrowid
+        store = get_audio_store()
+        staged, audio_hash, size = await run_in_threadpool(store.stage_upload, file.file, file.filename)
+        placed = False
+        try:
+            async with get_async_db().transaction() as cur:
+                filepath, placed = await store.claim(cur, staged, audio_hash, size)
+                await cur.execute(
+                    """INSERT INTO Calls 
+                    (agent_id, user_id, caller_number, duration, audio_file, audio_sha256) 
+                    VALUES (%s, %s, %s, %s, %s, %s)""",
+                    (agent_id, user_id, caller_number, duration, filepath, audio_hash)
+                )
+                call_id = cur.lastrowid
+                # Bumped inside the insert's transaction so the event loop never blocks on it
+                await cur.execute(*bump_statement(("Calls",)))
+        except Exception:
+            # The object row rolled back with the call; don't leave its file behind
+            if placed:
+                await store.drop_unreferenced(get_async_db().transaction, audio_hash, filepath)
+            raise
+        finally:
+            store.discard_staged(staged)
+        # The bump committed with the insert; drop this process's copy of the versions
+        table_versions.mark_stale()
 
         return {
             "id": call_id,
@@ -35,14 +54,13 @@ async def upload_call(
             "caller_number": caller_number,
             "audio_file": filepath
         }
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
 
 
-@router.post("/{call_id}/score", response_model=CallResponse)
+@router.post("/{call_id}/score", response_model=dict)
 def score_call(
     call_id: int, 
     scores: CallScoreUpdate,
@@ -50,6 +68,9 @@ def score_call(
 ):
     cursor = db.cursor(dictionary=True)
     try:
+        before = agent_performance.fetch_scored_call(cursor, call_id)
+        if not before:
+            raise HTTPException(status_code=404, detail="Call not found")
         cursor.execute(
             """UPDATE Calls SET
             greeting_score = %s,
@@ -57,9 +78,8 @@ def score_call(
             knowledge_score = %s,
             empathy_score = %s,
             script_adherence_score = %s,
-            overall_score = %s,
-            remarks = %s
-            WHERE id = %s""",
+            overall_score = %s
+            WHERE call_id = %s""",
             (
                 scores.greeting_score,
                 scores.compliance_status,
@@ -67,12 +87,16 @@ def score_call(
                 scores.empathy_score,
                 scores.script_adherence_score,
                 scores.overall_score,
-                scores.remarks,
                 call_id
             )
         )
+        call_text.save(cursor, "remarks", [(call_id, scores.remarks)])
+        agent_performance.record_score_change(cursor, before, dict(before, **scores.dict()))
         db.commit()
+        table_versions.bump("Calls", "Agent_Performance", "Agent_Performance_Daily")
         return {"message": "Call scored successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
@@ -3,9 +3,11 @@
 from fastapi import APIRouter, HTTPException, Depends
 from core.database import get_db
 from core.models import KnowledgeUpload, KnowledgeOut
+from core.knowledge_index import get_knowledge_index
+from core import knowledge_store
+from core.response_cache import table_versions
 from typing import List
 import mysql.connector
-import json
 
 router = APIRouter(prefix="/knowledge", tags=["knowledge"])
 
@@ -14,10 +16,12 @@ def upload_knowledge_entry(data: KnowledgeUpload, db=Depends(get_db)):
     cursor = db.cursor(dictionary=True)
     try:
         cursor.execute(
-            "INSERT INTO Knowledge_Graph (user_id, json_data) VALUES (%s, %s)",
-            (data.user_id, json.dumps(data.json_data))
+            "INSERT INTO Knowledge_Graph (user_id, json_compressed) VALUES (%s, %s)",
+            (data.user_id, knowledge_store.encode(data.json_data))
         )
         db.commit()
+        table_versions.bump("Knowledge_Graph")
+        get_knowledge_index().upsert(cursor.lastrowid, data.user_id, data.json_data)
         return {"message": "Knowledge graph entry uploaded successfully"}
     except mysql.connector.Error as e:
         db.rollback()
@@ -30,7 +34,7 @@ def get_all_knowledge_entries(db=Depends(get_db)):
     cursor = db.cursor(dictionary=True)
     try:
         cursor.execute("SELECT * FROM Knowledge_Graph")
-        return cursor.fetchall()
+        return [knowledge_store.decode_row(row) for row in cursor.fetchall()]
     except mysql.connector.Error as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -44,7 +48,7 @@ def get_knowledge_entry(knowledge_graph_id: int, db=Depends(get_db)):
         result = cursor.fetchone()
         if not result:
             raise HTTPException(status_code=404, detail="Knowledge entry not found")
-        return result
+        return knowledge_store.decode_row(result)
     except mysql.connector.Error as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -62,10 +66,12 @@ def update_knowledge_entry(knowledge_graph_id: int, data: KnowledgeUpload, db=De
 
         cursor.execute("""
             UPDATE Knowledge_Graph
-            SET user_id = %s, json_data = %s
+            SET user_id = %s, json_data = NULL, json_compressed = %s
             WHERE knowledge_graph_id = %s
-        """, (data.user_id, json.dumps(data.json_data), knowledge_graph_id))
+        """, (data.user_id, knowledge_store.encode(data.json_data), knowledge_graph_id))
         db.commit()
+        table_versions.bump("Knowledge_Graph")
+        get_knowledge_index().upsert(knowledge_graph_id, data.user_id, data.json_data)
 
         return {"message": "Knowledge graph entry updated successfully"}
     except mysql.connector.Error as e:
@@ -80,8 +86,10 @@ def delete_knowledge_entry(knowledge_graph_id: int, db=Depends(get_db)):
     try:
         cursor.execute("DELETE FROM Knowledge_Graph WHERE knowledge_graph_id = %s", (knowledge_graph_id,))
         db.commit()
+        table_versions.bump("Knowledge_Graph")
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Knowledge entry not found")
+        get_knowledge_index().remove(knowledge_graph_id)
         return {"message": "Knowledge entry deleted successfully"}
     except mysql.connector.Error as e:
         db.rollback()
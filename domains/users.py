@@ -2,6 +2,7 @@
 
 from fastapi import APIRouter, HTTPException, Depends
 from core.database import get_db
+from core.response_cache import table_versions
 from core.models import UserCreate, UserLogin, UserOut
 from typing import List
 import mysql.connector
@@ -12,21 +13,21 @@ router = APIRouter(prefix="/users", tags=["users"])
 def register_user(user: UserCreate, db=Depends(get_db)):
     cursor = db.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM Users WHERE email = %s", (user.email,))
+        cursor.execute("SELECT user_id FROM User WHERE email = %s", (user.email,))
         if cursor.fetchone():
             raise HTTPException(status_code=400, detail="Email already registered")
         
         cursor.execute(
-            "INSERT INTO Users (name, email, password, role) VALUES (%s, %s, %s, %s)",
-            (user.name, user.email, user.password, user.role)
+            "INSERT INTO User (username, email, password) VALUES (%s, %s, %s)",
+            (user.name, user.email, user.password)
         )
         db.commit()
+        table_versions.bump("User")
         user_id = cursor.lastrowid
         return {
             "id": user_id,
             "name": user.name,
-            "email": user.email,
-            "role": user.role
+            "email": user.email
         }
     except mysql.connector.Error as e:
         db.rollback()
@@ -39,7 +40,7 @@ def login_user(user: UserLogin, db=Depends(get_db)):
     cursor = db.cursor(dictionary=True)
     try:
         cursor.execute(
-            "SELECT * FROM Users WHERE email = %s AND password = %s",
+            "SELECT user_id AS id, username AS name, email FROM User WHERE email = %s AND password = %s",
             (user.email, user.password)
         )
         result = cursor.fetchone()
@@ -55,7 +56,7 @@ def login_user(user: UserLogin, db=Depends(get_db)):
 def get_all_users(db=Depends(get_db)):
     cursor = db.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT id, name, email, role FROM Users")
+        cursor.execute("SELECT user_id AS id, username AS name, email FROM User")
         return cursor.fetchall()
     except mysql.connector.Error as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,24 +1,41 @@
 import os
-import json
-from runwisper import transcribe_audio_local
-import mysql.connector
-from fastapi.responses import JSONResponse
+import threading
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from datetime import datetime
 from mysql.connector import Error as MySQLError
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Header, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from typing import Optional
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
+from typing import Optional, List
+from core.config import settings
+from core.database import get_connection, get_pool, PoolTimeout, connect_unpooled
+from core import export
+from core.async_database import get_async_db
+from core import metrics
+from core.response_cache import bump_statement, get_response_cache, table_versions
+from core.jobs import TranscriptionJobQueue
+from core.transcript_stream import TranscriptStreamer
+from core.knowledge_index import get_knowledge_index
+from core.transcript_search import get_transcript_search, InvalidSearchQuery
+from core.summarizer import SummaryPipeline
+from core import knowledge_store
+from core import call_text
+from core import migrations
+from core.audio_store import get_audio_store
+from utils.json_patch import apply_patch, resolve as resolve_pointer, JsonPointerError, JsonPatchTestFailed
+from domains import agent_performance
+from core import auto_scoring
+from core.pagination import DEFAULT_LIMIT, select_columns, keyset_page, set_page_headers, page_headers, call_filters
+from runwisper import allowed_models
+from starlette.concurrency import run_in_threadpool
+from utils.audio_processor import UploadTooLarge, schedule_preprocessing
 
 # ========== CONFIGURATION ==========
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_USER = os.getenv("DB_USER", "root")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "SunshineCascade89")
-DB_NAME = os.getenv("DB_NAME", "call_audit_db")
-DB_PORT = int(os.getenv("DB_PORT", 3306))
-UPLOAD_DIR = os.path.join(os.getcwd(), "calls")
+UPLOAD_DIR = settings.UPLOAD_DIR
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Recordings live in a content-addressed tree under UPLOAD_DIR/objects
+audio_store = get_audio_store()
 
 # ========== FASTAPI SETUP ==========
 app = FastAPI(
@@ -33,21 +50,161 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+app.include_router(agent_performance.router)
 
 # ========== DATABASE FUNCTIONS ==========
 def get_db_connection():
+    # Borrowed from the shared pool; conn.close() returns it. A saturated pool or
+    # an unreachable server is a 503 the client can retry, never a None to trip on.
     try:
-        conn = mysql.connector.connect(
-            host=DB_HOST, user=DB_USER, 
-            password=DB_PASSWORD, database=DB_NAME, 
-            port=DB_PORT
-        )
-        if conn.is_connected():
-            return conn
+        return get_connection()
+    except PoolTimeout as e:
+        metrics.DB_CONNECTION_ERRORS.inc(reason="pool_timeout")
+        print(f"MySQL error: {e}")
+        raise HTTPException(status_code=503, detail="Database is busy, retry shortly",
+                            headers={"Retry-After": "1"})
     except MySQLError as e:
+        metrics.DB_CONNECTION_ERRORS.inc(reason="connect")
         print(f"MySQL error: {e}")
-    return None
+        raise HTTPException(status_code=503, detail="Database unavailable", headers={"Retry-After": "5"})
+
+@app.on_event("startup")
+def apply_migrations():
+    # Runs before the search index and job queue startup hooks read the schema
+    try:
+        conn = get_connection()
+    except (PoolTimeout, MySQLError) as e:
+        print(f"Skipping migrations, no database connection: {e}")
+        return
+    try:
+        migrations.migrate(conn)
+    finally:
+        conn.close()
+
+# Async routes use their own aiomysql pool and never touch the sync pool on the
+# event loop; plain `def` routes run in the threadpool sized here.
+async_db = get_async_db()
+
+@app.on_event("startup")
+async def start_async_db():
+    import anyio.to_thread
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_WORKERS
+    await async_db.start()
+
+@app.get("/db/pool")
+def get_db_pool_stats():
+    return dict(get_pool().stats(), async_pool=async_db.stats())
+
+# ========== SEARCH INDEX ==========
+transcript_search = get_transcript_search()
+
+def index_calls(call_ids):
+    # The index is derived from Calls; a failure here must never fail the write
+    try:
+        transcript_search.refresh(call_ids)
+    except Exception as e:
+        print(f"Search index update failed for calls {call_ids}: {e}")
+
+def rebuild_search_index():
+    try:
+        indexed = transcript_search.rebuild()
+        print(f"Search index rebuilt with {indexed} calls")
+    except Exception as e:
+        print(f"Search index rebuild failed: {e}")
+
+@app.on_event("startup")
+def populate_search_index():
+    if transcript_search.count() == 0:
+        threading.Thread(target=rebuild_search_index, name="search-index-rebuild", daemon=True).start()
+
+# ========== TRANSCRIPTION JOBS ==========
+def summaries_saved(call_ids):
+    table_versions.bump("Calls")
+    index_calls(call_ids)
+
+# Extractive summaries are written after transcription, off the request path
+summaries = SummaryPipeline(connect=get_connection, on_saved=summaries_saved)
+
+def transcripts_saved(call_ids):
+    table_versions.bump("Calls")
+    index_calls(call_ids)
+    if settings.SUMMARY_ENABLED:
+        summaries.enqueue(call_ids)
+
+transcription_jobs = TranscriptionJobQueue(connect=get_connection, on_saved=transcripts_saved)
+
+@app.on_event("startup")
+def start_transcription_workers():
+    transcription_jobs.start()
+    if settings.SUMMARY_ENABLED:
+        summaries.start()
+
+@app.on_event("shutdown")
+def stop_transcription_workers():
+    transcription_jobs.stop()
+    summaries.stop()
+
+def save_transcription(call_id, text):
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        call_text.save(cur, "transcription_text", [(call_id, text)])
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    transcripts_saved([call_id])
+
+transcript_streams = TranscriptStreamer(on_complete=save_transcription, executor=transcription_jobs.pool)
+
+@app.on_event("shutdown")
+async def close_db_pools():
+    await async_db.close()
+    get_pool().close_all()
+
+# ========== METRICS ==========
+def pool_gauges():
+    stats = get_pool().stats()
+    return {(state,): stats[state] for state in ("open", "in_use", "idle", "waiting")}
+
+metrics.CallbackMetric("db_pool_connections", "MySQL pool connections by state.", pool_gauges, ("state",))
+metrics.CallbackMetric(
+    "db_pool_timeouts_total", "Pool acquisitions that timed out.",
+    lambda: get_pool().stats()["timeouts"], kind="counter")
+metrics.CallbackMetric(
+    "transcription_units_inflight", "Transcription units currently on the worker pool.",
+    transcription_jobs.inflight)
+metrics.CallbackMetric(
+    "transcription_jobs", "Transcription jobs waiting or running.",
+    transcription_jobs.pending_counts, ("status",))
+metrics.CallbackMetric(
+    "summary_calls_pending", "Calls queued for an extractive summary.",
+    lambda: summaries.stats()["pending"])
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+# ========== RESPONSE CACHE ==========
+# GET /agents, /knowledge and /calls/scores/all are served through this cache;
+# every write handler bumps the versions of the tables it changed.
+response_cache = get_response_cache()
+
+@app.get("/cache/responses")
+def get_response_cache_stats():
+    return response_cache.stats()
+
+# ========== SUMMARIES ==========
+@app.get("/summaries/stats")
+def get_summary_stats():
+    return dict(summaries.stats(), enabled=settings.SUMMARY_ENABLED)
 
 # ========== MODELS ==========
 class UserCreate(BaseModel):
@@ -77,13 +234,28 @@ class CallCreate(BaseModel):
 
 class CallScoreUpdate(BaseModel):
     greeting_score: float
-    compliance_score: float
+    compliance_status: str
     knowledge_score: float
     empathy_score: float
     script_adherence_score: float
     overall_score: float
     remarks: Optional[str] = None
 
+class BatchTranscriptionRequest(BaseModel):
+    call_ids: Optional[List[int]] = None
+    agent_id: Optional[int] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    model: Optional[str] = None
+    skip_transcribed: bool = True
+
+class AutoScoreRequest(BaseModel):
+    call_ids: Optional[List[int]] = None
+    agent_id: Optional[int] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    only_unscored: bool = True
+
 class KnowledgeUpload(BaseModel):
     user_id: int
     json_data: dict
@@ -93,6 +265,16 @@ class KnowledgeUpload(BaseModel):
 def health_check():
     return {"message": "FASTAPI is running successfully."}
 
+@app.get("/ready")
+def readiness_check():
+    # Only report ready once the transcription workers have their model loaded
+    if not transcription_jobs.is_ready():
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"ready": False, "message": "Transcription workers are warming up."}
+        )
+    return {"ready": True}
+
 # ========== USER ENDPOINTS ==========
 @app.post("/users/create")
 def create_user(user: UserCreate):
@@ -104,6 +286,7 @@ def create_user(user: UserCreate):
             (user.username, user.email, user.password)
         )
         conn.commit()
+        table_versions.bump("User")
         return {"message": "User created successfully"}
     except MySQLError as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -112,12 +295,19 @@ def create_user(user: UserCreate):
         conn.close()
 
 @app.get("/users")
-def get_users():
+def get_users(
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: int = DEFAULT_LIMIT,
+    fields: Optional[str] = None
+):
+    columns = select_columns("User", fields)
     conn = get_db_connection()
     cur = conn.cursor(dictionary=True)
     try:
-        cur.execute("SELECT * FROM user")
-        return cur.fetchall()
+        rows, next_cursor = keyset_page(cur, "User", columns, cursor=cursor, limit=limit)
+        set_page_headers(response, next_cursor)
+        return rows
     except MySQLError as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -135,6 +325,7 @@ def update_user(user_id: int, updated_user: UserCreate):
             WHERE user_id = %s
         """, (updated_user.username, updated_user.email, updated_user.password, user_id))
         conn.commit()
+        table_versions.bump("User")
         if cur.rowcount == 0:
             raise HTTPException(status_code=404, detail="User not found")
         return {"message": "User updated successfully"}
@@ -151,6 +342,7 @@ def delete_user(user_id: int):
     try:
         cur.execute("DELETE FROM User WHERE user_id = %s", (user_id,))
         conn.commit()
+        table_versions.bump("User")
         if cur.rowcount == 0:
             raise HTTPException(status_code=404, detail="User not found")
         return {"message": "User deleted successfully"}
@@ -171,6 +363,7 @@ def create_agent(agent: AgentCreate):
             (agent.agent_name, agent.email, agent.agent_code)
         )
         conn.commit()
+        table_versions.bump("Agent")
         return {"message": "Agent created successfully"}
     except MySQLError as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -179,17 +372,27 @@ def create_agent(agent: AgentCreate):
         conn.close()
 
 @app.get("/agents")
-def get_agents():
-    conn = get_db_connection()
-    cur = conn.cursor(dictionary=True)
-    try:
-        cur.execute("SELECT * FROM Agent")
-        return cur.fetchall()
-    except MySQLError as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+def get_agents(
+    request: Request,
+    cursor: Optional[int] = None,
+    limit: int = DEFAULT_LIMIT,
+    fields: Optional[str] = None
+):
+    columns = select_columns("Agent", fields)
+
+    def produce():
+        conn = get_db_connection()
+        cur = conn.cursor(dictionary=True)
+        try:
+            rows, next_cursor = keyset_page(cur, "Agent", columns, cursor=cursor, limit=limit)
+            return rows, page_headers(next_cursor)
+        except MySQLError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            cur.close()
+            conn.close()
+
+    return response_cache.serve(request, ("Agent",), produce)
 
 @app.get("/agents/{agent_id}")
 def get_agent_by_id(agent_id: int):
@@ -216,6 +419,7 @@ def update_agent(agent_id: int, updated_agent: AgentCreate):
             WHERE agent_id = %s
         """, (updated_agent.agent_name, updated_agent.email, updated_agent.agent_code, agent_id))
         conn.commit()
+        table_versions.bump("Agent")
         if cur.rowcount == 0:
             raise HTTPException(status_code=404, detail="Agent not found")
         return {"message": "Agent updated successfully"}
@@ -232,9 +436,11 @@ def delete_agent(agent_id: int):
     try:
         # First delete dependent records
         cur.execute("DELETE FROM Agent_Performance WHERE agent_id = %s", (agent_id,))
+        cur.execute("DELETE FROM Agent_Performance_Daily WHERE agent_id = %s", (agent_id,))
         # Then delete the agent
         cur.execute("DELETE FROM Agent WHERE agent_id = %s", (agent_id,))
         conn.commit()
+        table_versions.bump("Agent", "Agent_Performance", "Agent_Performance_Daily")
         if cur.rowcount == 0:
             raise HTTPException(status_code=404, detail="Agent not found")
         return {"message": "Agent deleted successfully"}
@@ -248,6 +454,7 @@ def delete_agent(agent_id: int):
 # ========== CALL ENDPOINTS ==========
 @app.post("/calls/upload-audio")
 async def upload_call(
+    background_tasks: BackgroundTasks,
     agent_id: int = Form(...),
     user_id: int = Form(...),
     caller_number: str = Form(...),
@@ -255,88 +462,302 @@ async def upload_call(
     file: UploadFile = File(...)
 ):
     try:
-        # Save audio file
-        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        filename = f"call_{timestamp}_{file.filename}"
-        filepath = os.path.join(UPLOAD_DIR, filename)
-        
-        with open(filepath, "wb") as f:
-            f.write(await file.read())
+        # Stream audio to the store's staging area off the event loop, hashing on the way
+        staged, audio_hash, size = await run_in_threadpool(audio_store.stage_upload, file.file, file.filename)
 
-        # Insert basic call data
-        conn = get_db_connection()
-        cur = conn.cursor()
+        # Insert basic call data without blocking the event loop
         query = """
         INSERT INTO Calls (
             agent_id, user_id, caller_number, call_date, 
-            duration, audio_file, upload_date
-        ) VALUES (%s, %s, %s, NOW(), %s, %s, NOW())
+            duration, audio_file, audio_sha256, upload_date
+        ) VALUES (%s, %s, %s, NOW(), %s, %s, %s, NOW())
         """
-        cur.execute(query, (agent_id, user_id, caller_number, duration, filepath))
-        conn.commit()
-        call_id = cur.lastrowid
-        cur.close()
-        conn.close()
+        placed = False
+        try:
+            async with async_db.transaction() as cur:
+                filepath, placed = await audio_store.claim(cur, staged, audio_hash, size)
+                await cur.execute(query, (agent_id, user_id, caller_number, duration, filepath, audio_hash))
+                call_id = cur.lastrowid
+                # Bumped inside the insert's transaction so the event loop never blocks on it
+                await cur.execute(*bump_statement(("Calls",)))
+        except Exception:
+            # The object row rolled back with the call; don't leave its file behind
+            if placed:
+                await audio_store.drop_unreferenced(async_db.transaction, audio_hash, filepath)
+            raise
+        finally:
+            audio_store.discard_staged(staged)
+        # The bump committed with the insert; drop this process's copy of the versions
+        table_versions.mark_stale()
+
+        # Decode + silence trimming runs after the response is sent
+        schedule_preprocessing(background_tasks, filepath)
 
         return {
             "message": "Call uploaded successfully",
             "call_id": call_id,
-            "audio_path": filepath
+            "audio_path": filepath,
+            "audio_sha256": audio_hash,
+            "size_bytes": size
         }
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
-@app.post("/calls/get-transcription")
-def get_transcription(call_id: int):
-    try:
-        conn = get_db_connection()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Database connection failed.")
-        cur = conn.cursor()
+@app.post("/calls/get-transcription", status_code=status.HTTP_202_ACCEPTED)
+def get_transcription(call_id: int, model: Optional[str] = None):
+    if model and model not in allowed_models():
+        raise HTTPException(status_code=400, detail=f"Unsupported model. Choose one of: {', '.join(allowed_models())}")
 
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
         # Fetch audio file path
         cur.execute("SELECT audio_file FROM Calls WHERE call_id = %s", (call_id,))
         result = cur.fetchone()
         if not result:
             raise HTTPException(status_code=404, detail="Call not found.")
-
-        audio_path = result[0]
-        if not os.path.exists(audio_path):
+        if not os.path.exists(result[0]):
             raise HTTPException(status_code=404, detail="Audio file not found.")
+    finally:
+        cur.close()
+        conn.close()
+
+    # Whisper runs in the worker pool; the client polls the job status
+    try:
+        job_id = transcription_jobs.enqueue(call_id, model_name=model)
+    except MySQLError as e:
+        raise HTTPException(status_code=500, detail=f"Could not queue transcription: {str(e)}")
 
-        # Transcribe using Whisper
-        transcription = transcribe_audio_local(audio_path)
+    return {
+        "message": "Transcription queued.",
+        "call_id": call_id,
+        "job_id": job_id,
+        "status": "queued"
+    }
 
-        # Update transcription_text in DB
+@app.post("/calls/batch-transcription", status_code=status.HTTP_202_ACCEPTED)
+def batch_transcription(request: BatchTranscriptionRequest):
+    if request.model and request.model not in allowed_models():
+        raise HTTPException(status_code=400, detail=f"Unsupported model. Choose one of: {', '.join(allowed_models())}")
+    if not request.call_ids and request.agent_id is None and request.date_from is None and request.date_to is None:
+        raise HTTPException(status_code=400, detail="Provide call_ids or an agent/date filter.")
+
+    filters = call_filters(request.agent_id, None, request.date_from, request.date_to)
+    clauses = [fragment for fragment, _ in filters]
+    params = [value for _, value in filters]
+    if request.call_ids:
+        clauses.append(f"call_id IN ({', '.join(['%s'] * len(request.call_ids))})")
+        params.extend(request.call_ids)
+    if request.skip_transcribed:
+        clauses.append("call_id NOT IN (SELECT call_id FROM Call_Text WHERE transcription_text IS NOT NULL)")
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        # Resolve every audio path in one query
         cur.execute(
-            "UPDATE Calls SET transcription_text = %s WHERE call_id = %s",
-            (transcription, call_id)
+            f"SELECT call_id, audio_file FROM Calls WHERE {' AND '.join(clauses)} ORDER BY call_id",
+            tuple(params)
         )
-        conn.commit()
+        rows = cur.fetchall()
+    except MySQLError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
         cur.close()
         conn.close()
 
-        return {
-            "message": "Transcription generated successfully.",
-            "call_id": call_id,
-            "transcription": transcription
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+    call_ids = []
+    missing = []
+    for call_id, audio_path in rows:
+        if audio_path and os.path.exists(audio_path):
+            call_ids.append(call_id)
+        else:
+            missing.append(call_id)
+    if not call_ids:
+        raise HTTPException(status_code=404, detail="No calls with audio matched the request.")
+
+    try:
+        batch_id = transcription_jobs.enqueue_batch(call_ids, model_name=request.model)
+    except MySQLError as e:
+        raise HTTPException(status_code=500, detail=f"Could not queue transcription: {str(e)}")
+
+    return {
+        "message": "Batch transcription queued.",
+        "batch_id": batch_id,
+        "queued": len(call_ids),
+        "missing_audio": missing
+    }
+
+@app.get("/calls/batch-transcription/{batch_id}")
+def get_batch_transcription(batch_id: str):
+    try:
+        counts = transcription_jobs.batch_status(batch_id)
+    except MySQLError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not counts:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {"batch_id": batch_id, "jobs": counts, "total": sum(counts.values())}
+
+@app.get("/calls/{call_id}/transcription/stream")
+def stream_transcription(
+    call_id: int,
+    model: Optional[str] = None,
+    from_segment: Optional[int] = None,
+    last_event_id: Optional[str] = Header(None)
+):
+    if model and model not in allowed_models():
+        raise HTTPException(status_code=400, detail=f"Unsupported model. Choose one of: {', '.join(allowed_models())}")
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT audio_file, audio_sha256 FROM Calls WHERE call_id = %s", (call_id,))
+        result = cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+    if not result:
+        raise HTTPException(status_code=404, detail="Call not found.")
+    if not os.path.exists(result[0]):
+        raise HTTPException(status_code=404, detail="Audio file not found.")
+
+    # Resume after the last segment the client saw (EventSource sends Last-Event-ID)
+    start = from_segment or 0
+    if from_segment is None and last_event_id and last_event_id.isdigit():
+        start = int(last_event_id) + 1
+
+    session = transcript_streams.open(call_id, result[0], model, audio_hash=result[1])
+    return StreamingResponse(
+        session.follow(start),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/calls/transcription-jobs/{job_id}")
+def get_transcription_job(job_id: int):
+    try:
+        job = transcription_jobs.get(job_id)
+    except MySQLError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/calls/transcription-jobs/{job_id}/retry")
+def retry_transcription_job(job_id: int):
+    try:
+        requeued = transcription_jobs.retry(job_id)
+    except MySQLError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not requeued:
+        raise HTTPException(status_code=409, detail="Only failed jobs can be retried")
+    return {"message": "Transcription job re-queued", "job_id": job_id}
 
 @app.get("/calls")
-def get_all_calls():
+def get_all_calls(
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: int = DEFAULT_LIMIT,
+    fields: Optional[str] = None,
+    agent_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+):
+    columns = select_columns("Calls", fields)
+    filters = call_filters(agent_id, user_id, date_from, date_to)
     conn = get_db_connection()
     cur = conn.cursor(dictionary=True)
     try:
-        cur.execute("SELECT * FROM Calls")
-        return cur.fetchall()
+        # Page over the narrow Calls rows; requested text is fetched for that page only
+        rows, next_cursor = keyset_page(cur, "Calls", call_text.split_columns(columns)[0], filters, cursor, limit)
+        set_page_headers(response, next_cursor)
+        return call_text.attach(cur, rows, columns)
     except MySQLError as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cur.close()
         conn.close()
 
+@app.get("/calls/search")
+def search_calls(
+    q: str,
+    agent_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0
+):
+    limit = max(1, min(limit, settings.SEARCH_MAX_LIMIT))
+    try:
+        results = transcript_search.search(
+            q, agent_id=agent_id, user_id=user_id, date_from=date_from, date_to=date_to,
+            fields=fields, limit=limit, offset=max(offset, 0)
+        )
+    except InvalidSearchQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"query": q, "results": results}
+
+@app.post("/calls/search/rebuild", status_code=status.HTTP_202_ACCEPTED)
+def rebuild_call_search(background_tasks: BackgroundTasks):
+    background_tasks.add_task(rebuild_search_index)
+    return {"message": "Search index rebuild started"}
+
+def export_response(fmt, columns, clauses, params, filename):
+    try:
+        export.check_format(fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except export.ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    source = call_text.CALLS_WITH_TEXT if call_text.split_columns(columns)[1] else "Calls"
+    query = f"SELECT {', '.join(columns)} FROM {source}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY call_id"
+    try:
+        # Own connection: the export can outlive any pool timeout
+        batches = export.fetch_batches(connect_unpooled(), query, params)
+    except MySQLError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        export.export_chunks(fmt, columns, batches),
+        media_type=export.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    )
+
+@app.get("/calls/export")
+def export_calls(
+    format: str = "ndjson",
+    fields: Optional[str] = None,
+    agent_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    scored_only: bool = False
+):
+    columns = select_columns("Calls", fields)
+    filters = call_filters(agent_id, user_id, date_from, date_to)
+    clauses = [fragment for fragment, _ in filters]
+    if scored_only:
+        clauses.append("overall_score IS NOT NULL")
+    return export_response(format, columns, clauses, [value for _, value in filters], "calls")
+
+@app.get("/calls/scores/export")
+def export_call_scores(
+    format: str = "ndjson",
+    agent_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+):
+    filters = call_filters(agent_id, None, date_from, date_to)
+    clauses = [fragment for fragment, _ in filters] + ["overall_score IS NOT NULL"]
+    return export_response(format, export.SCORE_COLUMNS, clauses, [value for _, value in filters], "call_scores")
+
 @app.get("/calls/{call_id}")
 def get_call_by_id(call_id: int):
     conn = get_db_connection()
@@ -346,46 +767,47 @@ def get_call_by_id(call_id: int):
         call = cur.fetchone()
         if not call:
             raise HTTPException(status_code=404, detail="Call not found")
-        return call
+        # Generated index column, not part of the call
+        call.pop(agent_performance.SCORED_FLAG_COLUMN, None)
+        return call_text.attach(cur, [call], call_text.TEXT_COLUMNS)[0]
     finally:
         cur.close()
         conn.close()
 
 @app.get("/calls/by-user/{user_id}")
-def get_calls_by_user(user_id: int):
+def get_calls_by_user(
+    user_id: int,
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: int = DEFAULT_LIMIT,
+    fields: Optional[str] = None,
+    agent_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+):
+    columns = select_columns("Calls", fields)
+    filters = call_filters(agent_id, user_id, date_from, date_to)
     conn = get_db_connection()
     cur = conn.cursor(dictionary=True)
     try:
-        cur.execute("SELECT * FROM Calls WHERE user_id = %s", (user_id,))
-        return cur.fetchall()
+        # Page over the narrow Calls rows; requested text is fetched for that page only
+        rows, next_cursor = keyset_page(cur, "Calls", call_text.split_columns(columns)[0], filters, cursor, limit)
+        set_page_headers(response, next_cursor)
+        return call_text.attach(cur, rows, columns)
     finally:
         cur.close()
         conn.close()
 @app.get("/calls/scores/all")  # Changed endpoint path to avoid conflict
-def get_all_call_scores():
+def get_all_call_scores(request: Request):
+    return response_cache.serve(request, ("Calls",), lambda: (fetch_all_call_scores(), None))
+
+def fetch_all_call_scores():
     conn = None
     cur = None
     try:
         conn = get_db_connection()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Database connection failed")
-            
         cur = conn.cursor(dictionary=True)
-        cur.execute("""
-            SELECT 
-                call_id, 
-                agent_id, 
-                greeting_score, 
-                compliance_status, 
-                knowledge_score, 
-                empathy_score, 
-                script_adherence_score, 
-                overall_score, 
-                remarks
-            FROM calls
-            WHERE overall_score IS NOT NULL
-            ORDER BY call_id DESC
-        """)
+        cur.execute(agent_performance.ALL_SCORES_QUERY)
         results = cur.fetchall()
         
         # Convert numeric fields to proper types
@@ -400,6 +822,8 @@ def get_all_call_scores():
         
         return results
         
+    except HTTPException:
+        raise
     except MySQLError as e:
         raise HTTPException(
             status_code=500, 
@@ -419,31 +843,109 @@ def get_all_call_scores():
 def delete_call(call_id: int):
     conn = get_db_connection()
     cur = conn.cursor()
+    released = []
     try:
+        before = agent_performance.fetch_scored_call(cur, call_id)
+        if not before:
+            raise HTTPException(status_code=404, detail="Call not found")
+        cur.execute("SELECT audio_sha256, audio_file FROM Calls WHERE call_id = %s", (call_id,))
+        audio_sha256, audio_file = cur.fetchone()
         cur.execute("DELETE FROM Calls WHERE call_id = %s", (call_id,))
+        call_text.delete(cur, call_id)
+        # Take the call's scores back out of the agent rollups
+        agent_performance.record_score_change(cur, before, None)
+        # Drop the call's reference to its recording; the file goes with the last one
+        released = audio_store.release(cur, audio_sha256, audio_file)
         conn.commit()
-        if cur.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Call not found")
+        audio_store.purge(released)
+        table_versions.bump("Calls", "Agent_Performance", "Agent_Performance_Daily")
+        index_calls([call_id])
         return {"message": "Call deleted successfully"}
-    except MySQLError as e:
+    except (MySQLError, OSError) as e:
+        conn.rollback()
+        audio_store.restore(released)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cur.close()
         conn.close()
 
 # ========== SCORING ENDPOINTS ==========
+@app.put("/calls/{call_id}/score")
+def score_call(call_id: int, scores: CallScoreUpdate, background_tasks: BackgroundTasks):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        before = agent_performance.fetch_scored_call(cur, call_id)
+        if not before:
+            raise HTTPException(status_code=404, detail="Call not found")
+        cur.execute("""
+            UPDATE Calls SET
+                greeting_score = %s, compliance_status = %s, knowledge_score = %s,
+                empathy_score = %s, script_adherence_score = %s, overall_score = %s
+            WHERE call_id = %s
+        """, (scores.greeting_score, scores.compliance_status, scores.knowledge_score,
+              scores.empathy_score, scores.script_adherence_score, scores.overall_score,
+              call_id))
+        call_text.save(cur, "remarks", [(call_id, scores.remarks)])
+        after = dict(before, **scores.dict())
+        agent_performance.record_score_change(cur, before, after)
+        conn.commit()
+        table_versions.bump("Calls", "Agent_Performance", "Agent_Performance_Daily")
+        # Remarks are searchable
+        background_tasks.add_task(index_calls, [call_id])
+        return {"message": "Call scored successfully"}
+    except MySQLError as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cur.close()
+        conn.close()
+
+def run_auto_scoring(request: AutoScoreRequest):
+    try:
+        conn = get_connection()
+    except (PoolTimeout, MySQLError) as e:
+        print(f"Auto-scoring skipped, no database connection: {e}")
+        return
+    try:
+        scored = auto_scoring.auto_score_calls(
+            conn, request.call_ids, request.agent_id, request.date_from,
+            request.date_to, request.only_unscored
+        )
+        print(f"Auto-scoring proposed scores for {scored} calls")
+    except Exception as e:
+        print(f"Auto-scoring failed: {e}")
+    finally:
+        conn.close()
+
+@app.post("/calls/auto-score", status_code=status.HTTP_202_ACCEPTED)
+def auto_score_calls(request: AutoScoreRequest, background_tasks: BackgroundTasks):
+    # Large backlogs take minutes; score after the response is sent
+    background_tasks.add_task(run_auto_scoring, request)
+    return {"message": "Auto-scoring started"}
+
+@app.get("/calls/{call_id}/score-proposal")
+def get_score_proposal(call_id: int):
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("SELECT * FROM Call_Score_Proposals WHERE call_id = %s", (call_id,))
+        proposal = cur.fetchone()
+        if not proposal:
+            raise HTTPException(status_code=404, detail="No proposed scores for this call")
+        return proposal
+    except MySQLError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cur.close()
+        conn.close()
 
 @app.get("/calls/scores/agent/{agent_id}")
 def get_scores_by_agent(agent_id: int):
     conn = get_db_connection()
     cur = conn.cursor(dictionary=True)
     try:
-        cur.execute("""
-            SELECT call_id, greeting_score, compliance_status, knowledge_score,
-                   empathy_score, script_adherence_score, overall_score, remarks
-            FROM Calls
-            WHERE agent_id = %s AND overall_score IS NOT NULL
-        """, (agent_id,))
+        cur.execute(agent_performance.AGENT_SCORES_QUERY, (agent_id,))
         return cur.fetchall()
     except MySQLError as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -452,17 +954,21 @@ def get_scores_by_agent(agent_id: int):
         conn.close()
 
 # ========== KNOWLEDGE GRAPH ENDPOINTS ==========
+knowledge_index = get_knowledge_index()
+
 @app.post("/knowledge/upload")
 def upload_knowledge_graph(data: KnowledgeUpload):
     conn = get_db_connection()
     cur = conn.cursor()
     try:
         cur.execute(
-            "INSERT INTO Knowledge_Graph (user_id, json_data) VALUES (%s, %s)",
-            (data.user_id, json.dumps(data.json_data))
+            "INSERT INTO Knowledge_Graph (user_id, json_compressed) VALUES (%s, %s)",
+            (data.user_id, knowledge_store.encode(data.json_data))
         )
         conn.commit()
-        return {"message": "Knowledge graph uploaded successfully"}
+        table_versions.bump("Knowledge_Graph")
+        knowledge_index.upsert(cur.lastrowid, data.user_id, data.json_data)
+        return {"message": "Knowledge graph uploaded successfully", "knowledge_graph_id": cur.lastrowid}
     except MySQLError as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -470,20 +976,67 @@ def upload_knowledge_graph(data: KnowledgeUpload):
         conn.close()
 
 @app.get("/knowledge")
-def get_all_knowledge_entries():
-    conn = get_db_connection()
-    cur = conn.cursor(dictionary=True)
+def get_all_knowledge_entries(
+    request: Request,
+    cursor: Optional[int] = None,
+    limit: int = DEFAULT_LIMIT,
+    fields: Optional[str] = None,
+    user_id: Optional[int] = None
+):
+    columns = select_columns("Knowledge_Graph", fields)
+    filters = [("user_id = %s", user_id)] if user_id is not None else []
+
+    def produce():
+        conn = get_db_connection()
+        cur = conn.cursor(dictionary=True)
+        try:
+            rows, next_cursor = keyset_page(
+                cur, "Knowledge_Graph", knowledge_store.storage_columns(columns), filters, cursor, limit
+            )
+            return [knowledge_store.decode_row(row) for row in rows], page_headers(next_cursor)
+        except MySQLError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            cur.close()
+            conn.close()
+
+    return response_cache.serve(request, ("Knowledge_Graph",), produce)
+
+@app.get("/knowledge/index/search")
+def search_knowledge_index(
+    keyword: Optional[str] = None,
+    label: Optional[str] = None,
+    user_id: Optional[int] = None,
+    limit: int = 100
+):
+    if not keyword and not label:
+        raise HTTPException(status_code=400, detail="Provide keyword or label")
     try:
-        cur.execute("SELECT * FROM Knowledge_Graph")
-        return cur.fetchall()
+        return knowledge_index.search(keyword=keyword, label=label, user_id=user_id, limit=limit)
     except MySQLError as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
+
+@app.get("/knowledge/index/users/{user_id}/keywords")
+def get_user_knowledge_keywords(user_id: int):
+    try:
+        return knowledge_index.user_keywords(user_id)
+    except MySQLError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/knowledge/{entry_id}/nodes/{node_id:path}/neighbors")
+def get_knowledge_node_neighbors(entry_id: int, node_id: str):
+    try:
+        graph = knowledge_index.graph(entry_id)
+    except MySQLError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not graph:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    if node_id not in graph.nodes:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return {"node": graph.nodes[node_id], "neighbors": graph.neighbors(node_id)}
 
 @app.get("/knowledge/{entry_id}")
-def get_knowledge_entry(entry_id: int):
+def get_knowledge_entry(entry_id: int, path: Optional[str] = None):
     conn = get_db_connection()
     cur = conn.cursor(dictionary=True)
     try:
@@ -494,6 +1047,14 @@ def get_knowledge_entry(entry_id: int):
         entry = cur.fetchone()
         if not entry:
             raise HTTPException(status_code=404, detail="Entry not found")
+        entry = knowledge_store.decode_row(entry)
+        if path:
+            # Only the requested subtree (JSON Pointer, e.g. /products/0/name)
+            try:
+                subtree = resolve_pointer(entry["json_data"], path)
+            except JsonPointerError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+            return {"knowledge_graph_id": entry_id, "path": path, "value": subtree}
         return entry
     finally:
         cur.close()
@@ -506,12 +1067,14 @@ def update_knowledge_entry(entry_id: int, data: KnowledgeUpload):
     try:
         cur.execute("""
             UPDATE Knowledge_Graph
-            SET user_id = %s, json_data = %s
+            SET user_id = %s, json_data = NULL, json_compressed = %s
             WHERE knowledge_graph_id = %s
-        """, (data.user_id, json.dumps(data.json_data), entry_id))
+        """, (data.user_id, knowledge_store.encode(data.json_data), entry_id))
         conn.commit()
+        table_versions.bump("Knowledge_Graph")
         if cur.rowcount == 0:
             raise HTTPException(status_code=404, detail="Entry not found")
+        knowledge_index.upsert(entry_id, data.user_id, data.json_data)
         return {"message": "Knowledge graph entry updated successfully"}
     except MySQLError as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -519,6 +1082,39 @@ def update_knowledge_entry(entry_id: int, data: KnowledgeUpload):
         cur.close()
         conn.close()
 
+@app.patch("/knowledge/{entry_id}")
+def patch_knowledge_entry(entry_id: int, operations: List[dict]):
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute(
+            "SELECT user_id, json_data, json_compressed FROM Knowledge_Graph WHERE knowledge_graph_id = %s FOR UPDATE",
+            (entry_id,)
+        )
+        entry = cur.fetchone()
+        if not entry:
+            raise HTTPException(status_code=404, detail="Entry not found")
+        try:
+            document = apply_patch(knowledge_store.decode_row(entry)["json_data"], operations)
+        except JsonPatchTestFailed as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except JsonPointerError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        cur.execute(
+            "UPDATE Knowledge_Graph SET json_data = NULL, json_compressed = %s WHERE knowledge_graph_id = %s",
+            (knowledge_store.encode(document), entry_id)
+        )
+        conn.commit()
+        table_versions.bump("Knowledge_Graph")
+        knowledge_index.upsert(entry_id, entry["user_id"], document)
+        return {"message": "Knowledge graph entry patched successfully", "operations": len(operations)}
+    except MySQLError as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cur.close()
+        conn.close()
+
 @app.delete("/knowledge/{entry_id}")
 def delete_knowledge_entry(entry_id: int):
     conn = get_db_connection()
@@ -529,8 +1125,10 @@ def delete_knowledge_entry(entry_id: int):
             (entry_id,)
         )
         conn.commit()
+        table_versions.bump("Knowledge_Graph")
         if cur.rowcount == 0:
             raise HTTPException(status_code=404, detail="Entry not found")
+        knowledge_index.remove(entry_id)
         return {"message": "Knowledge graph entry deleted successfully"}
     except MySQLError as e:
         raise HTTPException(status_code=500, detail=str(e))
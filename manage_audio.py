@@ -0,0 +1,47 @@
+"""
+Maintenance for the content-addressed audio store under UPLOAD_DIR/objects.
+
+    python manage_audio.py adopt                 # move pre-store flat uploads into the store
+    python manage_audio.py cold --days 30        # transcode old recordings to the cold codec
+
+Both are safe to re-run and to run while the API is serving.
+"""
+import argparse
+import json
+
+from core.audio_store import AudioStore, COLD_CODECS
+from core.config import settings
+from core.database import get_connection
+from core.migrations import migrate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the audio store.")
+    parser.add_argument("--upload-dir", default=settings.UPLOAD_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    adopt = commands.add_parser("adopt", help="move recordings saved before the store into it")
+    adopt.add_argument("--batch-size", type=int, default=200)
+
+    cold = commands.add_parser("cold", help="transcode recordings older than --days to a compact codec")
+    cold.add_argument("--days", type=int, default=settings.AUDIO_STORE_COLD_AFTER_DAYS)
+    cold.add_argument("--codec", choices=sorted(COLD_CODECS), default=settings.AUDIO_STORE_COLD_CODEC)
+    cold.add_argument("--limit", type=int, default=500, help="recordings per run")
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+
+    store = AudioStore(args.upload_dir)
+    if args.command == "adopt":
+        stats = store.adopt_legacy(get_connection, batch_size=args.batch_size)
+    else:
+        stats = store.transcode_cold(get_connection, older_than_days=args.days, codec=args.codec, limit=args.limit)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
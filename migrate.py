@@ -0,0 +1,52 @@
+"""
+Applies and inspects the versioned database schema (core/migrations.py).
+
+    python migrate.py                # apply every pending migration
+    python migrate.py --status       # list migrations and whether they are applied
+    python migrate.py --check        # EXPLAIN the hot queries, exit 1 on any full table scan
+                                     # (filesorts are listed but do not fail the check)
+
+The API applies pending migrations at startup as well; running this first
+keeps a slow migration out of the startup path.
+"""
+import argparse
+import sys
+
+from core.database import get_connection
+from core.migrations import migrate, status, check
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the Call Audit database schema.")
+    parser.add_argument("--target", type=int, help="apply migrations up to this version only")
+    parser.add_argument("--status", action="store_true", help="show applied and pending migrations")
+    parser.add_argument("--check", action="store_true", help="EXPLAIN the registered queries and flag full scans")
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    try:
+        if args.status:
+            for version, name, applied in status(conn):
+                print(f"{version:>4}  {'applied' if applied else 'pending':<8} {name}")
+            return 0
+
+        if args.check:
+            results = check(conn)
+            for r in results:
+                flag = "FULL SCAN" if r["full_scan"] else "FILESORT" if r["filesort"] else "ok"
+                print(f"{flag:<9} {r['query']:<36} {r['table']:<24} type={r['type']} key={r['key']} rows={r['rows']}")
+            scans = [r for r in results if r["full_scan"]]
+            if scans:
+                print(f"{len(scans)} table read(s) without a usable index", file=sys.stderr)
+                return 1
+            return 0
+
+        applied = migrate(conn, target=args.target)
+        print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,309 @@
 # transcribe.py
 
-import whisper
-
 import os
+import threading
+import time
+
+from core.config import settings
 
+# Whisper (and torch) are imported on first use so that processes which never
+# transcribe -- the API workers, CLIs, tests -- don't pay for loading a model.
+_models = {}
+_lock = threading.Lock()
 
 
-# Load Whisper model
+def allowed_models():
+    return [m.strip() for m in settings.WHISPER_ALLOWED_MODELS.split(",") if m.strip()]
 
-model = whisper.load_model("base")
 
+def get_model(name: str = None):
+    """
+    Returns the Whisper model `name` (default WHISPER_MODEL), loading it once per process.
+    """
+    name = name or settings.WHISPER_MODEL
+    model = _models.get(name)
+    if model is None:
+        with _lock:
+            model = _models.get(name)
+            if model is None:
+                import whisper
+                model = whisper.load_model(name, device=settings.WHISPER_DEVICE)
+                _models[name] = model
+    return model
+
+
+def warm_up(names=None):
+    """
+    Loads the given models (default: WHISPER_MODEL) ahead of the first request.
+    """
+    for name in names or [settings.WHISPER_MODEL]:
+        get_model(name)
+    return loaded_models()
 
 
-def transcribe_audio_local(audio_path: str) -> str:
+def loaded_models():
+    return list(_models)
+
+
+def is_loaded(name: str = None) -> bool:
+    return (name or settings.WHISPER_MODEL) in _models
+
+
+def load_audio(audio_path: str):
+    """
+    Returns (samples, meta). With AUDIO_PREPROCESS on, samples are the
+    silence-trimmed 16 kHz buffer and meta its offset map; otherwise the
+    full decode and None.
+    """
+    if settings.AUDIO_PREPROCESS:
+        from utils.audio_preprocess import load_preprocessed
+        return load_preprocessed(audio_path)
+    import whisper
+    return whisper.load_audio(audio_path), None
+
+
+def _cache_options(options: dict) -> dict:
+    # Preprocessing changes what the model hears, so it is part of the key
+    if not settings.AUDIO_PREPROCESS:
+        return options
+    vad = [settings.VAD_FRAME_MS, settings.VAD_THRESHOLD_DB, settings.VAD_MIN_SILENCE_MS, settings.VAD_PAD_MS]
+    return dict(options, vad=vad)
+
+
+def _cache_key(cache, audio_path: str, audio_hash: str, model_name: str, options: dict) -> str:
+    # Calls.audio_sha256 already names the recording; hash the file only when the caller lacks it
+    from utils.transcription_cache import hash_audio_file
+    return cache.key(audio_hash or hash_audio_file(audio_path), model_name, _cache_options(options))
+
+
+def _load_timed(audio_path: str, timings: dict = None):
+    started = time.perf_counter()
+    audio, meta = load_audio(audio_path)
+    if timings is not None:
+        timings["decode"] = time.perf_counter() - started
+        timings["audio_seconds"] = (meta["original_samples"] if meta else len(audio)) / 16000
+    return audio, meta
+
+
+def _infer(audio, meta, model_name: str, options: dict, timings: dict = None) -> dict:
+    if len(audio) == 0:
+        return {"text": "", "segments": [], "language": None}
+    started = time.perf_counter()
+    result = get_model(model_name).transcribe(audio, **options)
+    if meta:
+        from utils.audio_preprocess import remap_segments
+        remap_segments(result["segments"], meta)
+    if timings is not None:
+        timings["inference"] = time.perf_counter() - started
+    return result
+
+
+def _run_model(audio_path: str, model_name: str, options: dict, timings: dict = None) -> dict:
+    audio, meta = _load_timed(audio_path, timings)
+    return _infer(audio, meta, model_name, options, timings)
+
+
+def transcribe(audio_path: str, model_name: str = None, timings: dict = None, audio_hash: str = None,
+               **options) -> dict:
+    """
+    Runs Whisper on `audio_path`, serving repeat requests from the transcription cache.
+    When `timings` is given it receives decode/inference seconds and
+    audio_seconds for a model run (nothing on a cache hit). `audio_hash` is
+    the recording's sha256 when known, saving a read of the file for the
+    cache key. Raises on failure.
+    """
+    model_name = model_name or settings.WHISPER_MODEL
+    if not settings.TRANSCRIPTION_CACHE_ENABLED:
+        return _run_model(audio_path, model_name, options, timings)
+
+    from utils.transcription_cache import get_cache
+    cache = get_cache()
+    key = _cache_key(cache, audio_path, audio_hash, model_name, options)
+    result = cache.get(key)
+    if result is None:
+        result = _run_model(audio_path, model_name, options, timings)
+        cache.put(key, result)
+    return result
+
+
+def transcribe_or_plan(audio_path: str, model_name: str = None, timings: dict = None, audio_hash: str = None,
+                       **options):
+    """
+    transcribe() for the job workers. Audio longer than
+    TRANSCRIBE_LONG_AUDIO_SECONDS is not run here: it is left in a PCM file
+    and a plan of overlapping chunks is returned, so the dispatcher can
+    spread the chunks over the job pool it already has (a worker never
+    starts a pool of its own). Returns (result, None) or (None, plan);
+    finish_plan() turns the plan's chunk results into the result.
+    """
+    model_name = model_name or settings.WHISPER_MODEL
+    cache = key = None
+    if settings.TRANSCRIPTION_CACHE_ENABLED:
+        from utils.transcription_cache import get_cache
+        cache = get_cache()
+        key = _cache_key(cache, audio_path, audio_hash, model_name, options)
+        result = cache.get(key)
+        if result is not None:
+            return result, None
+
+    audio, meta = _load_timed(audio_path, timings)
+    if len(audio) > settings.TRANSCRIBE_LONG_AUDIO_SECONDS * 16000:
+        from utils.chunked_transcription import plan_audio, shared_pcm
+        chunks = plan_audio(audio)
+        pcm_path, cleanup = shared_pcm(audio)
+        return None, {
+            "pcm_path": pcm_path, "cleanup": cleanup, "chunks": chunks, "meta": meta,
+            "model_name": model_name, "options": options, "cache_key": key,
+        }
+    result = _infer(audio, meta, model_name, options, timings)
+    if cache:
+        cache.put(key, result)
+    return result, None
+
+
+def finish_plan(plan: dict, chunk_results: list) -> dict:
+    """Stitches the (segments, language) results of a plan's chunks, in chunk order, and caches the result."""
+    from utils.chunked_transcription import stitch
+    segments = stitch(chunk_results, plan["chunks"])
+    if plan["meta"]:
+        from utils.audio_preprocess import remap_segments
+        remap_segments(segments, plan["meta"])
+    result = {
+        "text": "".join(s["text"] for s in segments),
+        "segments": segments,
+        "language": next((language for _, language in chunk_results if language), None),
+    }
+    if plan["cache_key"] is not None:
+        from utils.transcription_cache import get_cache
+        get_cache().put(plan["cache_key"], result)
+    return result
+
+
+def discard_plan(plan: dict):
+    if plan["cleanup"]:
+        try:
+            os.remove(plan["pcm_path"])
+        except FileNotFoundError:
+            pass
+
+
+def stream_transcription(audio_path: str, model_name: str = None, executor=None, audio_hash: str = None, **options):
+    """
+    Yields segments (id, start, end, text, avg_logprob) as soon as they are
+    available. Short chunks are transcribed on `executor` (default: the
+    fallback chunk pool) and emitted in order; a cached result is replayed
+    immediately. The full result is cached once the stream completes.
+    """
+    from utils.chunked_transcription import iter_chunked
+    model_name = model_name or settings.WHISPER_MODEL
+    cache = key = None
+    if settings.TRANSCRIPTION_CACHE_ENABLED:
+        from utils.transcription_cache import get_cache
+        cache = get_cache()
+        key = _cache_key(cache, audio_path, audio_hash, model_name, options)
+        cached = cache.get(key)
+        if cached is not None:
+            for i, segment in enumerate(cached["segments"]):
+                yield dict(segment, id=i)
+            return
+
+    audio, meta = load_audio(audio_path)
+    segments = []
+    language = None
+    if len(audio):
+        for segment, language in iter_chunked(audio, model_name, options, settings.TRANSCRIBE_STREAM_CHUNK_SECONDS,
+                                              executor=executor):
+            if meta:
+                from utils.audio_preprocess import remap_segments
+                remap_segments([segment], meta)
+            segments.append(segment)
+            yield segment
+
+    if cache:
+        cache.put(key, {"text": "".join(s["text"] for s in segments), "segments": segments, "language": language})
+
+
+def _decode_windows(audio_path: str):
+    import whisper
+    audio, _ = load_audio(audio_path)
+    if len(audio) == 0:
+        return []
+    step = whisper.audio.N_SAMPLES
+    return [audio[i:i + step] for i in range(0, max(len(audio), 1), step)]
+
+
+def transcribe_batch(audio_paths, model_name: str = None, batch_size: int = None, timings: dict = None,
+                     audio_hashes=None) -> list:
+    """
+    Transcribes many files at once. Audio is decoded in parallel, cut into
+    30-second windows and the windows of all files are run through the
+    decoder in batches. Returns one text per path, in order; `timings`
+    is filled as in transcribe(); `audio_hashes`, when given, holds each
+    path's sha256 (or None) for the cache keys.
+
+    Windows are decoded independently (no conditioning on the previous
+    window), trading a little accuracy at window edges for throughput.
+    """
+    import torch
+    import whisper
+    from concurrent.futures import ThreadPoolExecutor
+
+    model_name = model_name or settings.WHISPER_MODEL
+    batch_size = batch_size or settings.WHISPER_BATCH_WINDOWS
+    texts = [None] * len(audio_paths)
+
+    cache = None
+    keys = {}
+    pending = []
+    if settings.TRANSCRIPTION_CACHE_ENABLED:
+        from utils.transcription_cache import get_cache
+        cache = get_cache()
+    for i, path in enumerate(audio_paths):
+        if cache:
+            audio_hash = audio_hashes[i] if audio_hashes else None
+            keys[i] = _cache_key(cache, path, audio_hash, model_name, {"mode": "batched"})
+            hit = cache.get(keys[i])
+            if hit is not None:
+                texts[i] = hit["text"]
+                continue
+        pending.append(i)
+    if not pending:
+        return texts
+
+    # ffmpeg runs in a subprocess, so threads decode in parallel
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(len(pending), os.cpu_count() or 1)) as pool:
+        decoded = list(pool.map(_decode_windows, [audio_paths[i] for i in pending]))
+    decoded_at = time.perf_counter()
+
+    model = get_model(model_name)
+    n_mels = model.dims.n_mels
+    windows = []
+    for i, chunks in zip(pending, decoded):
+        for chunk in chunks:
+            windows.append((i, whisper.log_mel_spectrogram(whisper.pad_or_trim(chunk), n_mels=n_mels)))
+
+    decode_options = whisper.DecodingOptions(fp16=model.device.type == "cuda", without_timestamps=True)
+    pieces = {i: [] for i in pending}
+    for start in range(0, len(windows), batch_size):
+        batch = windows[start:start + batch_size]
+        mel = torch.stack([m for _, m in batch]).to(model.device)
+        for (i, _), result in zip(batch, whisper.decode(model, mel, decode_options)):
+            pieces[i].append(result.text.strip())
+
+    if timings is not None:
+        timings["decode"] = decoded_at - started
+        timings["inference"] = time.perf_counter() - decoded_at
+        timings["audio_seconds"] = sum(len(chunk) for chunks in decoded for chunk in chunks) / 16000
+
+    for i in pending:
+        texts[i] = " ".join(p for p in pieces[i] if p)
+        if cache:
+            cache.put(keys[i], {"text": texts[i], "segments": []})
+    return texts
+
+
+def transcribe_audio_local(audio_path: str, model_name: str = None) -> str:
 
     """
 
@@ -28,7 +319,7 @@ def transcribe_audio_local(audio_path: str) -> str:
 
     try:
 
-        result = model.transcribe(audio_path)
+        result = transcribe(audio_path, model_name)
 
         return result["text"]
 
@@ -53,32 +344,3 @@ def transcribe_audio_local(audio_path: str) -> str:
 # res = transcribe_audio_local(audio_path)
 
 # print(res)
-
-# # transcribe.py
-# import whisper
-# import os
-
-# # Load Whisper model
-# model = whisper.load_model("base")
-
-# def transcribe_audio_local(audio_path: str) -> str:
-#     """
-#     Transcribes an audio file using Whisper and returns plain text.
-#     """
-#     if not os.path.exists(audio_path):
-#         return f"File not found: {audio_path}"
-
-#     try:
-#         result = model.transcribe(audio_path)
-#         return result["text"]
-#     except Exception as e:
-#         return f"Transcription failed: {str(e)}"
-
-# # Build the full path safely
-# audio_path = os.path.join(os.path.dirname(__file__), "calls", "demo.mp3")
-
-# print("Trying to transcribe:", audio_path)
-
-# # Run transcription
-# res = transcribe_audio_local(audio_path)
-# print(res)
@@ -0,0 +1,142 @@
+import json
+import os
+import subprocess
+
+import numpy as np
+
+from core.config import settings
+
+SAMPLE_RATE = 16000
+
+
+def preprocessed_paths(audio_path: str):
+    return f"{audio_path}.pcm.f32", f"{audio_path}.vad.json"
+
+
+def decode_audio(audio_path: str) -> np.ndarray:
+    """
+    Decodes any ffmpeg-readable file to 16 kHz mono float32 in [-1, 1].
+    Same ffmpeg invocation Whisper uses, without importing torch.
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", audio_path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-"
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+def detect_speech(audio: np.ndarray, frame_ms=None, threshold_db=None,
+                  min_silence_ms=None, pad_ms=None):
+    """
+    Energy-based voice activity detection.
+
+    Frames the signal, computes per-frame RMS in dBFS and marks frames louder
+    than the noise floor + threshold_db as speech. Silences shorter than
+    min_silence_ms are kept, and every speech run is padded by pad_ms.
+    Returns a list of (start_sample, end_sample) regions to keep.
+    """
+    frame_ms = frame_ms or settings.VAD_FRAME_MS
+    threshold_db = settings.VAD_THRESHOLD_DB if threshold_db is None else threshold_db
+    min_silence_ms = settings.VAD_MIN_SILENCE_MS if min_silence_ms is None else min_silence_ms
+    pad_ms = settings.VAD_PAD_MS if pad_ms is None else pad_ms
+
+    frame = SAMPLE_RATE * frame_ms // 1000
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return [(0, len(audio))] if len(audio) else []
+
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    rms_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    noise_floor = np.percentile(rms_db, 10)
+    speech = rms_db > max(noise_floor + threshold_db, -60.0)
+
+    # Pad speech runs on both sides
+    pad = int(np.ceil(pad_ms / frame_ms))
+    if pad:
+        speech = np.convolve(speech, np.ones(2 * pad + 1), mode="same") > 0
+    if not speech.any():
+        return []
+
+    # Run boundaries (in frames), then merge runs separated by short silences
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = (starts[1:] - ends[:-1]) >= int(np.ceil(min_silence_ms / frame_ms))
+    starts = np.concatenate((starts[:1], starts[1:][keep])) * frame
+    ends = np.concatenate((ends[:-1][keep], ends[-1:])) * frame
+    if ends[-1] == n_frames * frame:
+        ends[-1] = len(audio)
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def preprocess_audio(audio_path: str, force: bool = False) -> dict:
+    """
+    Decodes `audio_path` once, drops silence and stores the speech-only
+    samples as a raw float32 file next to the original, plus an offset map
+    ([trimmed_start, original_start, length] in samples) for restoring
+    timestamps. Returns the offset metadata.
+    """
+    pcm_path, meta_path = preprocessed_paths(audio_path)
+    if not force and os.path.exists(pcm_path) and os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    audio = decode_audio(audio_path)
+    regions = detect_speech(audio)
+    offsets = []
+    cursor = 0
+    for start, end in regions:
+        offsets.append([cursor, start, end - start])
+        cursor += end - start
+    speech = np.concatenate([audio[s:e] for s, e in regions]) if regions else np.zeros(0, np.float32)
+
+    tmp_pcm = pcm_path + ".tmp"
+    speech.astype(np.float32).tofile(tmp_pcm)
+    os.replace(tmp_pcm, pcm_path)
+
+    meta = {
+        "sample_rate": SAMPLE_RATE,
+        "original_samples": int(len(audio)),
+        "speech_samples": int(len(speech)),
+        "offsets": offsets,
+    }
+    tmp_meta = meta_path + ".tmp"
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, meta_path)
+    return meta
+
+
+def load_preprocessed(audio_path: str):
+    """
+    Returns (audio, meta) where audio is a copy-on-write memmap of the
+    speech-only samples. Preprocesses on first use.
+    """
+    meta = preprocess_audio(audio_path)
+    pcm_path, _ = preprocessed_paths(audio_path)
+    if meta["speech_samples"] == 0:
+        return np.zeros(0, np.float32), meta
+    return np.memmap(pcm_path, dtype=np.float32, mode="c"), meta
+
+
+def to_original_time(seconds: float, meta: dict) -> float:
+    """Maps a time in the trimmed audio back onto the original recording."""
+    sample = seconds * meta["sample_rate"]
+    offsets = meta["offsets"]
+    if not offsets:
+        return seconds
+    starts = [o[0] for o in offsets]
+    i = max(int(np.searchsorted(starts, sample, side="right")) - 1, 0)
+    trimmed_start, original_start, length = offsets[i]
+    return (original_start + min(sample - trimmed_start, length)) / meta["sample_rate"]
+
+
+def remap_segments(segments, meta: dict):
+    for segment in segments:
+        segment["start"] = to_original_time(segment["start"], meta)
+        segment["end"] = to_original_time(segment["end"], meta)
+    return segments
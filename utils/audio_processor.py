@@ -1,21 +1,74 @@
-import datetime
+import hashlib
+import os
+import tempfile
 
 from fastapi import UploadFile
 from runwisper import transcribe_audio_local
 from core.config import settings
-import os
 
-def save_audio_file(file: UploadFile) -> str:
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{timestamp}_{file.filename}"
-    filepath = os.path.join(settings.UPLOAD_DIR, filename)
-    
-    with open(filepath, "wb") as f:
-        f.write(file.file.read())
-    
-    return filepath
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def stream_to_file(source, dest_path: str, max_bytes: int = None, chunk_size: int = CHUNK_SIZE):
+    """
+    Copies a file-like object to `dest_path` in fixed-size chunks, hashing and
+    size-checking on the way. The data lands in a temp file in the same
+    directory and is renamed into place only once complete.
+    Returns (sha256 hex digest, size in bytes).
+    """
+    max_bytes = settings.MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+                digest.update(chunk)
+                out.write(chunk)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return digest.hexdigest(), size
+
+
+def save_upload(file: UploadFile, filename: str, upload_dir: str = None):
+    """
+    Streams an UploadFile into the upload directory. Blocking -- call it from
+    the threadpool in async routes. Returns (filepath, sha256, size).
+    """
+    upload_dir = upload_dir or settings.UPLOAD_DIR
+    filepath = os.path.join(upload_dir, filename)
+    file.file.seek(0)
+    digest, size = stream_to_file(file.file, filepath)
+    return filepath, digest, size
+
+
+def preprocess_quietly(audio_path: str):
+    try:
+        from utils.audio_preprocess import preprocess_audio
+        preprocess_audio(audio_path)
+    except Exception as e:
+        # Transcription will retry preprocessing on its own
+        print(f"Audio preprocessing failed for {audio_path}: {e}")
+
+
+def schedule_preprocessing(background_tasks, audio_path: str):
+    if settings.AUDIO_PREPROCESS:
+        background_tasks.add_task(preprocess_quietly, audio_path)
 
 def transcribe_audio(audio_path: str) -> str:
     if not os.path.exists(audio_path):
         raise FileNotFoundError("Audio file not found")
-    return transcribe_audio_local(audio_path)
\ No newline at end of file
+    return transcribe_audio_local(audio_path)
@@ -0,0 +1,204 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from core.config import settings
+
+SAMPLE_RATE = 16000
+FRAME = SAMPLE_RATE * 30 // 1000
+MAX_OVERLAP_WORDS = 30
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_chunk_worker():
+    # Other models are loaded on demand by the per-process registry
+    from runwisper import warm_up
+    warm_up()
+
+
+def _get_pool():
+    """
+    Fallback pool for streaming outside the API. The API hands iter_chunked
+    the transcription job pool instead, so it never runs more Whisper
+    processes than TRANSCRIBE_WORKERS.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.TRANSCRIBE_CHUNK_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_chunk_worker
+            )
+        return _pool
+
+
+def find_split_points(audio: np.ndarray, chunk_samples: int, search_samples: int):
+    """
+    Picks chunk boundaries close to every `chunk_samples`, moved to the
+    quietest 30 ms frame within +/- `search_samples` so cuts land in pauses
+    rather than mid-word.
+    """
+    n_frames = len(audio) // FRAME
+    if n_frames == 0:
+        return []
+    frames = audio[:n_frames * FRAME].reshape(n_frames, FRAME)
+    energy = np.mean(frames * frames, axis=1)
+
+    splits = []
+    target = chunk_samples
+    while target < len(audio) - search_samples:
+        lo = max((target - search_samples) // FRAME, 0)
+        hi = min((target + search_samples) // FRAME, n_frames)
+        if hi <= lo:
+            break
+        quietest = lo + int(np.argmin(energy[lo:hi]))
+        split = quietest * FRAME + FRAME // 2
+        if splits and split <= splits[-1]:
+            split = target
+        splits.append(split)
+        target = split + chunk_samples
+    return splits
+
+
+def plan_chunks(n_samples: int, splits, overlap_samples: int):
+    """
+    Returns (start, end, keep_until) per chunk. Each chunk reaches
+    `overlap_samples` past its split point so words cut at the boundary are
+    heard whole by one side; keep_until is the split point itself.
+    """
+    bounds = [0] + list(splits) + [n_samples]
+    chunks = []
+    for i in range(len(bounds) - 1):
+        start, keep_until = bounds[i], bounds[i + 1]
+        end = min(keep_until + overlap_samples, n_samples)
+        chunks.append((start, end, keep_until))
+    return chunks
+
+
+def plan_audio(audio: np.ndarray, chunk_seconds: float = None):
+    """(start, end, keep_until) chunks for `audio`, split at pauses."""
+    chunk_samples = int((chunk_seconds or settings.TRANSCRIBE_CHUNK_SECONDS) * SAMPLE_RATE)
+    overlap_samples = int(settings.TRANSCRIBE_CHUNK_OVERLAP_SECONDS * SAMPLE_RATE)
+    splits = find_split_points(audio, chunk_samples, search_samples=chunk_samples // 10)
+    return plan_chunks(len(audio), splits, overlap_samples)
+
+
+def transcribe_chunk(pcm_path, start, end, model_name, options):
+    from runwisper import get_model
+    audio = np.array(np.memmap(pcm_path, dtype=np.float32, mode="r")[start:end])
+    result = get_model(model_name).transcribe(audio, **options)
+    offset = start / SAMPLE_RATE
+    return [
+        {"start": s["start"] + offset, "end": s["end"] + offset, "text": s["text"],
+         "avg_logprob": s.get("avg_logprob")}
+        for s in result["segments"]
+    ], result.get("language")
+
+
+def _dedupe_words(previous_words, words):
+    # Longest suffix of what we already kept that the next chunk repeats
+    limit = min(len(previous_words), len(words), MAX_OVERLAP_WORDS)
+    normalize = lambda w: w.strip(".,!?;:").lower()
+    for n in range(limit, 0, -1):
+        if [normalize(w) for w in previous_words[-n:]] == [normalize(w) for w in words[:n]]:
+            return words[n:]
+    return words
+
+
+class Stitcher:
+    """
+    Merges per-chunk segments in chunk order: drops segments that start past
+    the chunk's split point (the next chunk owns them), removes words repeated
+    across the seam and clamps timestamps so they never go backwards.
+    """
+
+    def __init__(self):
+        self.segments = []
+        self._kept_words = []
+        self._last_end = 0.0
+
+    def add(self, segments, keep_until):
+        """Adds one chunk's segments; returns the newly merged ones."""
+        limit = keep_until / SAMPLE_RATE
+        added = []
+        first = True
+        for segment in segments:
+            if segment["start"] >= limit:
+                break
+            words = segment["text"].split()
+            if first and self._kept_words:
+                words = _dedupe_words(self._kept_words, words)
+            first = False
+            if not words:
+                continue
+            start = max(segment["start"], self._last_end)
+            end = max(segment["end"], start)
+            merged = {"id": len(self.segments), "start": start, "end": end,
+                      "text": " " + " ".join(words), "avg_logprob": segment.get("avg_logprob")}
+            self.segments.append(merged)
+            added.append(merged)
+            self._kept_words = (self._kept_words + words)[-MAX_OVERLAP_WORDS:]
+            self._last_end = end
+        return added
+
+
+def stitch(chunk_results, chunks):
+    stitcher = Stitcher()
+    for (segments, _), (_, _, keep_until) in zip(chunk_results, chunks):
+        stitcher.add(segments, keep_until)
+    return stitcher.segments
+
+
+def shared_pcm(audio: np.ndarray):
+    # Workers read their slice from a memory-mapped file rather than having
+    # the whole buffer pickled to each of them
+    if isinstance(audio, np.memmap) and audio.filename and audio.offset == 0:
+        return audio.filename, False
+    fd, pcm_path = tempfile.mkstemp(suffix=".f32")
+    os.close(fd)
+    np.asarray(audio, dtype=np.float32).tofile(pcm_path)
+    return pcm_path, True
+
+
+def iter_chunked(audio: np.ndarray, model_name: str, options: dict = None, chunk_seconds: float = None,
+                 executor=None):
+    """
+    Yields stitched segments chunk by chunk, in order, as soon as each chunk
+    (and every chunk before it) has been transcribed by `executor` (default:
+    the fallback chunk pool).
+    """
+    options = options or {}
+    chunks = plan_audio(audio, chunk_seconds)
+
+    pcm_path, cleanup = shared_pcm(audio)
+    futures = []
+    try:
+        pool = executor or _get_pool()
+        futures = [
+            pool.submit(transcribe_chunk, pcm_path, start, end, model_name, options)
+            for start, end, _ in chunks
+        ]
+        stitcher = Stitcher()
+        for future, (_, _, keep_until) in zip(futures, chunks):
+            segments, language = future.result()
+            for segment in stitcher.add(segments, keep_until):
+                yield segment, language
+    finally:
+        for future in futures:
+            future.cancel()
+        if cleanup:
+            # Let already-running chunks finish reading before the file goes
+            for future in futures:
+                if not future.cancelled():
+                    try:
+                        future.result()
+                    except Exception:
+                        pass
+            os.remove(pcm_path)
@@ -0,0 +1,144 @@
+import copy
+
+
+class JsonPointerError(Exception):
+    pass
+
+
+class JsonPatchTestFailed(Exception):
+    pass
+
+
+def parse_pointer(pointer: str):
+    """Splits an RFC 6901 JSON Pointer ("/a/b~1c/0") into unescaped tokens."""
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPointerError(f"Invalid JSON pointer: {pointer!r}")
+    return [t.replace("~1", "/").replace("~0", "~") for t in pointer[1:].split("/")]
+
+
+def _child(container, token, pointer):
+    if isinstance(container, dict):
+        if token not in container:
+            raise JsonPointerError(f"Path not found: {pointer}")
+        return container[token]
+    if isinstance(container, list):
+        try:
+            return container[_index(container, token, pointer)]
+        except IndexError:
+            raise JsonPointerError(f"Path not found: {pointer}")
+    raise JsonPointerError(f"Path not found: {pointer}")
+
+
+def _index(container, token, pointer, allow_end=False):
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise JsonPointerError(f"Invalid array index in {pointer}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPointerError(f"Array index out of range in {pointer}")
+    return index
+
+
+def resolve(document, pointer: str):
+    value = document
+    for token in parse_pointer(pointer):
+        value = _child(value, token, pointer)
+    return value
+
+
+def _parent(document, pointer):
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        raise JsonPointerError("Operation target cannot be the document root")
+    parent = document
+    for token in tokens[:-1]:
+        parent = _child(parent, token, pointer)
+    return parent, tokens[-1]
+
+
+def _add(document, pointer, value):
+    if pointer == "":
+        return value
+    parent, token = _parent(document, pointer)
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, token, pointer, allow_end=True), value)
+    else:
+        raise JsonPointerError(f"Path not found: {pointer}")
+    return document
+
+
+def _remove(document, pointer):
+    parent, token = _parent(document, pointer)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPointerError(f"Path not found: {pointer}")
+        return parent.pop(token)
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, token, pointer))
+    raise JsonPointerError(f"Path not found: {pointer}")
+
+
+def _json_equal(a, b):
+    """
+    JSON value equality (RFC 6902 4.6): numbers compare by value, but true
+    and false are not the numbers 1 and 0; arrays and objects compare
+    element by element.
+    """
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool) and a == b
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a == b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_json_equal(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_json_equal(x, y) for x, y in zip(a, b))
+    return type(a) is type(b) and a == b
+
+
+def _apply_one(document, op):
+    name = op.get("op")
+    path = op.get("path")
+    if path is None:
+        raise JsonPointerError("Every operation needs a path")
+    if name == "add":
+        document = _add(document, path, op["value"])
+    elif name == "remove":
+        _remove(document, path)
+    elif name == "replace":
+        if path == "":
+            document = op["value"]
+        else:
+            resolve(document, path)
+            _remove(document, path)
+            document = _add(document, path, op["value"])
+    elif name == "move":
+        value = _remove(document, op["from"])
+        document = _add(document, path, value)
+    elif name == "copy":
+        document = _add(document, path, copy.deepcopy(resolve(document, op["from"])))
+    elif name == "test":
+        if not _json_equal(resolve(document, path), op["value"]):
+            raise JsonPatchTestFailed(f"Test failed at {path}")
+    else:
+        raise JsonPointerError(f"Unsupported operation: {name!r}")
+    return document
+
+
+def apply_patch(document, operations):
+    """
+    Applies RFC 6902 operations (add, remove, replace, move, copy, test) to
+    `document` in place and returns the patched document (a new object only
+    when the root itself is replaced). Raises JsonPointerError for bad paths
+    or malformed operations and JsonPatchTestFailed when a test op fails.
+    """
+    for op in operations:
+        try:
+            document = _apply_one(document, op)
+        except KeyError as e:
+            raise JsonPointerError(f"Operation {op.get('op')!r} is missing {e}")
+    return document
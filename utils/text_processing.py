@@ -0,0 +1,57 @@
+import re
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+MAX_SENTENCE_WORDS = 40
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she should
+so some such than that the their theirs them themselves then there these they this those through to
+too under until up very was we were what when where which while who whom why will with would you your
+yours yourself yourselves um uh okay ok yeah oh
+""".split())
+
+
+def tokenize(text: str, drop_stopwords: bool = True):
+    tokens = TOKEN_RE.findall(text.lower())
+    if drop_stopwords:
+        tokens = [t for t in tokens if t not in STOPWORDS]
+    return tokens
+
+
+def terms(text: str):
+    """Unigrams plus adjacent-word bigrams, so short phrases match as phrases."""
+    tokens = tokenize(text)
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def split_sentences(text: str):
+    """
+    Splits on sentence punctuation; run-on stretches (Whisper sometimes emits
+    long unpunctuated passages) are cut every MAX_SENTENCE_WORDS words.
+    """
+    sentences = []
+    for part in SENTENCE_RE.split(text or ""):
+        words = part.split()
+        for i in range(0, len(words), MAX_SENTENCE_WORDS):
+            sentences.append(" ".join(words[i:i + MAX_SENTENCE_WORDS]))
+    return [s for s in sentences if s]
+
+
+def flatten_knowledge(data, path=()):
+    """
+    Walks a knowledge graph JSON document and yields (path, text) for every
+    string leaf, where path is the tuple of keys leading to it. Lists of
+    strings yield one entry per item.
+    """
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from flatten_knowledge(value, path + (str(key),))
+    elif isinstance(data, list):
+        for item in data:
+            yield from flatten_knowledge(item, path)
+    elif isinstance(data, str) and data.strip():
+        yield path, data.strip()
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from core.config import settings
+
+CHUNK_SIZE = 1024 * 1024
+# Job workers share the directory, so the running total is re-measured this often
+RESCAN_SECONDS = 60
+# Eviction trims to this share of max_bytes so the next scans are not one put away
+EVICT_TO = 0.9
+
+
+def hash_audio_file(audio_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(audio_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def whisper_version() -> str:
+    try:
+        from importlib.metadata import version
+        return version("openai-whisper")
+    except Exception:
+        return "unknown"
+
+
+class TranscriptionCache:
+    """
+    On-disk cache of Whisper results keyed by audio content, model and decode options.
+
+    Entries are JSON files named by key; the file mtime is the LRU clock, refreshed
+    on every hit, and the oldest entries are evicted once the directory grows past
+    max_bytes. The directory size is kept as a running total so a put only
+    scans it when the total is over budget or RESCAN_SECONDS have passed.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or settings.TRANSCRIPTION_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else settings.TRANSCRIPTION_CACHE_MAX_BYTES
+        self._lock = threading.Lock()
+        self._total = None
+        self._scanned_at = 0.0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, audio_hash: str, model_name: str, options: dict = None) -> str:
+        material = json.dumps({
+            "audio": audio_hash,
+            "model": model_name,
+            "whisper": whisper_version(),
+            "options": options or {},
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return result
+
+    def put(self, key: str, result: dict):
+        entry = {
+            "text": result.get("text", ""),
+            "language": result.get("language"),
+            "segments": [
+                {"id": s.get("id"), "start": s.get("start"), "end": s.get("end"), "text": s.get("text"),
+                 "avg_logprob": s.get("avg_logprob")}
+                for s in result.get("segments", [])
+            ],
+        }
+        # Write to a temp file and rename so readers never see a partial entry
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            size = os.path.getsize(tmp_path)
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self.max_bytes <= 0:
+            return
+        with self._lock:
+            if self._total is not None:
+                self._total += size - replaced
+            due = (self._total is None or self._total > self.max_bytes
+                   or time.monotonic() - self._scanned_at > RESCAN_SECONDS)
+        if due:
+            self.evict()
+
+    def evict(self):
+        if self.max_bytes <= 0:
+            return
+        with self._lock:
+            self._scanned_at = time.monotonic()
+            entries = []
+            total = 0
+            for item in os.scandir(self.directory):
+                if not item.name.endswith(".json"):
+                    continue
+                stat = item.stat()
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+                total += stat.st_size
+            if total > self.max_bytes:
+                for _, size, path in sorted(entries):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    if total <= self.max_bytes * EVICT_TO:
+                        break
+            self._total = total
+
+
+_cache = None
+
+
+def get_cache() -> TranscriptionCache:
+    global _cache
+    if _cache is None:
+        _cache = TranscriptionCache()
+    return _cache